@@ -0,0 +1,6 @@
+"""
+Performance benchmarks for config service. Benchmarks are not run as part of
+the test suite. Run individual benchmark using:
+
+    python -m benchmarks.<benchmark_module>
+"""
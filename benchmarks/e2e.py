@@ -0,0 +1,190 @@
+"""
+End to end benchmark of the config API (and MergedConfigProvider and
+dict_merge) against in-process stand-ins for etcd, S3 and github with
+simulated latency. Reports throughput and p50 / p99 latency for cold cache,
+warm cache and mixed workloads.
+
+Usage: python -m benchmarks.e2e [--requests N] [--latency SECONDS]
+                                [--warm-ratio RATIO]
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+
+import argparse
+import os
+import random
+import time
+
+import yaml
+from benchmarks.merge import WORKLOADS
+from benchmarks.servers import FakeEtcdServer, FakeGithubServer, \
+    FakeS3Server
+
+S3_BUCKET = 'totem-config'
+CLUSTER, OWNER, REF = 'local', 'totem', 'master'
+
+
+def _repo(index):
+    return 'repo-{0}'.format(index)
+
+
+def _config(level, width=20):
+    return yaml.safe_dump({
+        'level': level,
+        'section-{0}'.format(level): {
+            'key-{0}'.format(key): '{0}-{1}'.format(level, key)
+            for key in range(width)
+        }
+    })
+
+
+def _start_backends(latency, repos):
+    etcd_server = FakeEtcdServer(latency).start()
+    s3_server = FakeS3Server(latency).start()
+    github_server = FakeGithubServer(latency).start()
+    etcd_server.set('/totem/config/totem.yml', _config('root'))
+    etcd_server.set('/totem/config/{0}/totem.yml'.format(CLUSTER),
+                    _config('cluster'))
+    s3_server.put(S3_BUCKET, 'totem/config/{0}/{1}/totem.yml'.format(
+        CLUSTER, OWNER), _config('owner'))
+    for index in range(repos):
+        github_server.put(OWNER, _repo(index), REF, 'totem.yml',
+                          _config('repo'))
+    return etcd_server, s3_server, github_server
+
+
+def _configure(etcd_server, s3_server, github_server):
+    """
+    Points the config service to the stand-ins. Needs to be invoked before
+    the application settings are imported.
+    """
+    os.environ.update({
+        'CONFIG_PROVIDER_LIST': 'etcd,s3,github,effective',
+        'ETCD_HOST': '127.0.0.1',
+        'ETCD_PORT': str(etcd_server.port),
+        'ETCD_TOTEM_BASE': '/totem',
+        'CONFIG_S3_BUCKET': S3_BUCKET,
+        'CONFIG_S3_BUCKET_BASE': 'totem/config',
+        'CONFIG_S3_HOST': '127.0.0.1',
+        'CONFIG_S3_PORT': str(s3_server.port),
+        'CONFIG_S3_SECURE': 'false',
+        'CONFIG_S3_CALLING_FORMAT':
+            'boto.s3.connection.OrdinaryCallingFormat',
+        'GITHUB_API_URL': github_server.url,
+        'GITHUB_MAX_RETRIES': '0',
+        'CONFIG_EXECUTOR': 'thread',
+        'CONFIG_ETCD_WATCH_ENABLED': 'false',
+        'CONFIG_WARMUP_ENABLED': 'false',
+        'METRICS_DIRECTORY': '',
+    })
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+
+
+def _percentile(latencies, percent):
+    ordered = sorted(latencies)
+    index = max(0, int(round(percent / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+def _run(label, calls):
+    """
+    Invokes the calls in sequence and reports their latency.
+
+    :param calls: List of (setup, call) tuples. Setup (e.g. cache reset) is
+        not timed.
+    """
+    latencies = []
+    for setup, call in calls:
+        if setup:
+            setup()
+        start = time.time()
+        call()
+        latencies.append(time.time() - start)
+    total = sum(latencies)
+    print('{0:<16} requests: {1:>6}  throughput: {2:>9.1f}/s  '
+          'p50: {3:>8.3f} ms  p99: {4:>8.3f} ms'.format(
+              label, len(latencies), len(latencies) / max(total, 1e-9),
+              _percentile(latencies, 50) * 1000,
+              _percentile(latencies, 99) * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.002,
+                        help='Simulated backend latency in seconds')
+    parser.add_argument('--warm-ratio', type=float, default=0.8,
+                        help='Ratio of warm cache requests in mixed workload')
+    parser.add_argument('--warm-repos', type=int, default=20,
+                        help='Number of repos requested in warm workloads')
+    args = parser.parse_args()
+
+    # Each cold request uses a repo that was never requested before.
+    repos = args.warm_repos + 3 * args.requests
+    etcd_server, s3_server, github_server = _start_backends(args.latency,
+                                                            repos)
+    _configure(etcd_server, s3_server, github_server)
+
+    # Imported after configuring as settings are read on import.
+    from configservice.server import app
+    from configservice.services import config
+    from configservice.util import dict_merge
+
+    client = app.test_client()
+    new_repos = iter(range(args.warm_repos, repos))
+    warm_repos = [_repo(index) for index in range(args.warm_repos)]
+
+    def paths(repo):
+        return CLUSTER, OWNER, repo, REF
+
+    def get(repo):
+        def call():
+            resp = client.get('/providers/effective/groups/{0}/configs/'
+                              'totem'.format(','.join(paths(repo))))
+            assert resp.status_code == 200, resp.data
+        return call
+
+    def load(repo):
+        return lambda: config.get_provider('effective').load(
+            'totem.yml', *paths(repo))
+
+    def reset_caches():
+        config.reload_providers()
+        for key in list(etcd_server.store):
+            if key.startswith('/totem/config-cache/'):
+                del etcd_server.store[key]
+
+    def prime():
+        for repo in warm_repos:
+            get(repo)()
+
+    rand = random.Random(0)
+    _run('app cold', [(reset_caches, get(_repo(next(new_repos))))
+                      for _ in range(args.requests)])
+    prime()
+    _run('app warm', [(None, get(rand.choice(warm_repos)))
+                      for _ in range(args.requests)])
+    _run('app mixed', [
+        (None, get(rand.choice(warm_repos) if rand.random() < args.warm_ratio
+                   else _repo(next(new_repos))))
+        for _ in range(args.requests)])
+    _run('provider cold', [(reset_caches, load(_repo(next(new_repos))))
+                           for _ in range(args.requests)])
+    prime()
+    _run('provider warm', [(None, load(rand.choice(warm_repos)))
+                           for _ in range(args.requests)])
+    inputs = WORKLOADS['sparse']()
+    _run('dict_merge', [(None, lambda: dict_merge(*inputs))
+                        for _ in range(args.requests)])
+    print('backend requests  etcd: {0}  s3: {1}  github: {2}'.format(
+        etcd_server.requests, s3_server.requests, github_server.requests))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Compares etcd round trips, payload size and latency for loading multiple
+multi level configs:
+
+* per-level: one read per config and level, made serially (baseline).
+* fan-out: one directory read per level (EtcdConfigProvider.load_many) with
+  the levels loaded concurrently by MergedConfigProvider.
+* recursive: a single recursive read of config base (for payload size).
+
+Usage: python -m benchmarks.etcd_levels [--iterations N] [--latency SECONDS]
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+
+import argparse
+import time
+
+import yaml
+from benchmarks.stubs import FakeEtcdClient
+from configservice.cluster_config.effective import MergedConfigProvider
+from configservice.cluster_config.etcd import EtcdConfigProvider
+from configservice.concurrency import ThreadPoolExecutor
+
+CONFIG_BASE = '/totem/config'
+PATHS = ('local', 'totem', 'config', 'master')
+NAMES = ('totem.yml', 'deploy.yml')
+
+
+def _populate(etcd_cl, repos):
+    levels = [PATHS[:level] for level in range(len(PATHS) + 1)]
+    for repo in range(repos):
+        levels.append(('local', 'totem', 'repo-%d' % repo, 'master'))
+    for level in levels:
+        for name in NAMES:
+            etcd_cl.set('/'.join((CONFIG_BASE,) + level + (name,)),
+                        yaml.dump({'level': len(level), 'path': list(level)}))
+
+
+def _run(label, etcd_cl, load, iterations):
+    etcd_cl.round_trips = etcd_cl.bytes_read = 0
+    start = time.time()
+    for _ in range(iterations):
+        load()
+    elapsed = time.time() - start
+    print('{0:<12} round trips/load: {1:>5.1f}  bytes/load: {2:>8.0f}  '
+          'avg latency: {3:>8.3f} ms'
+          .format(label, etcd_cl.round_trips / iterations,
+                  etcd_cl.bytes_read / iterations,
+                  elapsed * 1000 / iterations))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.001,
+                        help='Simulated etcd latency in seconds')
+    parser.add_argument('--repos', type=int, default=50,
+                        help='Number of other repos stored in etcd')
+    args = parser.parse_args()
+
+    etcd_cl = FakeEtcdClient()
+    _populate(etcd_cl, args.repos)
+    etcd_cl.latency = args.latency
+    provider = EtcdConfigProvider(etcd_cl=etcd_cl, config_base=CONFIG_BASE)
+    merged = MergedConfigProvider(
+        provider, executor=ThreadPoolExecutor(pool_size=len(PATHS) + 1))
+
+    def per_level():
+        return [[provider.load(name, *PATHS[:level])
+                 for level in range(len(PATHS) + 1)] for name in NAMES]
+
+    def fan_out():
+        return merged.load_many(NAMES, *PATHS)
+
+    def recursive():
+        return etcd_cl.read(CONFIG_BASE, recursive=True)
+
+    _run('per-level', etcd_cl, per_level, args.iterations)
+    _run('fan-out', etcd_cl, fan_out, args.iterations)
+    _run('recursive', etcd_cl, recursive, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
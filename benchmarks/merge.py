@@ -0,0 +1,103 @@
+"""
+Benchmarks dict_merge for deep and wide configs against the previous
+implementation that deep copied every input on every merge.
+
+Usage: python -m benchmarks.merge [--iterations N]
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+
+import argparse
+import copy
+import time
+
+from configservice.util import dict_merge
+
+#: Providers x levels for a cluster/org/repo/ref path with 2 providers
+MERGE_INPUTS = 10
+
+
+def deepcopy_dict_merge(*dictionaries):
+    """
+    Previous dict_merge implementation (used as baseline).
+    """
+    merged_dict = {}
+
+    def merge(source, defaults):
+        source = copy.deepcopy(source)
+        if isinstance(source, dict) and isinstance(defaults, dict):
+            for key, value in defaults.items():
+                if key not in source:
+                    source[key] = value
+                else:
+                    source[key] = merge(source[key], value)
+        return source
+
+    for merge_with in dictionaries:
+        merged_dict = merge(merged_dict, copy.deepcopy(merge_with or {}))
+    return merged_dict
+
+
+def deep_config(depth, seed):
+    config = {'value-%d' % seed: seed}
+    for level in range(depth):
+        config = {'level-%d' % level: config, 'leaf-%d' % level: seed,
+                  'list-%d' % level: list(range(5))}
+    return config
+
+
+def wide_config(width, seed):
+    return {
+        'section-%d' % section: {
+            'key-%d' % key: '%d-%d' % (seed, key) for key in range(10)
+        } for section in range(width)
+    }
+
+
+def sparse_overrides(config, seed):
+    """
+    Overrides a single section (typical for deeper levels).
+    """
+    key = sorted(config.keys())[seed % len(config)]
+    return {key: {'override': seed}}
+
+
+WORKLOADS = {
+    'deep': lambda: [deep_config(20, seed) for seed in range(MERGE_INPUTS)],
+    'wide': lambda: [wide_config(200, seed)
+                     for seed in range(MERGE_INPUTS)],
+    'sparse': lambda: [sparse_overrides(wide_config(200, 0), seed)
+                       for seed in range(MERGE_INPUTS - 1)] +
+    [wide_config(200, 0)],
+}
+
+
+def _time(func, inputs, iterations):
+    start = time.time()
+    for _ in range(iterations):
+        func(*inputs)
+    return (time.time() - start) * 1000 / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    for name in sorted(WORKLOADS):
+        inputs = WORKLOADS[name]()
+        assert dict_merge(*inputs) == deepcopy_dict_merge(*inputs)
+        baseline = _time(deepcopy_dict_merge, inputs, args.iterations)
+        current = _time(dict_merge, inputs, args.iterations)
+        print('{0:<8} deepcopy: {1:>8.3f} ms  dict_merge: {2:>8.3f} ms  '
+              'speedup: {3:>6.1f}x'.format(name, baseline, current,
+                                           baseline / max(current, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""
+In-process HTTP stand-ins for etcd (v2 keys API), S3 and github contents API
+used by the end to end benchmarks. Each server simulates network latency for
+every request and counts the requests served.
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+
+import base64
+import hashlib
+import json
+import threading
+import time
+from future.moves.http.server import BaseHTTPRequestHandler, HTTPServer
+from future.moves.socketserver import ThreadingMixIn
+from future.moves.urllib.parse import parse_qs, unquote, urlparse
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately. Without this, delayed ACKs
+    # add tens of milliseconds to every response on keep alive connections.
+    disable_nagle_algorithm = True
+
+    def _dispatch(self):
+        fake = self.server.fake
+        fake.requests += 1
+        if fake.latency:
+            time.sleep(fake.latency)
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status, headers, content = fake.handle(
+            self.command, unquote(url.path), parse_qs(url.query),
+            self.headers, body)
+        if not isinstance(content, bytes):
+            content = content.encode('utf-8')
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(content)
+
+    do_GET = do_PUT = do_POST = do_DELETE = do_HEAD = _dispatch
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeServer(object):
+    """
+    Base class for the fake backends. Subclasses implement handle.
+    """
+
+    def __init__(self, latency=0):
+        """
+        :param latency: Simulated latency in seconds for every request.
+        :type latency: float
+        """
+        self.latency = latency
+        self.requests = 0
+        self._server = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{0}'.format(self.port)
+
+    def start(self):
+        self._server = _ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.fake = self
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def handle(self, method, path, query, headers, body):
+        """
+        :return: Tuple of status, headers (dict) and content
+        """
+        raise NotImplementedError
+
+
+class FakeEtcdServer(FakeServer):
+    """
+    Stand-in for etcd v2 keys API (get, recursive get, set with ttl and
+    delete). Watches are not supported.
+    """
+
+    def __init__(self, latency=0):
+        super(FakeEtcdServer, self).__init__(latency)
+        self.index = 1
+        # key => (value, modified index, expires at)
+        self.store = {}
+        self._lock = threading.Lock()
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self.index += 1
+            self.store['/' + key.strip('/')] = (
+                value, self.index, time.time() + ttl if ttl else None)
+            return self.index
+
+    def _live_keys(self):
+        now = time.time()
+        return {key: entry for key, entry in self.store.items()
+                if entry[2] is None or entry[2] > now}
+
+    def _node(self, key, entries, recursive):
+        if key in entries:
+            value, index, _ = entries[key]
+            return {'key': key, 'value': value, 'modifiedIndex': index,
+                    'createdIndex': index}
+        prefix = key.rstrip('/') + '/'
+        children = sorted(k for k in entries if k.startswith(prefix))
+        if not children:
+            return None
+        nodes, seen = [], set()
+        for child in children:
+            name = child[len(prefix):].split('/')[0]
+            if name in seen:
+                continue
+            seen.add(name)
+            child_key = prefix + name
+            if child_key in entries or recursive:
+                nodes.append(self._node(child_key, entries, recursive))
+            else:
+                nodes.append({'key': child_key, 'dir': True})
+        return {'key': key, 'dir': True, 'nodes': nodes}
+
+    def _response(self, status, payload):
+        return status, {'Content-Type': 'application/json',
+                        'X-Etcd-Index': str(self.index)}, json.dumps(payload)
+
+    def _not_found(self, key):
+        return self._response(404, {
+            'errorCode': 100, 'message': 'Key not found', 'cause': key,
+            'index': self.index})
+
+    def handle(self, method, path, query, headers, body):
+        if path == '/version':
+            return 200, {}, 'etcd 2.0.0'
+        if path == '/v2/machines':
+            return 200, {}, self.url
+        if not path.startswith('/v2/keys'):
+            return 404, {}, ''
+        key = '/' + path[len('/v2/keys'):].strip('/')
+        recursive = query.get('recursive', ['false'])[0] == 'true'
+        if method == 'GET':
+            if query.get('wait', ['false'])[0] == 'true':
+                return self._response(400, {
+                    'errorCode': 209, 'message': 'Watch is not supported',
+                    'index': self.index})
+            node = self._node(key, self._live_keys(), recursive)
+            if node is None:
+                return self._not_found(key)
+            return self._response(200, {'action': 'get', 'node': node})
+        elif method in ('PUT', 'POST'):
+            form = parse_qs(body.decode('utf-8'))
+            ttl = form.get('ttl', [None])[0]
+            index = self.set(key, form.get('value', [''])[0],
+                             ttl=int(ttl) if ttl else None)
+            return self._response(201, {'action': 'set', 'node': {
+                'key': key, 'value': form.get('value', [''])[0],
+                'modifiedIndex': index, 'createdIndex': index}})
+        elif method == 'DELETE':
+            with self._lock:
+                prefix = key.rstrip('/') + '/'
+                keys = [k for k in self.store
+                        if k == key or (recursive and k.startswith(prefix))]
+                if not keys:
+                    return self._not_found(key)
+                for k in keys:
+                    del self.store[k]
+                self.index += 1
+            return self._response(200, {'action': 'delete', 'node': {
+                'key': key, 'modifiedIndex': self.index}})
+        return 405, {}, ''
+
+
+class FakeS3Server(FakeServer):
+    """
+    Stand-in for S3 (path style get, head, put and delete of objects).
+    Requests are not authenticated.
+    """
+
+    def __init__(self, latency=0):
+        super(FakeS3Server, self).__init__(latency)
+        # (bucket, key) => content
+        self.objects = {}
+
+    def put(self, bucket, key, content):
+        if not isinstance(content, bytes):
+            content = content.encode('utf-8')
+        self.objects[(bucket, key.strip('/'))] = content
+
+    def handle(self, method, path, query, headers, body):
+        parts = path.strip('/').split('/', 1)
+        bucket, key = parts[0], parts[1] if len(parts) > 1 else ''
+        if method == 'PUT':
+            self.put(bucket, key, body)
+        elif method == 'DELETE':
+            self.objects.pop((bucket, key), None)
+            return 204, {}, ''
+        content = self.objects.get((bucket, key))
+        if content is None:
+            return 404, {'Content-Type': 'application/xml'}, (
+                '<?xml version="1.0" encoding="UTF-8"?><Error><Code>'
+                'NoSuchKey</Code><Message>The specified key does not exist.'
+                '</Message><Key>{0}</Key></Error>'.format(key))
+        response_headers = {
+            'ETag': '"{0}"'.format(hashlib.md5(content).hexdigest()),
+            'Content-Type': 'application/octet-stream',
+            'Last-Modified': 'Thu, 01 Jan 2015 00:00:00 GMT'
+        }
+        # Body is not written for HEAD (but its length is).
+        return 200, response_headers, content if method != 'PUT' else ''
+
+
+class FakeGithubServer(FakeServer):
+    """
+    Stand-in for github contents API (files and directory listings) with ETag
+    based conditional requests.
+    """
+
+    def __init__(self, latency=0):
+        super(FakeGithubServer, self).__init__(latency)
+        # (owner, repo, ref, path) => content
+        self.contents = {}
+
+    def put(self, owner, repo, ref, path, content):
+        if not isinstance(content, bytes):
+            content = content.encode('utf-8')
+        self.contents[(owner, repo, ref, '/' + path.lstrip('/'))] = content
+
+    def handle(self, method, path, query, headers, body):
+        parts = path.strip('/').split('/', 4)
+        if method != 'GET' or len(parts) < 4 or parts[0] != 'repos' or \
+                parts[3] != 'contents':
+            return 404, {'Content-Type': 'application/json'}, json.dumps(
+                {'message': 'Not Found'})
+        ref = query.get('ref', ['master'])[0]
+        path = '/' + (parts[4] if len(parts) > 4 else '')
+        content = self.contents.get((parts[1], parts[2], ref, path))
+        if content is not None:
+            payload = {
+                'encoding': 'base64',
+                'content': base64.b64encode(content).decode('ascii'),
+                'sha': hashlib.sha1(content).hexdigest()
+            }
+        else:
+            payload = self._listing(parts[1], parts[2], ref, path)
+            if not payload:
+                return 404, {'Content-Type': 'application/json'}, \
+                    json.dumps({'message': 'Not Found'})
+        content = json.dumps(payload, sort_keys=True)
+        etag = '"{0}"'.format(
+            hashlib.sha1(content.encode('utf-8')).hexdigest())
+        if headers.get('If-None-Match') == etag:
+            return 304, {'ETag': etag}, ''
+        return 200, {'Content-Type': 'application/json', 'ETag': etag}, \
+            content
+
+    def _listing(self, owner, repo, ref, path):
+        prefix = path.rstrip('/') + '/'
+        entries = {}
+        for (c_owner, c_repo, c_ref, c_path) in self.contents:
+            if (c_owner, c_repo, c_ref) != (owner, repo, ref) or \
+                    not c_path.startswith(prefix):
+                continue
+            name = c_path[len(prefix):].split('/')[0]
+            entries[name] = 'file' if '/' not in c_path[len(prefix):] \
+                else 'dir'
+        return [{'name': name, 'type': entry_type,
+                 'path': (prefix + name).lstrip('/')}
+                for name, entry_type in sorted(entries.items())]
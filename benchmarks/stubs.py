@@ -0,0 +1,86 @@
+"""
+In-process stand-ins for config backends used by benchmarks.
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+
+import threading
+import time
+
+
+class FakeEtcdNode(object):
+
+    def __init__(self, key, value=None, dir=False, leaves=None):
+        self.key = key
+        self.value = value
+        self.dir = dir
+        self.ttl = None
+        self._leaves = leaves
+
+    @property
+    def leaves(self):
+        return iter(self._leaves if self._leaves is not None else [self])
+
+
+class FakeEtcdClient(object):
+    """
+    Minimal in-memory stand-in for etcd.Client that counts the round trips
+    (and the size of values read) and simulates network latency for every
+    call.
+    """
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.store = {}
+        self.round_trips = 0
+        self.bytes_read = 0
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        with self._lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def set(self, key, value, ttl=None):
+        self._round_trip()
+        self.store['/' + key.lstrip('/')] = value
+
+    write = set
+
+    def delete(self, key, recursive=False):
+        self._round_trip()
+        key = '/' + key.lstrip('/')
+        if key in self.store:
+            del self.store[key]
+            return
+        prefix = key.rstrip('/') + '/'
+        matches = [k for k in self.store if k.startswith(prefix)]
+        if not matches or not recursive:
+            raise KeyError(key)
+        for match in matches:
+            del self.store[match]
+
+    def read(self, key, recursive=False, **kwargs):
+        self._round_trip()
+        key = '/' + key.lstrip('/')
+        if key in self.store:
+            with self._lock:
+                self.bytes_read += len(self.store[key])
+            return FakeEtcdNode(key, self.store[key])
+        prefix = key.rstrip('/') + '/'
+        matches = sorted(k for k in self.store if k.startswith(prefix))
+        if not matches:
+            raise KeyError(key)
+        if not recursive:
+            # Only immediate children
+            matches = [k for k in matches if '/' not in k[len(prefix):]]
+        with self._lock:
+            self.bytes_read += sum(len(self.store[k]) for k in matches)
+        return FakeEtcdNode(key, dir=True, leaves=[
+            FakeEtcdNode(k, self.store[k]) for k in matches])
@@ -15,6 +15,11 @@ export ENCRYPTION_STORE="${ENCRYPTION_PROVIDER:-s3}"
 export LOG_IDENTIFIER="${LOG_IDENTIFIER:-configservice}"
 export CONFIG_PROVIDER_LIST="${CONFIG_PROVIDER_LIST:-etcd,default,effective}"
 export CONFIG_PROVIDER_DEFAULT="${CONFIG_PROVIDER_LIST:-etcd}"
+export CONFIG_EXECUTOR="${CONFIG_EXECUTOR:-gevent}"
+export CONFIG_SHARED_CACHE_NAME="${CONFIG_SHARED_CACHE_NAME:-configs}"
+export CONFIG_SHARED_CACHE_SIZE="${CONFIG_SHARED_CACHE_SIZE:-1000}"
+# Shared cache memory is CONFIG_SHARED_CACHE_BLOCKS * 4KB (64MB by default).
+export CONFIG_SHARED_CACHE_BLOCKS="${CONFIG_SHARED_CACHE_BLOCKS:-16384}"
 
 
 /usr/local/bin/uwsgi \
@@ -25,6 +30,7 @@ export CONFIG_PROVIDER_DEFAULT="${CONFIG_PROVIDER_LIST:-etcd}"
         --http :9003 \
         --http-timeout 120 \
         --gevent-monkey-patch \
+        --cache2 name=${CONFIG_SHARED_CACHE_NAME},items=${CONFIG_SHARED_CACHE_SIZE},blocksize=4096,blocks=${CONFIG_SHARED_CACHE_BLOCKS},bitmap=1 \
         --module configservice.server \
         --callable app \
         --logger syslog:${LOG_IDENTIFIER}[0]
@@ -43,6 +43,15 @@ CONFIG_PROVIDERS = {
     's3': {
         'bucket':  os.getenv('CONFIG_S3_BUCKET', 'not_set'),
         'base': os.getenv('CONFIG_S3_BUCKET_BASE', 'totem/config'),
+        'timeout': float(os.getenv('CONFIG_S3_TIMEOUT', '30')),
+        # Connection settings for S3 compatible endpoint. Defaults to AWS S3.
+        'connection': {
+            'host': os.getenv('CONFIG_S3_HOST'),
+            'port': int(os.getenv('CONFIG_S3_PORT', '0')) or None,
+            'is_secure': os.getenv('CONFIG_S3_SECURE', 'true').strip()
+            .lower() in BOOLEAN_TRUE_VALUES,
+            'calling_format': os.getenv('CONFIG_S3_CALLING_FORMAT'),
+        },
         'meta-info': {
             'readonly': False,
             'name': 's3'
@@ -52,6 +61,16 @@ CONFIG_PROVIDERS = {
         'base': TOTEM_ETCD_SETTINGS['base'],
         'host': TOTEM_ETCD_SETTINGS['host'],
         'port': TOTEM_ETCD_SETTINGS['port'],
+        'timeout': float(os.getenv('CONFIG_ETCD_TIMEOUT', '10')),
+        # Background watch on etcd config that evicts the cached effective
+        # config as soon as it changes (instead of waiting for cache ttl).
+        'watch': {
+            'enabled': os.getenv('CONFIG_ETCD_WATCH_ENABLED', 'true').strip()
+            .lower() in BOOLEAN_TRUE_VALUES,
+            'timeout': float(os.getenv('CONFIG_ETCD_WATCH_TIMEOUT', '60')),
+            'retry_delay': float(
+                os.getenv('CONFIG_ETCD_WATCH_RETRY_DELAY', '5')),
+        },
         'meta-info': {
             'readonly': False,
             'name': 'etcd',
@@ -62,7 +81,49 @@ CONFIG_PROVIDERS = {
         'cache': {
             'enabled': os.getenv('CONFIG_CACHE_ENABLED', 'true').strip()
             .lower() in BOOLEAN_TRUE_VALUES,
-            'ttl': int(os.getenv('CONFIG_CACHE_TTL', '120'))
+            'ttl': int(os.getenv('CONFIG_CACHE_TTL', '120')),
+            # Kept separate from provider configs so that cached effective
+            # config does not overwrite the level config.
+            'base': os.getenv('CONFIG_CACHE_BASE',
+                              TOTEM_ETCD_SETTINGS['base'] + '/config-cache'),
+            # Seconds before expiry within which a cache hit triggers a
+            # reload. 0 disables refresh ahead.
+            'refresh_ahead': int(os.getenv('CONFIG_CACHE_REFRESH_AHEAD', '0')),
+            # In-process (per worker) cache in front of etcd cache.
+            'local': {
+                'enabled': os.getenv('CONFIG_LOCAL_CACHE_ENABLED', 'true')
+                .strip().lower() in BOOLEAN_TRUE_VALUES,
+                'size': int(os.getenv('CONFIG_LOCAL_CACHE_SIZE', '1000')),
+                'ttl': int(os.getenv('CONFIG_LOCAL_CACHE_TTL', '30')),
+                # Window (after ttl) in which stale config is served while it
+                # is refreshed in background. 0 disables.
+                'stale_ttl': int(
+                    os.getenv('CONFIG_LOCAL_CACHE_STALE_TTL', '0')),
+            },
+            # Cache shared by the uwsgi workers on the node (uwsgi cache
+            # named below, see bin/run.sh). Falls back to an in-process cache
+            # when the uwsgi cache is not configured. Disabled by default as
+            # its ttl adds to the staleness after changes missed by the watch.
+            'shared': {
+                'enabled': os.getenv('CONFIG_SHARED_CACHE_ENABLED', 'false')
+                .strip().lower() in BOOLEAN_TRUE_VALUES,
+                'name': os.getenv('CONFIG_SHARED_CACHE_NAME', 'configs'),
+                'size': int(os.getenv('CONFIG_SHARED_CACHE_SIZE', '1000')),
+                'ttl': int(os.getenv('CONFIG_SHARED_CACHE_TTL', '60')),
+            },
+            # In-process cache for level configs of shared path prefixes
+            # (like cluster and org). Disabled by default (see shared).
+            'prefix': {
+                'enabled': os.getenv('CONFIG_PREFIX_CACHE_ENABLED', 'false')
+                .strip().lower() in BOOLEAN_TRUE_VALUES,
+                'size': int(os.getenv('CONFIG_PREFIX_CACHE_SIZE', '1000')),
+                'ttl': int(os.getenv('CONFIG_PREFIX_CACHE_TTL', '60')),
+            }
+        },
+        'executor': {
+            # One of serial, thread, gevent
+            'type': os.getenv('CONFIG_EXECUTOR', 'serial'),
+            'pool_size': int(os.getenv('CONFIG_EXECUTOR_POOL_SIZE', '20')),
         },
         'meta-info': {
             'readonly': True,
@@ -73,12 +134,59 @@ CONFIG_PROVIDERS = {
     'github': {
         'token': os.getenv('GITHUB_TOKEN', None),
         'config_base': os.getenv('GITHUB_CONFIG_BASE', '/'),
+        'api_url': os.getenv('GITHUB_API_URL', 'https://api.github.com'),
+        'timeout': float(os.getenv('CONFIG_GITHUB_TIMEOUT', '30')),
+        'http': {
+            'pool_size': int(os.getenv('GITHUB_POOL_SIZE', '10')),
+            'keep_alive': os.getenv('GITHUB_KEEP_ALIVE', 'true').strip()
+            .lower() in BOOLEAN_TRUE_VALUES,
+            'max_retries': int(os.getenv('GITHUB_MAX_RETRIES', '3')),
+            'backoff_factor': float(os.getenv('GITHUB_RETRY_BACKOFF', '0.3')),
+            'connect_timeout': float(
+                os.getenv('GITHUB_CONNECT_TIMEOUT', '5')),
+            'read_timeout': float(os.getenv('GITHUB_READ_TIMEOUT', '20')),
+        },
+        'cache': {
+            # Number of raw configs cached with ETag. 0 disables the cache.
+            'etag_size': int(os.getenv('GITHUB_ETAG_CACHE_SIZE', '500')),
+            # Cache for commit SHAs (and tags). Size is in bytes, 0 disables.
+            'immutable': {
+                'max_bytes': int(os.getenv(
+                    'GITHUB_IMMUTABLE_CACHE_BYTES', str(32 * 1024 * 1024))),
+                'directory': os.getenv('GITHUB_IMMUTABLE_CACHE_DIR', None),
+                'max_disk_bytes': int(os.getenv(
+                    'GITHUB_IMMUTABLE_CACHE_DISK_BYTES',
+                    str(512 * 1024 * 1024))),
+                # e.g. ^v\d+\.\d+\.\d+$ . Tags are not cached if not set.
+                'tag_pattern': os.getenv('GITHUB_IMMUTABLE_TAG_PATTERN',
+                                         None),
+                'tag_grace_period': int(os.getenv(
+                    'GITHUB_IMMUTABLE_TAG_GRACE_PERIOD', '300')),
+            }
+        },
         'meta-info': {
             'readonly': False,
             'name': 'github',
             'type': 'github'
         }
     },
+    'snapshot': {
+        # Compiled snapshot of configs (memory mapped by all workers). See
+        # publish-snapshot.py for building it.
+        'path': os.getenv('CONFIG_SNAPSHOT_PATH',
+                          '/var/lib/configservice/snapshot.bin'),
+        # Interval in seconds for checking a newly published snapshot
+        'check_interval': float(
+            os.getenv('CONFIG_SNAPSHOT_CHECK_INTERVAL', '5')),
+        # Providers exported into the snapshot (earlier ones take precedence)
+        'sources': os.getenv('CONFIG_SNAPSHOT_SOURCES', 'etcd,s3').split(','),
+        'timeout': float(os.getenv('CONFIG_SNAPSHOT_TIMEOUT', '5')),
+        'meta-info': {
+            'readonly': True,
+            'name': 'snapshot',
+            'type': 'snapshot'
+        }
+    },
     'default': {
         'ref': CONFIG_PROVIDER_DEFAULT,
         'meta-info': {
@@ -88,13 +196,72 @@ CONFIG_PROVIDERS = {
     }
 }
 
+# Per provider cache of configs known to be missing (e.g. levels without
+# totem.yml). Entries are evicted when the config is written through the
+# service (or changes in etcd).
+CONFIG_NEGATIVE_CACHE = {
+    'enabled': os.getenv('CONFIG_NEGATIVE_CACHE_ENABLED', 'true').strip()
+    .lower() in BOOLEAN_TRUE_VALUES,
+    'size': int(os.getenv('CONFIG_NEGATIVE_CACHE_SIZE', '10000')),
+    'ttl': int(os.getenv('CONFIG_NEGATIVE_CACHE_TTL', '10')),
+}
+
+# Number of parsed yaml documents cached per worker. 0 disables the cache.
+YAML_PARSE_CACHE_SIZE = int(os.getenv('YAML_PARSE_CACHE_SIZE', '1000'))
+
 CONFIG_PROVIDER_LIST = os.getenv(
     'CONFIG_PROVIDER_LIST', 'default,etcd').split(',')
 
+CONFIG_BATCH = {
+    # Maximum number of groups in a single batch request
+    'max_size': int(os.getenv('CONFIG_BATCH_MAX_SIZE', '1000')),
+    # Number of groups resolved concurrently (using effective executor type)
+    'concurrency': int(os.getenv('CONFIG_BATCH_CONCURRENCY', '20')),
+}
+
+# Warm up of effective config cache (at worker start) using the recently
+# requested configs.
+CONFIG_WARMUP = {
+    'enabled': os.getenv('CONFIG_WARMUP_ENABLED', 'true').strip()
+    .lower() in BOOLEAN_TRUE_VALUES,
+    # Store for recently requested config keys (etcd or file)
+    'store': os.getenv('CONFIG_WARMUP_STORE', 'etcd'),
+    'etcd_key': os.getenv('CONFIG_WARMUP_ETCD_KEY',
+                          TOTEM_ETCD_SETTINGS['base'] + '/config-warmup/keys'),
+    'file': os.getenv('CONFIG_WARMUP_FILE', '/tmp/config-warmup.json'),
+    # Maximum number of recently requested config keys to be stored
+    'size': int(os.getenv('CONFIG_WARMUP_SIZE', '500')),
+    'concurrency': int(os.getenv('CONFIG_WARMUP_CONCURRENCY', '10')),
+    # Interval in seconds for saving recently requested keys to the store
+    'save_interval': int(os.getenv('CONFIG_WARMUP_SAVE_INTERVAL', '60')),
+}
+
+# In-process cache for serialized effective config responses and their ETags.
+# Disabled by default (see effective shared cache).
+CONFIG_RESPONSE_CACHE = {
+    'enabled': os.getenv('CONFIG_RESPONSE_CACHE_ENABLED', 'false').strip()
+    .lower() in BOOLEAN_TRUE_VALUES,
+    'size': int(os.getenv('CONFIG_RESPONSE_CACHE_SIZE', '1000')),
+    'ttl': int(os.getenv('CONFIG_RESPONSE_CACHE_TTL', '30')),
+}
+
+# Metrics for provider operations and caches (exposed at /metrics).
+METRICS = {
+    'enabled': os.getenv('METRICS_ENABLED', 'true').strip()
+    .lower() in BOOLEAN_TRUE_VALUES,
+    # Directory for per worker snapshots (used for aggregating metrics across
+    # uwsgi workers). If empty, metrics of the serving worker are exposed.
+    'directory': os.getenv('METRICS_DIRECTORY', '/tmp/configservice-metrics'),
+    # Interval in seconds for writing the worker snapshot
+    'interval': int(os.getenv('METRICS_SNAPSHOT_INTERVAL', '15')),
+}
+
 MIME_JSON = 'application/json'
+MIME_NDJSON = 'application/x-ndjson'
 MIME_HTML = 'text/html'
 MIME_ROOT_V1 = 'application/vnd.configservice.root.v1+json'
 MIME_HEALTH_V1 = 'application/vnd.configservice.health.v1+json'
+MIME_PROMETHEUS_TEXT = 'text/plain; version=0.0.4; charset=utf-8'
 
 SCHEMA_ROOT_V1 = 'root-v1'
 SCHEMA_HEALTH_V1 = 'health-v1'
@@ -0,0 +1,629 @@
+"""
+In-process caches used by the config providers.
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+
+from collections import OrderedDict
+import copy
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+from configservice.metrics import Counters
+
+try:
+    import uwsgi
+except ImportError:
+    # Not running under uwsgi
+    uwsgi = None
+
+logger = logging.getLogger(__name__)
+
+
+def tree_predicate(name, paths):
+    """
+    Gets the predicate matching the cache keys (name, paths) for the given
+    path prefix and all its descendants.
+
+    :param name: Name of the config. If None, keys for all names match.
+    :type name: str
+    :param paths: Path prefix
+    :type paths: tuple
+    :rtype: function
+    """
+    paths = tuple(paths)
+
+    def affected(key):
+        cached_name, cached_paths = key
+        return (name is None or cached_name == name) and \
+            cached_paths[:len(paths)] == paths
+    return affected
+
+
+def _digest(value):
+    return hashlib.sha1(repr(value).encode('utf-8')).hexdigest()
+
+
+class LocalCache(object):
+    """
+    Bounded in-process cache with TTL and LRU eviction.
+    """
+
+    def __init__(self, max_size=1000, ttl=30, copy_on_read=True, stale_ttl=0):
+        """
+        :param max_size: Maximum number of entries
+        :type max_size: int
+        :param ttl: Time to live in seconds for an entry
+        :type ttl: number
+        :param stale_ttl: Time in seconds (after ttl) for which an expired
+            entry is retained and can be read using get_stale.
+        :type stale_ttl: number
+        :param copy_on_read: If True, values are deep copied when cached and
+            when read so that callers are free to modify them. If False, the
+            cached value is shared and must be treated as read only.
+        :type copy_on_read: bool
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.copy_on_read = copy_on_read
+        self.counters = Counters('hits', 'misses', 'expired', 'evictions',
+                                 'stale_hits')
+        self._entries = OrderedDict()
+        # Incremented on every invalidation (see version)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _copy(self, value):
+        return copy.deepcopy(value) if self.copy_on_read else value
+
+    def get(self, key, default=None):
+        """
+        :param key: Hashable key
+        :param default: Value returned if entry is not found or expired.
+        :return: Cached value
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                age = now - entry[1]
+                if age < self.ttl + self.stale_ttl:
+                    # Re-insert to mark as most recently used
+                    self._entries[key] = entry
+                if age >= self.ttl:
+                    self.counters.incr('expired')
+                    entry = None
+        if entry is None:
+            self.counters.incr('misses')
+            return default
+        self.counters.incr('hits')
+        return self._copy(entry[0])
+
+    def get_stale(self, key, default=None):
+        """
+        Gets the expired entry which is still within the stale window.
+
+        :param key: Hashable key
+        :param default: Value returned if no stale entry is found.
+        :return: Cached value
+        """
+        entry = self._entries.get(key)
+        if entry is None or \
+                time.time() - entry[1] >= self.ttl + self.stale_ttl:
+            return default
+        self.counters.incr('stale_hits')
+        return self._copy(entry[0])
+
+    def version(self, key):
+        """
+        Gets the version of the cache to be passed to put for a value that
+        is about to be loaded, so that the value does not get cached if the
+        cache is invalidated while it is being loaded.
+
+        :param key: Hashable key
+        :return: Version
+        """
+        return self._generation
+
+    def put(self, key, value, version=None):
+        """
+        :param key: Hashable key
+        :param value: Value to be cached
+        :param version: Version of the cache at the time the value started
+            loading (see version). If the cache has been invalidated since,
+            the value is not cached.
+        :return: None
+        """
+        value = self._copy(value)
+        with self._lock:
+            if version is not None and version != self._generation:
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = (value, time.time())
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.counters.incr('evictions')
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        """
+        Evicts all entries whose key matches the predicate.
+
+        :param predicate: Function accepting key and returning True if entry
+            needs to be evicted.
+        :return: Number of evicted entries
+        :rtype: int
+        """
+        with self._lock:
+            self._generation += 1
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def invalidate_tree(self, name, *paths):
+        """
+        Evicts the entries keyed by (name, paths) tuple for the given path
+        prefix and all its descendants.
+
+        :param name: Name of the config. If None, entries for all names are
+            evicted.
+        :type name: str
+        :param paths: Path prefix
+        :return: Number of evicted entries
+        :rtype: int
+        """
+        return self.invalidate_where(tree_predicate(name, paths))
+
+    def claim(self, key):
+        """
+        Claims the key for the caller among the processes sharing the cache.
+        In-process cache is not shared, so the claim always succeeds.
+
+        :param key: Key to be claimed (e.g. an event)
+        :type key: str
+        :return: True
+        :rtype: bool
+        """
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        stats = self.counters.to_dict()
+        stats.update({
+            'entries': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'stale_ttl': self.stale_ttl
+        })
+        return stats
+
+
+class NegativeCache(object):
+    """
+    Cache of configs known to be missing in a provider, so that lookups for
+    missing levels do not cost a backend call every time. Entries have a
+    short TTL and must be invalidated when the config gets written.
+    """
+
+    def __init__(self, max_size=10000, ttl=10):
+        """
+        :param max_size: Maximum number of entries
+        :type max_size: int
+        :param ttl: Time to live in seconds for an entry
+        :type ttl: number
+        """
+        self._cache = LocalCache(max_size=max_size, ttl=ttl,
+                                 copy_on_read=False)
+        self.counters = Counters('saved', 'recorded')
+
+    def is_missing(self, name, *paths):
+        """
+        :param name: Name of the config
+        :type name: str
+        :param paths: Path list for the config
+        :return: True if config is known to be missing (saving a backend
+            call), False otherwise.
+        :rtype: bool
+        """
+        if self._cache.get((name, tuple(paths))):
+            self.counters.incr('saved')
+            return True
+        return False
+
+    def all_missing(self, names, *paths):
+        """
+        :param names: Names of the configs
+        :type names: list
+        :param paths: Path list for the configs
+        :return: True if all the configs are known to be missing (saving a
+            backend call), False otherwise.
+        :rtype: bool
+        """
+        for name in names:
+            if not self._cache.get((name, tuple(paths))):
+                return False
+        self.counters.incr('saved')
+        return True
+
+    def add(self, name, *paths):
+        """
+        Records the config as missing.
+
+        :param name: Name of the config
+        :type name: str
+        :param paths: Path list for the config
+        :return: None
+        """
+        self.counters.incr('recorded')
+        self._cache.put((name, tuple(paths)), True)
+
+    def invalidate(self, name, *paths):
+        """
+        Evicts the entries for the given path prefix and all its
+        descendants.
+
+        :param name: Name of the config. If None, entries for all names are
+            evicted.
+        :type name: str
+        :param paths: Path prefix
+        :return: None
+        """
+        self._cache.invalidate_tree(name, *paths)
+
+    def stats(self):
+        stats = self._cache.stats()
+        stats.update(self.counters.to_dict())
+        return stats
+
+
+class UwsgiCache(object):
+    """
+    Cache shared by all the uwsgi workers on a node, backed by the uwsgi
+    cache framework (--cache2). Size is bounded by the number of items of the
+    uwsgi cache. Values are pickled, so every read returns a new copy.
+
+    Keys are (name, paths) tuples. uwsgi cache does not support iterating
+    over the keys, so every key includes the generation of each of its path
+    prefixes (stored in the same cache) and invalidate_tree evicts a subtree
+    by bumping the generation of its prefix. Entries with old generations
+    are reclaimed by uwsgi on expiry.
+    """
+
+    _GENERATION_KEY = '__generation__:{0}'
+    _CLAIM_KEY = '__claim__:{0}'
+
+    def __init__(self, name, ttl=30, max_size=None):
+        """
+        :param name: Name of the uwsgi cache (as configured using --cache2)
+        :type name: str
+        :param ttl: Time to live in seconds for an entry
+        :type ttl: int
+        :param max_size: Number of items of the uwsgi cache (for stats only)
+        :type max_size: int
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self.counters = Counters('hits', 'misses', 'writes', 'write_errors',
+                                 'invalidations')
+
+    def _generation_key(self, paths):
+        return self._GENERATION_KEY.format(_digest(paths))
+
+    def _key(self, key):
+        name, paths = key
+        generations = tuple(
+            uwsgi.cache_get(self._generation_key(paths[:index]), self.name)
+            for index in range(len(paths) + 1))
+        return _digest((key, generations))
+
+    def get(self, key, default=None):
+        """
+        :param key: Tuple of config name and paths
+        :param default: Value returned if entry is not found or expired.
+        :return: Cached value
+        """
+        raw = uwsgi.cache_get(self._key(key), self.name)
+        if raw is None:
+            self.counters.incr('misses')
+            return default
+        self.counters.incr('hits')
+        return pickle.loads(raw)
+
+    def version(self, key):
+        """
+        Gets the version (generation qualified key) to be passed to put for
+        a value that is about to be loaded, so that the value does not get
+        served if the key is invalidated while it is being loaded.
+
+        :param key: Tuple of config name and paths
+        :return: Version
+        :rtype: str
+        """
+        return self._key(key)
+
+    def put(self, key, value, version=None):
+        """
+        :param key: Tuple of config name and paths
+        :param value: Value to be cached (must be picklable)
+        :param version: Version at the time the value started loading (see
+            version). If the key has been invalidated since, the value is
+            stored under the old generation and never served.
+        :return: None
+        """
+        raw = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if uwsgi.cache_update(version or self._key(key), raw, self.ttl,
+                              self.name):
+            self.counters.incr('writes')
+        else:
+            # Cache is full or value exceeds the block size
+            self.counters.incr('write_errors')
+
+    def invalidate(self, key):
+        uwsgi.cache_del(self._key(key), self.name)
+
+    def invalidate_tree(self, name, *paths):
+        """
+        Evicts the entries for the given path prefix and all its descendants
+        for all the workers on the node. Meant to be invoked once per change
+        (not by every worker), as the generation is shared.
+
+        :param name: Name of the config. Ignored, as generations are kept per
+            path prefix, so entries for all names are evicted.
+        :type name: str
+        :param paths: Path prefix
+        :return: None
+        """
+        self.counters.incr('invalidations')
+        generation = '{0:x}'.format(int(time.time() * 1000000))
+        if not uwsgi.cache_update(self._generation_key(paths),
+                                  generation.encode('utf-8'), 0, self.name):
+            # Stale entries must not be served
+            logger.warning('Failed to bump generation for: %s. Clearing '
+                           'uwsgi cache: %s', '/'.join(paths), self.name)
+            self.clear()
+
+    def claim(self, key):
+        """
+        Claims the key for the first caller among the workers on the node
+        (claims expire after ttl).
+
+        :param key: Key to be claimed (e.g. an event)
+        :type key: str
+        :return: True if the key got claimed by the caller, False if it was
+            already claimed by another worker.
+        :rtype: bool
+        """
+        return bool(uwsgi.cache_set(self._CLAIM_KEY.format(key), b'1',
+                                    self.ttl, self.name))
+
+    def clear(self):
+        uwsgi.cache_clear(self.name)
+
+    def stats(self):
+        stats = self.counters.to_dict()
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'backend': 'uwsgi',
+            'name': self.name,
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hit_ratio': float(stats['hits']) / lookups if lookups else 0.0
+        })
+        return stats
+
+
+def _uwsgi_cache_items(name):
+    """
+    Finds the uwsgi cache with given name in the uwsgi options.
+
+    :return: Number of items of the cache or None if cache is not configured
+        (or not running under uwsgi).
+    :rtype: int
+    """
+    if uwsgi is None:
+        return None
+    options = uwsgi.opt.get('cache2', [])
+    if not isinstance(options, list):
+        options = [options]
+    for option in options:
+        if isinstance(option, bytes):
+            option = option.decode('utf-8')
+        settings = dict(setting.split('=', 1)
+                        for setting in option.split(',') if '=' in setting)
+        if settings.get('name') == name:
+            return int(settings.get('items', 0)) or None
+    return None
+
+
+def get_shared_cache(name, max_size=1000, ttl=30):
+    """
+    Gets the cache shared by the workers on the node. If the uwsgi cache
+    with the given name is not configured (e.g. when running the development
+    server), an in-process LocalCache is used instead.
+
+    :param name: Name of the uwsgi cache
+    :type name: str
+    :param max_size: Maximum number of entries for the in-process fallback
+    :type max_size: int
+    :param ttl: Time to live in seconds for an entry
+    :type ttl: int
+    :return: UwsgiCache or LocalCache instance
+    """
+    items = _uwsgi_cache_items(name)
+    if items is None:
+        logger.info('uwsgi cache: %s is not configured. Using in-process '
+                    'cache instead', name)
+        return LocalCache(max_size=max_size, ttl=ttl)
+    return UwsgiCache(name, ttl=ttl, max_size=items)
+
+
+class ImmutableCache(object):
+    """
+    Cache for content that never changes for a given key (like config
+    fetched for a commit SHA). Entries never expire by time and are evicted
+    (least recently used first) only when memory or disk budget is exceeded.
+    Values must be bytes.
+    """
+
+    def __init__(self, max_bytes, directory=None, max_disk_bytes=None):
+        """
+        :param max_bytes: Memory budget in bytes.
+        :type max_bytes: int
+        :keyword directory: Optional directory used as second tier. Entries
+            evicted from memory are still served from disk.
+        :type directory: str
+        :keyword max_disk_bytes: Disk budget in bytes. None means unbounded.
+        :type max_disk_bytes: int
+        """
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.size_bytes = 0
+        self.counters = Counters('hits', 'misses', 'disk_hits', 'evictions',
+                                 'disk_trims')
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Estimated size of the directory (seeded on first write). Entries
+        # written by other processes are only accounted for on trim.
+        self._disk_size_bytes = None
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def get(self, key):
+        """
+        :param key: Hashable key
+        :return: Cached bytes or None if not found
+        """
+        digest = _digest(key)
+        with self._lock:
+            value = self._entries.pop(digest, None)
+            if value is not None:
+                # Re-insert to mark as most recently used
+                self._entries[digest] = value
+        if value is None and self.directory:
+            value = self._read_disk(digest)
+            if value is not None:
+                self.counters.incr('disk_hits')
+                self._put_memory(digest, value)
+        self.counters.incr('hits' if value is not None else 'misses')
+        return value
+
+    def put(self, key, value):
+        """
+        :param key: Hashable key
+        :param value: Bytes to be cached
+        :type value: bytes
+        :return: None
+        """
+        digest = _digest(key)
+        self._put_memory(digest, value)
+        if self.directory:
+            self._write_disk(digest, value)
+
+    def _put_memory(self, digest, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            existing = self._entries.pop(digest, None)
+            if existing is not None:
+                self.size_bytes -= len(existing)
+            self._entries[digest] = value
+            self.size_bytes += len(value)
+            while self.size_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size_bytes -= len(evicted)
+                self.counters.incr('evictions')
+
+    def _read_disk(self, digest):
+        try:
+            with open(os.path.join(self.directory, digest), 'rb') as entry:
+                return entry.read()
+        except (IOError, OSError):
+            return None
+
+    def _write_disk(self, digest, value):
+        path = os.path.join(self.directory, digest)
+        try:
+            if self.max_disk_bytes is not None and \
+                    self._disk_size_bytes is None:
+                self._trim_disk()
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory,
+                                            prefix='.tmp')
+            with os.fdopen(fd, 'wb') as entry:
+                entry.write(value)
+            os.rename(tmp_path, path)
+            if self.max_disk_bytes is not None:
+                with self._lock:
+                    self._disk_size_bytes += len(value) - replaced
+                    over_budget = \
+                        self._disk_size_bytes > self.max_disk_bytes
+                if over_budget:
+                    self._trim_disk()
+        except (IOError, OSError):
+            logger.exception('Failed to write cache entry to disk')
+
+    def _trim_disk(self):
+        """
+        Scans the directory for its actual size and removes the least
+        recently written entries until it is within 90% of the disk budget
+        (so that the scan is not repeated on every write).
+        """
+        entries = []
+        total = 0
+        for file_name in os.listdir(self.directory):
+            if file_name.startswith('.tmp'):
+                continue
+            file_path = os.path.join(self.directory, file_name)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file_path))
+            total += stat.st_size
+        if total > self.max_disk_bytes:
+            self.counters.incr('disk_trims')
+            for _, size, file_path in sorted(entries):
+                if total <= self.max_disk_bytes * 0.9:
+                    break
+                try:
+                    os.remove(file_path)
+                    total -= size
+                except OSError:
+                    pass
+        with self._lock:
+            self._disk_size_bytes = total
+
+    def stats(self):
+        stats = self.counters.to_dict()
+        stats.update({
+            'entries': len(self._entries),
+            'size_bytes': self.size_bytes,
+            'max_bytes': self.max_bytes,
+            'disk_size_bytes': self._disk_size_bytes
+        })
+        return stats
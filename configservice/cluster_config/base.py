@@ -14,6 +14,14 @@ class AbstractConfigProvider:
     The implementation (like S3) must support multi level layout.
     """
 
+    #: Whether provider implements efficient load for all levels at once
+    #: (see load_levels and load_many_levels).
+    supports_load_levels = False
+
+    #: Whether provider implements efficient load for multiple config names
+    #: at once (see load_many).
+    supports_load_many = False
+
     def not_supported(self):
         """
         Raises NotImplementedError with a message
@@ -35,6 +43,54 @@ class AbstractConfigProvider:
         """
         self.not_supported()
 
+    def load_levels(self, name, *paths):
+        """
+        Load config for every level of the given path. Providers that can
+        fetch all the levels at once should override this method and set
+        supports_load_levels to True.
+
+        :param name: Name of the config to be loaded
+        :type name: str
+        :param paths: Tuple consisting of nested level path
+        :return: List of parsed configs with one entry per level (root level
+            first).
+        :rtype: list
+        """
+        return [self.load(name, *paths[:level])
+                for level in range(len(paths) + 1)]
+
+    def load_many(self, names, *paths):
+        """
+        Load multiple configs at given path. Providers that can fetch the
+        configs at once should override this method and set
+        supports_load_many to True.
+
+        :param names: Names of the configs to be loaded
+        :type names: list
+        :param paths: Tuple consisting of nested level path
+        :return: Dictionary of config name => parsed config
+        :rtype: dict
+        """
+        return {name: self.load(name, *paths) for name in names}
+
+    def load_many_levels(self, names, *paths, **kwargs):
+        """
+        Load multiple configs for every level of the given path.
+
+        :param names: Names of the configs to be loaded
+        :type names: list
+        :param paths: Tuple consisting of nested level path
+        :keyword start_level: Level from which configs are loaded (e.g. when
+            the configs for shallower levels are already known). Defaults to
+            0 (root level).
+        :type start_level: int
+        :return: List with one dictionary of config name => parsed config per
+            level starting from start_level.
+        :rtype: list
+        """
+        return [self.load_many(names, *paths[:level]) for level in
+                range(kwargs.get('start_level', 0), len(paths) + 1)]
+
     def write(self, name, config, *paths):
         """
         Writes config at given path.
@@ -62,3 +118,28 @@ class AbstractConfigProvider:
         :raise NotImplementedError: If provider does not support this method.
         """
         self.not_supported()
+
+    def delete_tree(self, name, *paths):
+        """
+        Deletes the configuration at given path and at all the paths nested
+        under it.
+
+        :param name: Name of the config to be deleted. If None, all configs
+            under the path are deleted.
+        :type name: str
+        :param paths: Nested level path
+        :type paths: tuple
+        :return: None
+        :raise NotImplementedError: If provider does not support this method.
+        """
+        self.not_supported()
+
+    def export(self):
+        """
+        Iterates over all the configs held by the provider (used for building
+        config snapshots).
+
+        :return: Generator of (name, paths, raw config) tuples
+        :raise NotImplementedError: If provider does not support this method.
+        """
+        self.not_supported()
@@ -6,8 +6,13 @@ from future.builtins import (  # noqa
     pow, round, super,
     filter, map, zip)
 
-import functools
+import time
+import repoze.lru
 from configservice.cluster_config.base import AbstractConfigProvider
+from configservice.concurrency import SerialExecutor, SingleFlight, \
+    TaskTimeout
+from configservice.exceptions import ConfigServiceError
+from configservice.metrics import Counters
 from configservice.util import dict_merge
 
 
@@ -16,6 +21,9 @@ class MergedConfigProvider(AbstractConfigProvider):
     Provider that merges the config from different providers and optionally
     caches it.
     """
+
+    supports_load_many = True
+
     def __init__(self, *providers, **kwargs):
         """
         :param providers: List of Config providers.
@@ -23,29 +31,121 @@ class MergedConfigProvider(AbstractConfigProvider):
             config.
         :param write_provider: Config provider for writing the config to. If
             None, then no write will be done.
+        :keyword local_cache: Optional in-process cache (L1) for the parsed
+            effective config. It is consulted before the cache_provider (L2).
+            If the local cache retains stale entries (stale_ttl), a stale
+            config is served while it gets refreshed in background.
+        :type local_cache: configservice.cache.LocalCache
+        :keyword shared_cache: Optional cache shared by the workers on the
+            node. It is consulted after the local cache and before the
+            cache_provider, so that config loaded by one worker is served by
+            the others.
+        :type shared_cache: configservice.cache.UwsgiCache
+        :keyword prefix_cache: Optional in-process cache for the level
+            configs of intermediate path prefixes (like cluster and org). A
+            load for a new path then only fetches the levels below the
+            longest cached prefix. Cached values are shared (read only).
+        :type prefix_cache: configservice.cache.LocalCache
+        :keyword refresh_ahead: If set, the cached config (in cache_provider)
+            is reloaded and rewritten when it is read within given seconds of
+            its expiry. Otherwise cache_provider is written only on a miss.
+        :type refresh_ahead: number
+        :keyword executor: Executor used for fanning out the provider loads.
+            Defaults to SerialExecutor.
+        :keyword timeouts: Per provider load timeout in seconds (in the same
+            order as providers). None means no timeout.
+        :type timeouts: list
         """
         self.providers = providers
         self.cache_provider = kwargs.get('cache_provider', None)
         self.write_provider = kwargs.get('write_provider', None)
+        self.local_cache = kwargs.get('local_cache', None)
+        self.shared_cache = kwargs.get('shared_cache', None)
+        self.prefix_cache = kwargs.get('prefix_cache', None)
+        self.refresh_ahead = kwargs.get('refresh_ahead', None)
+        self.cache_counters = Counters('hits', 'misses', 'writes',
+                                       'refreshes')
+        # Time at which this worker wrote the cached entries (used for
+        # refresh ahead).
+        self._cache_written_at = repoze.lru.LRUCache(10000)
+        # Only one load runs per (name, paths) in the worker.
+        self._single_flight = SingleFlight()
+        self.executor = kwargs.get('executor', None) or SerialExecutor()
+        self.timeouts = list(kwargs.get('timeouts', None) or [])
+
+    def _refresh_due(self, cache_key):
+        ttl = getattr(self.cache_provider, 'ttl', None)
+        if not self.refresh_ahead or not ttl:
+            return False
+        written_at = self._cache_written_at.get(cache_key)
+        return written_at is not None and \
+            time.time() - written_at >= ttl - self.refresh_ahead
+
+    def _write_cache(self, cache_key, config):
+        name, paths = cache_key
+        self.cache_provider.write(name, config, *paths)
+        self._cache_written_at.put(cache_key, time.time())
+        self.cache_counters.incr('writes')
 
-    def _cached_config(self, func):
+    def _load_cached(self, names, paths, level_memo=None):
         """
-        Wrapper for caching the config if cache_provider is provided. If not,
-        it skips caching.
-        :param func: Function to be wrapped.
-        :return: Wrapped function.
+        Loads the configs using cache_provider (L2) and merges the levels for
+        the configs that are missing (or due for refresh) in it. The local
+        cache (L1) is updated with the loaded configs.
+        Cache hits are read only. The cache_provider is written only on a miss
+        or when the entry is refreshed ahead of its expiry.
+
+        :return: Dictionary of config name => config
+        :rtype: dict
         """
-        @functools.wraps(func)
-        def inner(*args, **kwargs):
-            if not self.cache_provider:
-                return func(*args, **kwargs)
-            else:
-                config = self.cache_provider.load(*args, **kwargs) or \
-                    func(*args, **kwargs)
-                paths = args[1:] if len(args) > 1 else []
-                self.cache_provider.write(args[0], config, *paths)
-                return config
-        return inner
+        # Captured before loading, so that configs loaded before an
+        # invalidation are not cached after it.
+        versions = [(cache, {name: cache.version((name, paths))
+                             for name in names})
+                    for cache in (self.local_cache, self.shared_cache)
+                    if cache]
+        if not self.cache_provider:
+            configs = self._merge_levels(names, paths, level_memo)
+        else:
+            configs = self.cache_provider.load_many(names, *paths)
+            pending = []
+            for name in names:
+                if not configs.get(name):
+                    self.cache_counters.incr('misses')
+                    pending.append(name)
+                else:
+                    self.cache_counters.incr('hits')
+                    if self._refresh_due((name, paths)):
+                        self.cache_counters.incr('refreshes')
+                        pending.append(name)
+            if pending:
+                configs.update(self._merge_levels(pending, paths, level_memo))
+                for name in pending:
+                    self._write_cache((name, paths), configs[name])
+
+        for cache, cache_versions in versions:
+            for name in names:
+                cache.put((name, paths), configs[name],
+                          version=cache_versions[name])
+        return configs
+
+    def stats(self):
+        """
+        Gets the cache statistics for the provider.
+
+        :return: Dictionary of statistics
+        :rtype: dict
+        """
+        return {
+            'cache': self.cache_counters.to_dict(),
+            'local_cache': self.local_cache.stats()
+            if self.local_cache else None,
+            'shared_cache': self.shared_cache.stats()
+            if self.shared_cache else None,
+            'prefix_cache': self.prefix_cache.stats()
+            if self.prefix_cache else None,
+            'single_flight': self._single_flight.counters.to_dict()
+        }
 
     def write(self, name, config, *paths):
         """
@@ -58,7 +158,8 @@ class MergedConfigProvider(AbstractConfigProvider):
         """
         # Delegate to write_provider if set. Else NOOP
         if self.write_provider:
-            self.write_provider.write(config, *paths)
+            self.write_provider.write(name, config, *paths)
+            self.invalidate(name, *paths)
 
     def delete(self, name, *paths):
         """
@@ -70,33 +171,292 @@ class MergedConfigProvider(AbstractConfigProvider):
         # Delegate to write_provider if set. Else NOOP
         if self.write_provider:
             self.write_provider.delete(name, *paths)
+            self.invalidate(name, *paths)
+
+    def invalidate(self, name, *paths):
+        """
+        Evicts the cached configs (in cache_provider, shared and in-process
+        caches) for the given path prefix and all its descendants. Meant to
+        be invoked once per change by the writer. Other workers only need to
+        evict their in-process caches (see invalidate_local).
+
+        :param name: Name of the config. If None, configs for all names are
+            evicted.
+        :type name: str
+        :param paths: Path prefix that changed
+        :return: None
+        """
+        # Evict shared cache first so that in-process caches do not get
+        # re-populated from it.
+        if self.cache_provider:
+            self.cache_provider.delete_tree(name, *paths)
+        if self.shared_cache:
+            self.shared_cache.invalidate_tree(name, *paths)
+        self.invalidate_local(name, *paths)
+
+    def invalidate_event(self, event, name, *paths):
+        """
+        Evicts the cached configs for a change that is notified to every
+        worker (e.g. by etcd watch). The shared tiers (cache_provider and
+        shared cache) are evicted only by the first worker on the node that
+        claims the event, while other workers only evict their in-process
+        caches. Eviction is idempotent, so it is safe for every node to evict
+        the cache_provider.
+
+        :param event: Unique id of the change (e.g. etcd modified index)
+        :param name: Name of the config. If None, configs for all names are
+            evicted.
+        :type name: str
+        :param paths: Path prefix that changed
+        :return: None
+        """
+        if not self.shared_cache or \
+                self.shared_cache.claim('event:{0}'.format(event)):
+            self.invalidate(name, *paths)
+        else:
+            self.invalidate_local(name, *paths)
+
+    def invalidate_local(self, name, *paths):
+        """
+        Evicts the configs cached in-process (by this worker) for the given
+        path prefix and all its descendants.
+
+        :param name: Name of the config. If None, configs for all names are
+            evicted.
+        :type name: str
+        :param paths: Path prefix that changed
+        :return: None
+        """
+        for cache in (self.local_cache, self.prefix_cache):
+            if cache:
+                cache.invalidate_tree(name, *paths)
+
+    def _timeout(self, provider_index):
+        if provider_index < len(self.timeouts):
+            return self.timeouts[provider_index]
+        return None
 
-    def load(self, name, *paths):
+    def _deadline(self, provider_index):
+        timeout = self._timeout(provider_index)
+        if timeout is None:
+            return None
+        return time.time() + timeout
+
+    def _task_result(self, task, provider_index, deadline, names, paths):
+        """
+        Waits for the task until the provider deadline, so that all the
+        tasks submitted for a provider share its timeout.
+        """
+        timeout = self._timeout(provider_index)
+        try:
+            if deadline is None:
+                return task.get()
+            return task.get(timeout=max(deadline - time.time(), 0))
+        except TaskTimeout:
+            raise ProviderTimeoutError(self.providers[provider_index],
+                                       ', '.join(names), paths, timeout)
+
+    def _submit(self, level_memo, key, func, *args):
+        if level_memo is None:
+            return self.executor.submit(func, *args)
+        return level_memo.submit(key, self.executor, func, *args)
+
+    def _load_levels(self, names, paths, start_level, level_memo=None):
+        """
+        Loads the configs from all providers for path levels starting from
+        start_level. All the loads are submitted to the executor at once.
+        Providers supporting bulk load are invoked once for all the levels
+        from start_level (load_many_levels) or once per level for all the
+        names (load_many). With level_memo, loads are always made per level
+        so that they get shared for common prefixes.
+
+        :param level_memo: Optional TaskMemo for sharing the loads across
+            multiple calls (e.g. common prefix levels in a batch).
+        :type level_memo: configservice.concurrency.TaskMemo
+        :return: Dictionary of level => list of dictionaries of config name
+            => config (in the order of providers).
+        :rtype: dict
+        """
+        names = tuple(names)
+        levels = range(len(paths), start_level - 1, -1)
+        bulk_tasks, level_tasks, deadlines = {}, {}, {}
+        for index, provider in enumerate(self.providers):
+            deadlines[index] = self._deadline(index)
+            if provider.supports_load_levels and level_memo is None:
+                bulk_tasks[index] = self.executor.submit(
+                    provider.load_many_levels, names, *paths,
+                    start_level=start_level)
+            elif provider.supports_load_many or \
+                    provider.supports_load_levels:
+                # Loaded per level when memoized, so that the loads for
+                # common prefixes are shared.
+                for level in levels:
+                    level_tasks[(index, level)] = self._submit(
+                        level_memo, (index, 'many', names, paths[:level]),
+                        provider.load_many, names, *paths[:level])
+            else:
+                for level in levels:
+                    for name in names:
+                        level_tasks[(index, level, name)] = self._submit(
+                            level_memo, (index, 'level', name, paths[:level]),
+                            provider.load, name, *paths[:level])
+
+        bulk_configs = {}
+        configs = {}
+        for level in levels:
+            configs[level] = []
+            for index, provider in enumerate(self.providers):
+                if index in bulk_tasks:
+                    if index not in bulk_configs:
+                        bulk_configs[index] = self._task_result(
+                            bulk_tasks[index], index, deadlines[index],
+                            names, paths)
+                    configs[level].append(
+                        bulk_configs[index][level - start_level])
+                elif (index, level) in level_tasks:
+                    configs[level].append(self._task_result(
+                        level_tasks[(index, level)], index, deadlines[index],
+                        names, paths[:level]))
+                else:
+                    configs[level].append({
+                        name: self._task_result(
+                            level_tasks[(index, level, name)], index,
+                            deadlines[index], (name,), paths[:level])
+                        for name in names
+                    })
+        return configs
+
+    def _cached_prefix(self, name, paths):
+        """
+        Finds the level configs cached for the longest prefix of paths.
+
+        :return: Tuple of level configs for the prefix (see _merge_levels)
+            and the level following the prefix.
+        :rtype: tuple
+        """
+        if self.prefix_cache:
+            for level in range(len(paths) - 1, -1, -1):
+                level_configs = self.prefix_cache.get((name, paths[:level]))
+                if level_configs is not None:
+                    return level_configs, level + 1
+        return (), 0
+
+    def _merge_levels(self, names, paths, level_memo=None):
+        """
+        Loads and merges the configs for all levels of given path in a single
+        walk over the levels. Configs are merged in a single pass with deeper
+        levels and earlier providers taking precedence. Level configs for each
+        intermediate prefix (tuple with one tuple of provider configs per
+        level, root level first) are cached in prefix_cache.
+
+        :param level_memo: Optional TaskMemo for sharing the loads across
+            multiple calls.
+        :return: Dictionary of config name => merged config
+        :rtype: dict
+        """
+        prefixes = {name: self._cached_prefix(name, paths) for name in names}
+        start_level = min(start for _, start in prefixes.values())
+        prefix_versions = {
+            (name, level): self.prefix_cache.version((name, paths[:level]))
+            for name in names for level in range(len(paths))
+        } if self.prefix_cache else {}
+        configs = self._load_levels(names, paths, start_level, level_memo)
+        merged_configs = {}
+        for name in names:
+            level_configs, start = prefixes[name]
+            for level in range(start, len(paths) + 1):
+                level_configs += (tuple(provider_configs[name] for
+                                        provider_configs in configs[level]),)
+                if self.prefix_cache and level < len(paths):
+                    self.prefix_cache.put(
+                        (name, paths[:level]), level_configs,
+                        version=prefix_versions[(name, level)])
+            merged_configs[name] = dict_merge(*[
+                config for provider_configs in reversed(level_configs)
+                for config in provider_configs])
+        return merged_configs
+
+    def load(self, name, *paths, **kwargs):
         """
         Loads config for given path list.
 
         :param paths: Path list used for loading the config.
+        :keyword level_memo: Optional TaskMemo for sharing the level loads
+            across multiple calls (e.g. for the items of a batch).
+        :type level_memo: configservice.concurrency.TaskMemo
         :return: Merged config from different providers.
         :rtype: dict
         """
+        return self.load_many([name], *paths, **kwargs)[name]
 
-        @self._cached_config
-        def cached(name, *paths):
-            merged_config = {}
+    def load_many(self, names, *paths, **kwargs):
+        """
+        Loads multiple configs for given path list. Configs not found in
+        the local (or shared) cache are resolved together, using a single
+        walk over the levels of the path (and a single bulk load for
+        providers supporting it). Concurrent loads for the same names and
+        path are coalesced into a single load.
 
-            def merge(current_config, provider, *merge_paths):
-                return dict_merge(
-                    current_config,
-                    provider.load(name, *merge_paths))
+        :param names: Names of the configs to be loaded
+        :type names: list
+        :param paths: Path list used for loading the configs.
+        :keyword level_memo: Optional TaskMemo for sharing the level loads
+            across multiple calls (e.g. for the items of a batch).
+        :type level_memo: configservice.concurrency.TaskMemo
+        :return: Dictionary of config name => merged config
+        :rtype: dict
+        """
+        level_memo = kwargs.get('level_memo', None)
+        paths = tuple(paths)
+        configs, missing = {}, []
+        for name in names:
+            config = self.local_cache.get((name, paths)) \
+                if self.local_cache else None
+            if config is None and self.shared_cache:
+                version = self.local_cache.version((name, paths)) \
+                    if self.local_cache else None
+                config = self.shared_cache.get((name, paths))
+                if config is not None and self.local_cache:
+                    self.local_cache.put((name, paths), config,
+                                         version=version)
+            if config is None and self.local_cache:
+                config = self.local_cache.get_stale((name, paths))
+                if config is not None:
+                    # Stale while revalidate
+                    self._single_flight.spawn(
+                        ((name,), paths), self._load_cached, (name,), paths)
+            if config is not None:
+                configs[name] = config
+            elif name not in missing:
+                missing.append(name)
 
-            use_paths = list(paths)
-            while True:
-                for provider in self.providers:
-                    merged_config = merge(merged_config, provider, *use_paths)
-                if use_paths:
-                    use_paths.pop()
-                else:
-                    break
+        if missing:
+            missing = tuple(missing)
+            configs.update(self._single_flight.do(
+                (missing, paths), self._load_cached, missing, paths,
+                level_memo))
+        return configs
+
+
+class ProviderTimeoutError(ConfigServiceError):
+    """
+    Error raised when a provider does not load the config within configured
+    timeout.
+    """
 
-            return merged_config
-        return cached(name, *paths)
+    def __init__(self, provider, name, paths, timeout):
+        self.provider = provider
+        self.name = name
+        self.paths = paths
+        self.timeout = timeout
+        message = 'Provider: {0} timed out after {1} seconds while loading ' \
+                  'config: {2} for paths: {3}'.format(
+                      provider.__class__.__name__, timeout, name, paths)
+        details = {
+            'provider': provider.__class__.__name__,
+            'name': name,
+            'paths': list(paths),
+            'timeout': timeout
+        }
+        super(ProviderTimeoutError, self).__init__(
+            message, code='CONFIG_PROVIDER_TIMEOUT', details=details)
@@ -6,9 +6,20 @@ from future.builtins import (  # noqa
     pow, round, super,
     filter, map, zip)
 
+import logging
+import socket
+import threading
 import etcd
-import yaml
+from urllib3.exceptions import TimeoutError as HTTPTimeoutError
 from configservice.cluster_config.base import AbstractConfigProvider
+from configservice.metrics import Counters
+from configservice.serialization import dump_yaml, load_yaml
+
+logger = logging.getLogger(__name__)
+
+# Errors raised when a watch does not see any change within its timeout.
+_WATCH_TIMEOUT_ERRORS = (HTTPTimeoutError, socket.timeout) + (
+    (etcd.EtcdWatchTimedOut,) if hasattr(etcd, 'EtcdWatchTimedOut') else ())
 
 
 class EtcdConfigProvider(AbstractConfigProvider):
@@ -16,14 +27,18 @@ class EtcdConfigProvider(AbstractConfigProvider):
     Config provider that uses etcd as the backend
     """
 
+    supports_load_many = True
+
     def __init__(self, etcd_cl=None, etcd_port=None, etcd_host=None,
-                 config_base=None, ttl=None):
+                 config_base=None, ttl=None, negative_cache=None):
         """
         Initializes etcd client.
 
         :param etcd_cl:
         :param etcd_port:
         :param etcd_host:
+        :keyword negative_cache: Optional cache of missing configs.
+        :type negative_cache: configservice.cache.NegativeCache
         :return:
         """
         if not etcd_cl:
@@ -34,6 +49,7 @@ class EtcdConfigProvider(AbstractConfigProvider):
             self.etcd_cl = etcd_cl
         self.config_base = config_base or '/totem/config'
         self.ttl = ttl
+        self.negative_cache = negative_cache
 
     def _etcd_path(self, name, *paths):
         if paths:
@@ -43,8 +59,10 @@ class EtcdConfigProvider(AbstractConfigProvider):
             return '%s/%s' % (self.config_base, name)
 
     def write(self, name, config, *paths):
-        raw = yaml.dump(config)
+        raw = dump_yaml(config)
         self.etcd_cl.set(self._etcd_path(name, *paths), raw, ttl=self.ttl)
+        if self.negative_cache:
+            self.negative_cache.invalidate(name, *paths)
 
     def delete(self, name, *paths):
         try:
@@ -54,9 +72,214 @@ class EtcdConfigProvider(AbstractConfigProvider):
             # Ignore as it is safe delete operation
             return False
 
+    def delete_tree(self, name, *paths):
+        dir_path = '/'.join((self.config_base,) + paths)
+        try:
+            if name is None:
+                self.etcd_cl.delete(dir_path, recursive=True, dir=True)
+                return
+            result = self.etcd_cl.read(dir_path, recursive=True)
+        except KeyError:
+            return
+        for leaf in result.leaves:
+            if not leaf.dir and leaf.key.rsplit('/', 1)[-1] == name:
+                try:
+                    self.etcd_cl.delete(leaf.key)
+                except KeyError:
+                    # Ignore as it is safe delete operation
+                    pass
+
+    def parse_key(self, key, is_dir=False):
+        """
+        Parses etcd key under config_base.
+
+        :param key: Etcd key
+        :type key: str
+        :param is_dir: Whether key is a directory.
+        :type is_dir: bool
+        :return: Tuple of config name (None for directory) and the path list
+            or None if key is not under config_base.
+        :rtype: tuple
+        """
+        base = '/' + self.config_base.strip('/')
+        key = '/' + key.strip('/')
+        if key != base and not key.startswith(base + '/'):
+            return None
+        parts = [part for part in key[len(base):].split('/') if part]
+        if is_dir or not parts:
+            return None, tuple(parts)
+        return parts[-1], tuple(parts[:-1])
+
     def load(self, name, *paths):
+        if self.negative_cache and \
+                self.negative_cache.is_missing(name, *paths):
+            return dict()
         try:
             raw = self.etcd_cl.read(self._etcd_path(name, *paths)).value
         except KeyError:
+            if self.negative_cache:
+                self.negative_cache.add(name, *paths)
             return dict()
-        return yaml.load(raw)
+        return load_yaml(raw)
+
+    def load_many(self, names, *paths):
+        """
+        Loads multiple configs at given path using a single read of the
+        directory for the path.
+        """
+        if self.negative_cache and \
+                self.negative_cache.all_missing(names, *paths):
+            return {name: dict() for name in names}
+        dir_path = '/'.join((self.config_base,) + paths)
+        try:
+            result = self.etcd_cl.read(dir_path)
+            values = {leaf.key.rsplit('/', 1)[-1]: leaf.value
+                      for leaf in result.leaves if not leaf.dir}
+        except KeyError:
+            values = {}
+
+        if self.negative_cache:
+            for name in names:
+                if name not in values:
+                    self.negative_cache.add(name, *paths)
+        return {name: load_yaml(values[name]) if name in values else dict()
+                for name in names}
+
+    def stats(self):
+        """
+        Gets the negative cache statistics for the provider.
+
+        :return: Dictionary of statistics
+        :rtype: dict
+        """
+        return {
+            'negative_cache': self.negative_cache.stats()
+            if self.negative_cache else None
+        }
+
+    def export(self):
+        """
+        Iterates over all configs under config_base using a single recursive
+        read.
+        """
+        try:
+            result = self.etcd_cl.read(self.config_base, recursive=True)
+        except KeyError:
+            return
+        for leaf in result.leaves:
+            if leaf.dir:
+                continue
+            parsed = self.parse_key(leaf.key)
+            if parsed:
+                name, paths = parsed
+                yield name, paths, leaf.value
+
+
+class EtcdConfigWatcher(object):
+    """
+    Watches the config_base of etcd provider (using etcd wait / waitIndex)
+    in a background thread and notifies every change. If the watch fails
+    (e.g. the event index got cleared), the watcher notifies a reset (so that
+    everything derived from config can be discarded) and resumes the watch
+    from the current index. The initial sync does not notify a reset, as
+    nothing has been missed yet (and caches may be getting warmed up).
+    """
+
+    def __init__(self, provider, on_change, on_reset, timeout=60,
+                 retry_delay=5):
+        """
+        :param provider: Etcd provider to be watched
+        :type provider: EtcdConfigProvider
+        :param on_change: Function invoked with config name (None for
+            directory), paths and the etcd index of the change (index
+            keyword) for every changed key.
+        :param on_reset: Function invoked (without arguments) on resync
+            after a failed watch.
+        :param timeout: Timeout in seconds for a single watch request.
+        :type timeout: number
+        :param retry_delay: Delay in seconds before resuming a failed watch.
+        :type retry_delay: number
+        """
+        self.provider = provider
+        self.on_change = on_change
+        self.on_reset = on_reset
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.counters = Counters('events', 'timeouts', 'errors', 'resyncs')
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Starts the watch in a daemon thread (greenlet when running under
+        uwsgi with gevent).
+
+        :return: None
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def resync(self, reset=True):
+        """
+        Notifies reset and gets the index from which watch is to be resumed.
+
+        :param reset: If False, reset is not notified (used for initial
+            sync).
+        :type reset: bool
+        :return: Etcd index or None if it is not known.
+        """
+        self.counters.incr('resyncs')
+        if reset:
+            self.on_reset()
+        try:
+            result = self.provider.etcd_cl.read(self.provider.config_base)
+        except KeyError:
+            return None
+        index = getattr(result, 'etcd_index', None)
+        return index + 1 if index is not None else None
+
+    def watch_once(self, index=None):
+        """
+        Waits for the next change under config_base and notifies it.
+
+        :param index: Etcd index to watch from. If None, waits for the next
+            change.
+        :return: Etcd index for the next watch.
+        """
+        kwargs = {'recursive': True, 'wait': True, 'timeout': self.timeout}
+        if index is not None:
+            kwargs['waitIndex'] = index
+        result = self.provider.etcd_cl.read(self.provider.config_base,
+                                            **kwargs)
+        self.counters.incr('events')
+        parsed = self.provider.parse_key(result.key, is_dir=result.dir)
+        if parsed is not None:
+            name, paths = parsed
+            self.on_change(name, *paths, index=result.modifiedIndex)
+        return result.modifiedIndex + 1
+
+    def _run(self):
+        index, synced, started = None, False, False
+        while not self._stopped.is_set():
+            try:
+                if not synced:
+                    reset, started = started, True
+                    index, synced = self.resync(reset=reset), True
+                index = self.watch_once(index)
+            except _WATCH_TIMEOUT_ERRORS:
+                self.counters.incr('timeouts')
+            except Exception:
+                self.counters.incr('errors')
+                logger.exception('Watch on %s failed. Resyncing in %s '
+                                 'seconds', self.provider.config_base,
+                                 self.retry_delay)
+                synced = False
+                self._stopped.wait(self.retry_delay)
+
+    def stats(self):
+        return self.counters.to_dict()
@@ -1,14 +1,22 @@
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 import base64
+import re
+import time
 from future.builtins import (  # noqa
     bytes, dict, int, list, object, range, str,
     ascii, chr, hex, input, next, oct, open,
     pow, round, super,
     filter, map, zip)
+import repoze.lru
 import requests
-import yaml
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
 from configservice.cluster_config.base import AbstractConfigProvider
+from configservice.metrics import Counters, LatencyStats
+from configservice.serialization import load_yaml
+
+COMMIT_SHA_PATTERN = re.compile(r'^[0-9a-fA-F]{40}$')
 
 
 class GithubConfigProvider(AbstractConfigProvider):
@@ -16,45 +24,174 @@ class GithubConfigProvider(AbstractConfigProvider):
     Config provider that fetches totem config from a given repository
     """
 
-    def __init__(self, token=None, config_base='/'):
+    supports_load_many = True
+
+    def __init__(self, token=None, config_base='/', pool_size=10,
+                 keep_alive=True, max_retries=3, backoff_factor=0.3,
+                 connect_timeout=5, read_timeout=20, etag_cache_size=500,
+                 immutable_cache=None, tag_pattern=None,
+                 tag_grace_period=300, api_url='https://api.github.com',
+                 negative_cache=None):
         """
         :keyword token: Optional github API token for authentication. Needed if
             private repositories are getting deployed.
         :type token: str
+        :keyword pool_size: Maximum number of pooled connections per host.
+        :type pool_size: int
+        :keyword keep_alive: If False, connections are closed after every
+            fetch.
+        :type keep_alive: bool
+        :keyword max_retries: Number of retries for connection errors and
+            5xx responses.
+        :type max_retries: int
+        :keyword backoff_factor: Backoff factor (in seconds) between retries.
+        :type backoff_factor: float
+        :keyword connect_timeout: Connect timeout in seconds
+        :type connect_timeout: float
+        :keyword read_timeout: Read timeout in seconds
+        :type read_timeout: float
+        :keyword etag_cache_size: Maximum number of raw configs cached along
+            with their ETag for conditional fetches. 0 disables the cache.
+        :type etag_cache_size: int
+        :keyword immutable_cache: Optional cache for configs fetched for
+            immutable refs (commit SHAs and tags matching tag_pattern).
+        :type immutable_cache: configservice.cache.ImmutableCache
+        :keyword tag_pattern: Regular expression for refs that are treated as
+            immutable tags. If None, only commit SHAs are considered immutable.
+        :type tag_pattern: str
+        :keyword tag_grace_period: Time in seconds for which the config for a
+            tag must remain unchanged before it is cached as immutable.
+        :type tag_grace_period: int
+        :keyword api_url: Base url for github API (e.g. for github
+            enterprise).
+        :type api_url: str
+        :keyword negative_cache: Optional cache of missing configs.
+        :type negative_cache: configservice.cache.NegativeCache
         """
+        self.api_url = api_url.rstrip('/')
         self.auth = (token, 'x-oauth-basic') if token else None
         self.config_base = config_base
+        self.timeout = (connect_timeout, read_timeout)
+        self.fetch_latency = LatencyStats()
+        self.session = self._create_session(
+            pool_size, keep_alive, max_retries, backoff_factor)
+        self.etag_cache = repoze.lru.LRUCache(etag_cache_size) \
+            if etag_cache_size else None
+        self.etag_counters = Counters('hits', 'misses')
+        self.immutable_cache = immutable_cache
+        self.tag_pattern = re.compile(tag_pattern) if tag_pattern else None
+        self.tag_grace_period = tag_grace_period
+        # Tags seen within grace period: cache key => (first seen, raw)
+        self._pending_tags = repoze.lru.LRUCache(1000)
+        self.negative_cache = negative_cache
 
-    def _github_fetch(self, owner, repo, ref, name):
+    @staticmethod
+    def _create_session(pool_size, keep_alive, max_retries, backoff_factor):
         """
-        Fetches the raw totem config for a given owner, repo, ref and name.
+        Creates pooled http session used for all github fetches.
+
+        :return: Http session
+        :rtype: requests.Session
+        """
+        session = requests.Session()
+        retries = Retry(total=max_retries, backoff_factor=backoff_factor,
+                        status_forcelist=[500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=retries)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if not keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def stats(self):
+        """
+        Gets fetch latency and connection reuse statistics for the provider.
 
+        :return: Dictionary of statistics
+        :rtype: dict
+        """
+        requests_count, connections = 0, 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for pool_key in pools.keys():
+                pool = pools.get(pool_key)
+                if pool:
+                    requests_count += pool.num_requests
+                    connections += pool.num_connections
+        return {
+            'fetch_latency': self.fetch_latency.to_dict(),
+            'requests': requests_count,
+            'connections': connections,
+            'reused_connections': max(requests_count - connections, 0),
+            'etag_cache': self.etag_counters.to_dict(),
+            'immutable_cache': self.immutable_cache.stats()
+            if self.immutable_cache else None,
+            'negative_cache': self.negative_cache.stats()
+            if self.negative_cache else None
+        }
+
+    def _github_get(self, path, owner, repo, ref, parse):
+        """
+        Gets the github contents API resource for a given path. If the
+        resource was fetched earlier, a conditional request is made using the
+        cached ETag and cached value is returned if it is not modified.
+
+        :param path: Path of file or directory in the repository
+        :type path: str
         :param owner: Repository owner / organization
         :type owner: str
         :param repo: Repository name
         :type repo: str
         :param ref: Branch/tag
         :type ref: str
-        :param name: Name of totem config (totem.yml)
-        :type name: str
-        :return: Raw totem config
-        :rtype: str
+        :param parse: Function that parses the value (to be cached) from the
+            response.
+        :return: Parsed value or None if resource does not exist.
         :raises GithubFetchException: If fetch fails
         """
         path_params = {
             'owner': owner,
             'repo': repo,
-            'path': self.config_base + name
+            'path': path
         }
         query_params = {
             'ref': ref
         }
-        hub_url = 'https://api.github.com/repos/{owner}/{repo}/contents' \
-                  '{path}'.format(**path_params)
-        resp = requests.get(hub_url, params=query_params, auth=self.auth)
+        hub_url = '{api_url}/repos/{owner}/{repo}/contents{path}'.format(
+            api_url=self.api_url, **path_params)
+        cache_key = (hub_url, ref)
+        cached = self.etag_cache.get(cache_key) \
+            if self.etag_cache is not None else None
+        headers = {}
+        if cached:
+            headers['If-None-Match'] = cached[0]
+
+        try:
+            with self.fetch_latency.time():
+                resp = self.session.get(hub_url, params=query_params,
+                                        auth=self.auth, timeout=self.timeout,
+                                        headers=headers)
+        except requests.exceptions.RetryError as error:
+            # Retries exhausted for 5xx responses
+            raise GithubFetchException({
+                'url': hub_url,
+                'response': {'raw': str(error)},
+                'status': None
+            })
+        if resp.status_code == 304 and cached:
+            self.etag_counters.incr('hits')
+            return cached[1]
+        self.etag_counters.incr('misses')
         if resp.status_code == 200:
-            return base64.decodebytes(resp.json()[u'content'].encode('utf-8'))
+            value = parse(resp)
+            etag = resp.headers.get('ETag')
+            if etag and self.etag_cache is not None:
+                self.etag_cache.put(cache_key, (etag, value))
+            return value
         elif resp.status_code == 404:
+            if cached:
+                self.etag_cache.invalidate(cache_key)
             return None
         else:
             hub_response = {
@@ -65,6 +202,86 @@ class GithubConfigProvider(AbstractConfigProvider):
             }
             raise GithubFetchException(hub_response)
 
+    def _github_fetch(self, owner, repo, ref, name):
+        """
+        Fetches the raw totem config for a given owner, repo, ref and name.
+
+        :param name: Name of totem config (totem.yml)
+        :type name: str
+        :return: Raw totem config
+        :rtype: str
+        :raises GithubFetchException: If fetch fails
+        """
+        return self._github_get(
+            self.config_base + name, owner, repo, ref,
+            lambda resp: base64.decodebytes(
+                resp.json()[u'content'].encode('utf-8')))
+
+    def _github_list(self, owner, repo, ref):
+        """
+        Lists the names of the files in config_base directory for a given
+        owner, repo and ref.
+
+        :return: Set of file names or None if config_base is not a directory.
+        :rtype: set
+        :raises GithubFetchException: If fetch fails
+        """
+        def parse(resp):
+            entries = resp.json()
+            if not isinstance(entries, list):
+                return None
+            return frozenset(entry[u'name'] for entry in entries
+                             if entry.get(u'type') == u'file')
+
+        return self._github_get(self.config_base.rstrip('/'), owner, repo,
+                                ref, parse)
+
+    def _track_tag(self, cache_key, raw):
+        """
+        Promotes the config for a tag to the immutable cache once it has
+        remained unchanged for the grace period.
+        """
+        now = time.time()
+        first_seen, seen_raw = self._pending_tags.get(cache_key, (now, raw))
+        if seen_raw != raw:
+            first_seen = now
+        if now - first_seen >= self.tag_grace_period:
+            self.immutable_cache.put(cache_key, raw)
+            self._pending_tags.invalidate(cache_key)
+        else:
+            self._pending_tags.put(cache_key, (first_seen, raw))
+
+    def _is_immutable(self, ref):
+        return bool(COMMIT_SHA_PATTERN.match(ref) or
+                    (self.tag_pattern and self.tag_pattern.match(ref)))
+
+    def _fetch(self, owner, repo, ref, name):
+        """
+        Fetches the raw totem config using the immutable cache for commit
+        SHAs (and tags if configured). Missing configs are not cached as
+        immutable (see negative_cache).
+
+        :return: Raw totem config or None if it does not exist.
+        """
+        if not self.immutable_cache or not self._is_immutable(ref):
+            return self._github_fetch(owner, repo, ref, name)
+
+        cache_key = (owner, repo, ref, self.config_base + name)
+        raw = self.immutable_cache.get(cache_key)
+        if raw is not None:
+            return raw
+
+        raw = self._github_fetch(owner, repo, ref, name)
+        if raw is not None:
+            self._cache_immutable(cache_key, ref, raw)
+        return raw
+
+    def _cache_immutable(self, cache_key, ref, raw):
+        if COMMIT_SHA_PATTERN.match(ref):
+            self.immutable_cache.put(cache_key, raw)
+        elif self.tag_pattern and self.tag_pattern.match(ref):
+            self._track_tag(cache_key, raw)
+
     def load(self, name, *paths):
         """
         Loads the config for given paths. Github provider only supports
@@ -81,12 +298,61 @@ class GithubConfigProvider(AbstractConfigProvider):
             return {}
         else:
             owner, repo, ref = paths[1:4]
-        raw = self._github_fetch(owner, repo, ref, name)
+        if self.negative_cache and \
+                self.negative_cache.is_missing(name, owner, repo, ref):
+            return {}
+        raw = self._fetch(owner, repo, ref, name)
+        if not raw and self.negative_cache:
+            self.negative_cache.add(name, owner, repo, ref)
         if raw:
-            return yaml.load(raw)
+            return load_yaml(raw)
         else:
             return {}
 
+    def load_many(self, names, *paths):
+        """
+        Loads multiple configs for given paths. Configs not found in the
+        immutable cache are looked up using a single listing of config_base
+        directory, so that only the existing configs are fetched.
+
+        :param names: Names of the config files.
+        :type names: list
+        :param paths: Paths used for loading config (owner, repo, and ref):
+        :type paths: tuple
+        :return: Dictionary of config name => totem config
+        :rtype: dict
+        """
+        if len(paths) < 4:
+            return {name: {} for name in names}
+        owner, repo, ref = paths[1:4]
+        use_immutable_cache = self.immutable_cache and \
+            self._is_immutable(ref)
+        raws, pending = {}, []
+        for name in names:
+            raw = self.immutable_cache.get(
+                (owner, repo, ref, self.config_base + name)) \
+                if use_immutable_cache else None
+            if raw is not None:
+                raws[name] = raw
+            elif self.negative_cache and \
+                    self.negative_cache.is_missing(name, owner, repo, ref):
+                raws[name] = b''
+            else:
+                pending.append(name)
+
+        # Listing is only worthwhile when fetching more than one config
+        existing = self._github_list(owner, repo, ref) \
+            if len(pending) > 1 else None
+        for name in pending:
+            if existing is None or name in existing:
+                raws[name] = self._fetch(owner, repo, ref, name)
+            else:
+                raws[name] = None
+            if not raws[name] and self.negative_cache:
+                self.negative_cache.add(name, owner, repo, ref)
+        return {name: load_yaml(raw) if raw else {}
+                for name, raw in raws.items()}
+
 
 class GithubFetchException(Exception):
     """
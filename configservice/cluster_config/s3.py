@@ -5,17 +5,43 @@ from future.builtins import (  # noqa
     ascii, chr, hex, input, next, oct, open,
     pow, round, super,
     filter, map, zip)
+import socket
+import threading
+from future.moves.http.client import HTTPException
 import boto
+from boto.exception import S3ResponseError
 from boto.s3.key import Key
-import yaml
 from configservice.cluster_config.base import AbstractConfigProvider
+from configservice.metrics import Counters
+from configservice.serialization import dump_yaml, load_yaml
 
 
 class S3ConfigProvider(AbstractConfigProvider):
 
-    def __init__(self, bucket, config_base='totem/config'):
+    supports_load_many = True
+
+    def __init__(self, bucket, config_base='totem/config',
+                 connection_kwargs=None, negative_cache=None):
+        """
+        :param bucket: S3 bucket name
+        :type bucket: str
+        :keyword config_base: Base path for the configs in the bucket.
+        :type config_base: str
+        :keyword connection_kwargs: Optional keyword arguments for S3
+            connection (like host, port and is_secure for S3 compatible
+            endpoints).
+        :type connection_kwargs: dict
+        :keyword negative_cache: Optional cache of missing configs.
+        :type negative_cache: configservice.cache.NegativeCache
+        """
         self.bucket = bucket
         self.config_base = config_base
+        self.connection_kwargs = connection_kwargs or {}
+        self.negative_cache = negative_cache
+        self.counters = Counters('connect', 'reconnect', 'get', 'head', 'put',
+                                 'delete', 'list')
+        self._bucket = None
+        self._lock = threading.Lock()
 
     def _s3_path(self, name, *paths):
         if paths:
@@ -24,40 +50,139 @@ class S3ConfigProvider(AbstractConfigProvider):
         else:
             return '%s/%s' % (self.config_base, name)
 
-    @staticmethod
-    def _s3_connection():
+    def _s3_connection(self):
         # Use default env variable or IAM roles to connect to S3.
-        return boto.connect_s3()
+        return boto.connect_s3(**self.connection_kwargs)
 
     def _s3_bucket(self):
         """
-        Gets S3 bucket for storing totem configuration.
+        Gets S3 bucket for storing totem configuration. The connection and
+        bucket handle are created once (without validating the bucket) and
+        reused for subsequent calls.
 
         :return: S3 Bucket
         :rtype: S3Bucket
         """
-        return self._s3_connection().get_bucket(self.bucket)
+        if self._bucket is None:
+            with self._lock:
+                if self._bucket is None:
+                    self.counters.incr('connect')
+                    self._bucket = self._s3_connection().get_bucket(
+                        self.bucket, validate=False)
+        return self._bucket
+
+    def _call(self, operation, func):
+        """
+        Invokes the S3 operation using the cached bucket. If the connection
+        fails, the bucket handle is re-created and operation is retried once.
+
+        :param operation: Name of the operation (for metrics)
+        :type operation: str
+        :param func: Function accepting bucket as the argument.
+        :return: Result of the function
+        """
+        self.counters.incr(operation)
+        try:
+            return func(self._s3_bucket())
+        except (socket.error, HTTPException):
+            self.counters.incr('reconnect')
+            self._bucket = None
+            return func(self._s3_bucket())
 
     def _get_key(self, name, *paths):
         key_path = self._s3_path(name, *paths)
-        return self._s3_bucket().get_key(key_path)
+        return self._call('head', lambda bucket: bucket.get_key(key_path))
 
     def write(self, name, config, *paths):
-        key = Key(self._s3_bucket())
-        key.key = self._s3_path(name, *paths)
-        key.set_contents_from_string(yaml.dump(config))
+        def put(bucket):
+            key = Key(bucket)
+            key.key = self._s3_path(name, *paths)
+            key.set_contents_from_string(dump_yaml(config))
+        self._call('put', put)
+        if self.negative_cache:
+            self.negative_cache.invalidate(name, *paths)
 
     def load(self, name, *paths):
-        key = self._get_key(name, *paths)
-        if key:
-            raw = key.get_contents_as_string()
-            return yaml.load(raw)
+        if self.negative_cache and \
+                self.negative_cache.is_missing(name, *paths):
+            return {}
+        key_path = self._s3_path(name, *paths)
+
+        def get(bucket):
+            try:
+                return Key(bucket, key_path).get_contents_as_string()
+            except S3ResponseError as error:
+                if error.status == 404:
+                    return None
+                raise
+
+        raw = self._call('get', get)
+        if raw is None and self.negative_cache:
+            self.negative_cache.add(name, *paths)
+        if raw:
+            return load_yaml(raw)
         else:
             return {}
 
+    def load_many(self, names, *paths):
+        """
+        Loads multiple configs at given path. A single listing of the path
+        prefix is used for finding the existing configs, so that only those
+        are fetched.
+        """
+        if len(names) <= 1:
+            return AbstractConfigProvider.load_many(self, names, *paths)
+        if self.negative_cache and \
+                self.negative_cache.all_missing(names, *paths):
+            return {name: {} for name in names}
+        prefix = self._s3_path('', *paths)
+        existing = set(
+            item.name[len(prefix):] for item in self._call(
+                'list', lambda bucket: list(
+                    bucket.list(prefix=prefix, delimiter='/'))))
+        if self.negative_cache:
+            for name in names:
+                if name not in existing:
+                    self.negative_cache.add(name, *paths)
+        return {name: self.load(name, *paths) if name in existing else {}
+                for name in names}
+
+    def export(self):
+        """
+        Iterates over all configs under config_base using a listing of the
+        prefix.
+        """
+        prefix = self.config_base.strip('/') + '/'
+        key_names = self._call('list', lambda bucket: [
+            key.name for key in bucket.list(prefix=prefix)])
+        for key_name in key_names:
+            parts = key_name[len(prefix):].split('/')
+            if not parts[-1]:
+                continue
+            raw = self._call('get', lambda bucket: Key(
+                bucket, key_name).get_contents_as_string())
+            yield parts[-1], tuple(parts[:-1]), raw
+
     def delete(self, name, *paths):
         key = self._get_key(name, *paths)
         if key:
-            key.delete()
+            # Key is bound to the bucket of the original call, which may have
+            # been re-created on retry.
+            self._call('delete',
+                       lambda bucket: Key(bucket, key.name).delete())
             return True
         return False
+
+    def stats(self):
+        """
+        Gets the S3 request counts per operation and negative cache
+        statistics.
+
+        :return: Dictionary of statistics
+        :rtype: dict
+        """
+        return {
+            'requests': self.counters.to_dict(),
+            'negative_cache': self.negative_cache.stats()
+            if self.negative_cache else None
+        }
@@ -0,0 +1,249 @@
+"""
+Read only config provider backed by a compiled snapshot file.
+
+A snapshot holds the raw configs of all levels (exported from other
+providers like etcd and S3) along with an index of their location in the
+file. Workers memory map the file, so the configs are shared by all the
+processes on a node using a single page cache copy. Snapshots are published
+by atomically renaming a new file over the existing one and workers switch to
+the new file on their next check.
+
+File layout::
+
+    magic (8 bytes) | index length (8 bytes, big endian) | index (json) | data
+
+The index maps the config key (level path and name joined by '/') to the
+offset (from start of data) and length of its raw content.
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from configservice.cluster_config.base import AbstractConfigProvider
+from configservice.metrics import Counters
+from configservice.serialization import dump_yaml, load_yaml
+from configservice.util import dict_merge
+
+SNAPSHOT_MAGIC = b'CFGSNAP1'
+
+_HEADER = struct.Struct('>8sQ')
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_key(name, *paths):
+    return '/'.join(paths + (name,))
+
+
+class SnapshotFormatError(Exception):
+    """
+    Error raised when the file is not a valid config snapshot.
+    """
+    pass
+
+
+class Snapshot(object):
+    """
+    Memory mapped snapshot file. The file is mapped once and unmapped when
+    the instance is garbage collected, so loads in progress can safely
+    continue to read from a snapshot that got replaced.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as snapshot_file:
+            stat = os.fstat(snapshot_file.fileno())
+            self.inode = (stat.st_dev, stat.st_ino)
+            self.size_bytes = stat.st_size
+            if stat.st_size < _HEADER.size:
+                raise SnapshotFormatError(
+                    'Snapshot: {0} is truncated'.format(path))
+            self._mmap = mmap.mmap(snapshot_file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        magic, index_length = _HEADER.unpack(self._mmap[:_HEADER.size])
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotFormatError(
+                'File: {0} is not a config snapshot'.format(path))
+        self._data_start = _HEADER.size + index_length
+        self.index = json.loads(
+            self._mmap[_HEADER.size:self._data_start].decode('utf-8'))
+
+    def get(self, key):
+        """
+        :param key: Config key (see snapshot_key)
+        :return: Raw config or None if not found.
+        :rtype: bytes
+        """
+        location = self.index.get(key)
+        if location is None:
+            return None
+        start = self._data_start + location[0]
+        return self._mmap[start:start + location[1]]
+
+
+def write_snapshot(path, entries):
+    """
+    Writes the snapshot atomically (using a temporary file in the same
+    directory which is then renamed).
+
+    :param path: Path of the snapshot file
+    :type path: str
+    :param entries: Dictionary of config key (see snapshot_key) => raw config
+    :type entries: dict
+    :return: None
+    """
+    index, offset = {}, 0
+    for key in sorted(entries):
+        index[key] = [offset, len(entries[key])]
+        offset += len(entries[key])
+    raw_index = json.dumps(index, sort_keys=True).encode('utf-8')
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as snapshot_file:
+            snapshot_file.write(_HEADER.pack(SNAPSHOT_MAGIC, len(raw_index)))
+            snapshot_file.write(raw_index)
+            for key in sorted(entries):
+                snapshot_file.write(entries[key])
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.rename(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def build_snapshot(path, *providers):
+    """
+    Builds the snapshot from the configs exported by the providers. If the
+    same config exists in multiple providers, the configs are merged with
+    earlier providers taking precedence (as in MergedConfigProvider).
+
+    :param path: Path of the snapshot file
+    :type path: str
+    :param providers: Providers supporting export (like etcd and S3)
+    :return: Number of configs in the snapshot
+    :rtype: int
+    """
+    entries = {}
+    merged = set()
+    for provider in providers:
+        for name, paths, raw in provider.export():
+            if not isinstance(raw, bytes):
+                raw = raw.encode('utf-8')
+            key = snapshot_key(name, *paths)
+            if key not in entries:
+                entries[key] = raw
+                continue
+            merged.add(key)
+            entries[key] = dump_yaml(dict_merge(
+                load_yaml(entries[key]) or {}, load_yaml(raw) or {}))\
+                .encode('utf-8')
+    if merged:
+        logger.info('Merged %d configs found in multiple providers',
+                    len(merged))
+    write_snapshot(path, entries)
+    return len(entries)
+
+
+class SnapshotConfigProvider(AbstractConfigProvider):
+    """
+    Read only config provider backed by a memory mapped snapshot file (see
+    build_snapshot). If the file does not exist, empty configs are returned
+    until it gets published.
+    """
+
+    supports_load_levels = True
+    supports_load_many = True
+
+    def __init__(self, path, check_interval=5):
+        """
+        :param path: Path of the snapshot file
+        :type path: str
+        :param check_interval: Interval in seconds at which the file is
+            checked for a newly published snapshot.
+        :type check_interval: number
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self.counters = Counters('hits', 'misses', 'reloads', 'errors')
+        self._snapshot = None
+        self._checked_at = None
+        self._loaded_at = None
+        # Invalid snapshot file is not reloaded until it gets replaced
+        self._failed_inode = None
+        self._lock = threading.Lock()
+
+    def _current(self):
+        """
+        Gets the current snapshot, switching to a newly published snapshot
+        if one is found.
+
+        :return: Snapshot or None if not available.
+        :rtype: Snapshot
+        """
+        now = time.time()
+        if self._checked_at is not None and \
+                now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            if self._checked_at is None or \
+                    now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                self._reload()
+        return self._snapshot
+
+    def _reload(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        inode = (stat.st_dev, stat.st_ino)
+        snapshot = self._snapshot
+        if (snapshot and snapshot.inode == inode) or \
+                inode == self._failed_inode:
+            return
+        try:
+            self._snapshot = Snapshot(self.path)
+            self._loaded_at = time.time()
+            self.counters.incr('reloads')
+        except (IOError, OSError, ValueError, SnapshotFormatError):
+            # Keep serving the existing snapshot
+            self._failed_inode = inode
+            self.counters.incr('errors')
+            logger.exception('Failed to load config snapshot: %s',
+                             self.path)
+
+    def load(self, name, *paths):
+        snapshot = self._current()
+        raw = snapshot.get(snapshot_key(name, *paths)) if snapshot else None
+        if raw is None:
+            self.counters.incr('misses')
+            return {}
+        self.counters.incr('hits')
+        return load_yaml(raw) or {}
+
+    def stats(self):
+        snapshot = self._snapshot
+        stats = self.counters.to_dict()
+        stats.update({
+            'path': self.path,
+            'entries': len(snapshot.index) if snapshot else 0,
+            'size_bytes': snapshot.size_bytes if snapshot else 0,
+            'loaded_at': self._loaded_at
+        })
+        return stats
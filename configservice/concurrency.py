@@ -0,0 +1,302 @@
+"""
+Pluggable executors used for fanning out calls to config providers.
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+
+from collections import deque
+import logging
+import multiprocessing
+import threading
+from multiprocessing.pool import ThreadPool
+
+from configservice.exceptions import ConfigServiceError
+from configservice.metrics import Counters
+
+EXECUTOR_SERIAL = 'serial'
+EXECUTOR_THREAD = 'thread'
+EXECUTOR_GEVENT = 'gevent'
+
+logger = logging.getLogger(__name__)
+
+
+class TaskTimeout(ConfigServiceError):
+    """
+    Error raised when a submitted task does not complete within the given
+    timeout.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        super(TaskTimeout, self).__init__(
+            'Task did not complete within {0} seconds'.format(timeout),
+            code='TASK_TIMEOUT', details={'timeout': timeout})
+
+
+class SerialExecutor(object):
+    """
+    Executor that runs the task in the calling thread/greenlet at the time
+    its result is requested. Timeouts are not enforced.
+    """
+
+    def submit(self, func, *args, **kwargs):
+        return _DeferredTask(func, args, kwargs)
+
+
+class ThreadPoolExecutor(object):
+    """
+    Executor backed by a pool of threads. The pool is created lazily so that
+    no threads are started before uwsgi forks the workers.
+    """
+
+    def __init__(self, pool_size=10):
+        self.pool_size = pool_size
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPool(self.pool_size)
+        return self._pool
+
+    def submit(self, func, *args, **kwargs):
+        return _AsyncTask(self.pool.apply_async(func, args, kwargs))
+
+
+class GeventExecutor(object):
+    """
+    Executor backed by a pool of greenlets. Meant to be used when running
+    under uwsgi with gevent loop engine.
+    """
+
+    def __init__(self, pool_size=100):
+        from gevent.pool import Pool
+        self.pool_size = pool_size
+        self._pool = Pool(pool_size)
+
+    def submit(self, func, *args, **kwargs):
+        return _GreenletTask(self._pool.spawn(func, *args, **kwargs))
+
+
+class _DeferredTask(object):
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self._call = None
+
+    def get(self, timeout=None):
+        # Task runs only once even if result is requested multiple times.
+        if self._call is None:
+            self._call = _Call()
+            try:
+                self._call.result = self.func(*self.args, **self.kwargs)
+            except Exception as error:
+                self._call.error = error
+            self._call.done.set()
+        return self._call.wait()
+
+
+class _AsyncTask(object):
+
+    def __init__(self, async_result):
+        self.async_result = async_result
+
+    def get(self, timeout=None):
+        try:
+            return self.async_result.get(timeout)
+        except multiprocessing.TimeoutError:
+            raise TaskTimeout(timeout)
+
+
+class _GreenletTask(object):
+
+    def __init__(self, greenlet):
+        self.greenlet = greenlet
+
+    def get(self, timeout=None):
+        import gevent
+        try:
+            result = self.greenlet.get(timeout=timeout)
+        except gevent.Timeout:
+            # Greenlet is not killed as the task may be shared by other
+            # waiters (see TaskMemo).
+            raise TaskTimeout(timeout)
+        if isinstance(result, gevent.GreenletExit):
+            # Killed elsewhere, so the task has no result.
+            raise TaskTimeout(timeout)
+        return result
+
+
+class TaskMemo(object):
+    """
+    Shares the tasks submitted for the same key. Used for sharing common loads
+    between the items of a batch.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tasks = {}
+        self.counters = Counters('submitted', 'shared')
+
+    def submit(self, key, executor, func, *args, **kwargs):
+        """
+        Submits the function to the executor unless a task for the same key
+        was already submitted.
+
+        :param key: Hashable key
+        :param executor: Executor used for submitting the task
+        :param func: Function to be invoked
+        :return: Task
+        """
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None:
+                self.counters.incr('submitted')
+                task = self._tasks[key] = executor.submit(
+                    func, *args, **kwargs)
+            else:
+                self.counters.incr('shared')
+        return task
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls for the same key, so that only one call runs
+    at a time for a given key and other callers wait for its result.
+    Threads are patched to greenlets when running under uwsgi with gevent.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.counters = Counters('calls', 'coalesced', 'background')
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Invokes the function unless a call for the same key is already in
+        progress, in which case it waits for that call and returns its
+        result (or raises its error).
+
+        :param key: Hashable key
+        :param func: Function to be invoked
+        :return: Result of the function
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            self.counters.incr('coalesced')
+            return call.wait()
+        self.counters.incr('calls')
+        return self._run(key, call, func, args, kwargs)
+
+    def spawn(self, key, func, *args, **kwargs):
+        """
+        Invokes the function in background unless a call for the same key is
+        already in progress.
+
+        :param key: Hashable key
+        :param func: Function to be invoked
+        :return: True if the function was scheduled, False otherwise.
+        :rtype: bool
+        """
+        with self._lock:
+            if key in self._calls:
+                return False
+            call = self._calls[key] = _Call()
+        self.counters.incr('background')
+        thread = threading.Thread(target=self._run_background,
+                                  args=(key, call, func, args, kwargs))
+        thread.daemon = True
+        thread.start()
+        return True
+
+    def _run(self, key, call, func, args, kwargs):
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _run_background(self, key, call, func, args, kwargs):
+        try:
+            self._run(key, call, func, args, kwargs)
+        except Exception:
+            logger.exception('Background call for key: %r failed', key)
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def imap(executor, func, iterable, window):
+    """
+    Lazily submits the function for each item to the executor keeping at
+    most window tasks in flight, so that large inputs neither block the
+    submitter (gevent pool) nor get buffered by the executor (thread pool).
+
+    :param executor: Executor used for submitting the tasks
+    :param func: Function to be invoked with each item
+    :param iterable: Items
+    :param window: Maximum number of tasks submitted but not yet consumed.
+        Should not exceed the pool size of the executor.
+    :type window: int
+    :return: Generator yielding the results in the order of items
+    """
+    tasks = deque()
+    for item in iterable:
+        if len(tasks) >= window:
+            yield tasks.popleft().get()
+        tasks.append(executor.submit(func, item))
+    while tasks:
+        yield tasks.popleft().get()
+
+
+def get_executor(executor_type=EXECUTOR_SERIAL, pool_size=10):
+    """
+    Factory method to create executor instance.
+
+    :param executor_type: Type of executor (serial, thread or gevent)
+    :type executor_type: str
+    :param pool_size: Maximum number of tasks running concurrently. Not
+        applicable for serial executor.
+    :type pool_size: int
+    :return: Executor instance
+    :raise ValueError: If executor type is not supported
+    """
+    if executor_type == EXECUTOR_SERIAL:
+        return SerialExecutor()
+    elif executor_type == EXECUTOR_THREAD:
+        return ThreadPoolExecutor(pool_size=pool_size)
+    elif executor_type == EXECUTOR_GEVENT:
+        return GeventExecutor(pool_size=pool_size)
+    raise ValueError('Unsupported executor type: %s' % executor_type)
@@ -0,0 +1,431 @@
+"""
+Lightweight in-process metrics used for instrumenting providers.
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+
+from collections import OrderedDict
+import bisect
+import contextlib
+import copy
+import errno
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Counters(object):
+    """
+    Thread safe named counters.
+    """
+
+    def __init__(self, *names):
+        """
+        :param names: Names of the counters to be initialized with zero
+        """
+        self._lock = threading.Lock()
+        self._counts = {name: 0 for name in names}
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + value
+
+    def get(self, name):
+        return self._counts.get(name, 0)
+
+    def to_dict(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+class LatencyStats(object):
+    """
+    Thread safe latency aggregates (in seconds).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.min = seconds if self.min is None else min(self.min,
+                                                            seconds)
+            self.max = seconds if self.max is None else max(self.max,
+                                                            seconds)
+
+    @contextlib.contextmanager
+    def time(self):
+        """
+        Context manager recording the time taken by the wrapped block.
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(time.time() - start)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'count': self.count,
+                'total': self.total,
+                'avg': self.total / self.count if self.count else None,
+                'min': self.min,
+                'max': self.max
+            }
+
+
+class Histogram(object):
+    """
+    Thread safe latency histogram (in seconds) with fixed buckets (as used
+    by Prometheus).
+    """
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                       5.0, 10.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        :param buckets: Upper bounds of the buckets (in increasing order).
+            Observations above the last bound are counted in +Inf bucket.
+        """
+        self._lock = threading.Lock()
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += seconds
+
+    def to_dict(self):
+        """
+        :return: Dictionary with cumulative bucket counts (as list of upper
+            bound and count), sum and count.
+        :rtype: dict
+        """
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = [sum(counts[:index + 1]) for index in range(len(counts))]
+        return {
+            'buckets': [[bound, count] for bound, count in
+                        zip(list(self.bounds) + ['+Inf'], cumulative)],
+            'sum': total,
+            'count': cumulative[-1]
+        }
+
+
+class ProviderMetrics(object):
+    """
+    Latency histograms and error counts (by exception type) for the
+    operations of config providers.
+    """
+
+    OPERATIONS = ('load', 'load_levels', 'load_many', 'load_many_levels',
+                  'write', 'delete', 'delete_tree')
+
+    def __init__(self, buckets=Histogram.DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.errors = Counters()
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, provider_type, operation):
+        key = (provider_type, operation)
+        if key not in self._histograms:
+            with self._lock:
+                self._histograms.setdefault(key, Histogram(self.buckets))
+        return self._histograms[key]
+
+    def instrument(self, provider, provider_type):
+        """
+        Wraps the operations of the provider instance (in place) for
+        recording their latency and errors. Only the outermost operation is
+        recorded when operations call each other (e.g. load_many calling
+        load), so that one logical load is recorded once.
+
+        :param provider: Config provider instance
+        :param provider_type: Type of provider (used as label)
+        :type provider_type: str
+        :return: Instrumented provider
+        """
+        active = threading.local()
+        for operation in self.OPERATIONS:
+            if (operation in ('load_levels', 'load_many_levels') and
+                    not provider.supports_load_levels) or \
+                    (operation == 'load_many' and
+                     not provider.supports_load_many):
+                # Default implementation delegates to (instrumented) load
+                continue
+            if hasattr(provider, operation):
+                setattr(provider, operation, self._timed(
+                    provider_type, operation, getattr(provider, operation),
+                    active))
+        return provider
+
+    def _timed(self, provider_type, operation, func, active):
+        histogram = self.histogram(provider_type, operation)
+
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            if getattr(active, 'operation', None):
+                # Nested call from another operation of the same provider
+                return func(*args, **kwargs)
+            active.operation = operation
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            except Exception as error:
+                self.errors.incr((provider_type, operation,
+                                  error.__class__.__name__))
+                raise
+            finally:
+                histogram.observe(time.time() - start)
+                active.operation = None
+        return inner
+
+    def samples(self):
+        """
+        Gets the recorded metrics as samples (see render_prometheus).
+
+        :return: Dictionary of counter and histogram samples
+        :rtype: dict
+        """
+        return {
+            'counters': [
+                ['configservice_provider_errors_total',
+                 {'provider': provider_type, 'operation': operation,
+                  'error': error}, count]
+                for (provider_type, operation, error), count in
+                self.errors.to_dict().items()
+            ],
+            'histograms': [
+                ['configservice_provider_duration_seconds',
+                 {'provider': provider_type, 'operation': operation},
+                 histogram.to_dict()]
+                for (provider_type, operation), histogram in
+                list(self._histograms.items())
+            ]
+        }
+
+
+def cache_samples(stats, prefix=''):
+    """
+    Finds the cache statistics (dictionaries having hits and misses) in the
+    nested statistics and gets them as counter samples.
+
+    :param stats: Nested statistics (e.g. from stats() of providers)
+    :type stats: dict
+    :param prefix: Name of the cache for the top level statistics.
+    :type prefix: str
+    :return: List of counter samples
+    :rtype: list
+    """
+    samples = []
+    if not isinstance(stats, dict):
+        return samples
+    if 'hits' in stats and 'misses' in stats:
+        for counter, result in (('hits', 'hit'), ('misses', 'miss')):
+            samples.append(['configservice_cache_requests_total',
+                            {'cache': prefix, 'result': result},
+                            stats[counter]])
+    for key, value in stats.items():
+        samples.extend(cache_samples(
+            value, '{0}.{1}'.format(prefix, key) if prefix else key))
+    return samples
+
+
+def _sample_key(sample):
+    return sample[0], tuple(sorted(sample[1].items()))
+
+
+def aggregate(snapshots):
+    """
+    Aggregates the samples from multiple snapshots (e.g. from all worker
+    processes) by summing the counters and histogram buckets with same name
+    and labels.
+
+    :param snapshots: List of sample dictionaries (see
+        ProviderMetrics.samples)
+    :return: Aggregated samples dictionary
+    :rtype: dict
+    """
+    counters, histograms = OrderedDict(), OrderedDict()
+    for snapshot in snapshots:
+        for sample in snapshot.get('counters', []):
+            key = _sample_key(sample)
+            if key in counters:
+                counters[key][2] += sample[2]
+            else:
+                counters[key] = list(sample)
+        for sample in snapshot.get('histograms', []):
+            key = _sample_key(sample)
+            if key in histograms:
+                merged = histograms[key][2]
+                for bucket, other in zip(merged['buckets'],
+                                         sample[2]['buckets']):
+                    bucket[1] += other[1]
+                merged['sum'] += sample[2]['sum']
+                merged['count'] += sample[2]['count']
+            else:
+                histograms[key] = copy.deepcopy(list(sample))
+    return {
+        'counters': list(counters.values()),
+        'histograms': list(histograms.values())
+    }
+
+
+_HELP = {
+    'configservice_provider_errors_total':
+        'Errors raised by provider operations by exception type.',
+    'configservice_provider_duration_seconds':
+        'Latency of provider operations.',
+    'configservice_cache_requests_total': 'Cache lookups by result.',
+    'configservice_cache_hit_ratio': 'Ratio of cache hits to lookups.',
+    'configservice_backend_calls_saved_total':
+        'Backend calls avoided using cached results.',
+}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{0}="{1}"'.format(name, str(value).replace('\\', r'\\')
+                           .replace('"', r'\"').replace('\n', r'\n'))
+        for name, value in sorted(labels.items())) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(samples):
+    """
+    Renders the samples in Prometheus text exposition format (version
+    0.0.4). Hit ratio gauges are derived from the cache counters.
+
+    :param samples: Samples dictionary (see aggregate)
+    :type samples: dict
+    :return: Metrics text
+    :rtype: str
+    """
+    families = OrderedDict()
+    lookups = OrderedDict()
+    for name, labels, value in samples.get('counters', []):
+        families.setdefault((name, 'counter'), []).append(
+            name + _format_labels(labels) + ' ' + _format_value(value))
+        if name == 'configservice_cache_requests_total':
+            hits, total = lookups.get(labels['cache'], (0, 0))
+            lookups[labels['cache']] = (
+                hits + (value if labels['result'] == 'hit' else 0),
+                total + value)
+    for name, labels, histogram in samples.get('histograms', []):
+        lines = families.setdefault((name, 'histogram'), [])
+        for bound, count in histogram['buckets']:
+            bucket_labels = dict(labels, le=_format_value(bound))
+            lines.append(name + '_bucket' + _format_labels(bucket_labels) +
+                         ' ' + str(count))
+        lines.append(name + '_sum' + _format_labels(labels) + ' ' +
+                     _format_value(histogram['sum']))
+        lines.append(name + '_count' + _format_labels(labels) + ' ' +
+                     str(histogram['count']))
+    for cache, (hits, total) in lookups.items():
+        families.setdefault(('configservice_cache_hit_ratio', 'gauge'), []) \
+            .append('configservice_cache_hit_ratio' +
+                    _format_labels({'cache': cache}) + ' ' +
+                    _format_value(float(hits) / total if total else 0.0))
+
+    output = []
+    for (name, metric_type), lines in families.items():
+        output.append('# HELP {0} {1}'.format(name, _HELP.get(name, name)))
+        output.append('# TYPE {0} {1}'.format(name, metric_type))
+        output.extend(lines)
+    return '\n'.join(output) + '\n'
+
+
+class SnapshotStore(object):
+    """
+    Stores the metric samples of each worker process in a file (named after
+    its pid) in a shared directory, so that metrics can be aggregated across
+    the uwsgi workers.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # Created by another worker
+                pass
+
+    def save(self, samples, pid=None):
+        """
+        Saves the samples for the given (or current) process.
+
+        :return: None
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+        with os.fdopen(fd, 'w') as snapshot_file:
+            snapshot_file.write(json.dumps(samples))
+        os.rename(tmp_path, os.path.join(
+            self.directory, '{0}.json'.format(pid or os.getpid())))
+
+    def load_all(self):
+        """
+        Loads the snapshots of all the live processes. Snapshots of the
+        processes that no longer exist are removed.
+
+        :return: List of samples dictionaries
+        :rtype: list
+        """
+        snapshots = []
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith('.json'):
+                continue
+            file_path = os.path.join(self.directory, file_name)
+            try:
+                pid = int(file_name[:-len('.json')])
+            except ValueError:
+                continue
+            if not _is_alive(pid):
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(file_path) as snapshot_file:
+                    snapshots.append(json.loads(snapshot_file.read()))
+            except (IOError, OSError, ValueError):
+                logger.warning('Ignoring invalid metrics snapshot: %s',
+                               file_path)
+        return snapshots
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as error:
+        return error.errno == errno.EPERM
+    return True
@@ -0,0 +1,99 @@
+"""
+Shared YAML serialization for config providers. Uses libyaml based safe
+loader/dumper when available and falls back to pure python implementation.
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+
+import hashlib
+
+import repoze.lru
+import yaml
+from conf.appconfig import YAML_PARSE_CACHE_SIZE
+from configservice.metrics import Counters
+
+try:
+    from yaml import CSafeLoader as _BaseLoader, CSafeDumper as _BaseDumper
+    LIBYAML = True
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader as _BaseLoader, SafeDumper as _BaseDumper
+    LIBYAML = False
+
+
+class ConfigLoader(_BaseLoader):
+    pass
+
+
+class ConfigDumper(_BaseDumper):
+    pass
+
+
+# Represent dictionary subclasses (like FrozenDict) as plain mappings.
+ConfigDumper.add_multi_representer(dict, ConfigDumper.represent_dict)
+
+_MISSING = object()
+_parse_cache = repoze.lru.LRUCache(YAML_PARSE_CACHE_SIZE) \
+    if YAML_PARSE_CACHE_SIZE else None
+parse_cache_counters = Counters('hits', 'misses')
+
+
+def _digest(raw):
+    if not isinstance(raw, bytes):
+        raw = raw.encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()
+
+
+def load_yaml(raw):
+    """
+    Parses the raw yaml. Parsed documents are cached (per worker) using the
+    hash of the raw content, so identical content is parsed only once.
+
+    The returned document may be shared with other callers and must be
+    treated as read only.
+
+    :param raw: Raw yaml
+    :type raw: str or bytes
+    :return: Parsed document
+    """
+    if not raw:
+        return None
+    if _parse_cache is None:
+        return yaml.load(raw, Loader=ConfigLoader)
+
+    digest = _digest(raw)
+    parsed = _parse_cache.get(digest, _MISSING)
+    if parsed is _MISSING:
+        parse_cache_counters.incr('misses')
+        parsed = yaml.load(raw, Loader=ConfigLoader)
+        _parse_cache.put(digest, parsed)
+    else:
+        parse_cache_counters.incr('hits')
+    return parsed
+
+
+def dump_yaml(config):
+    """
+    Serializes the config as yaml.
+
+    :param config: Config to be serialized
+    :type config: dict
+    :return: Yaml string
+    :rtype: str
+    """
+    return yaml.dump(config, Dumper=ConfigDumper)
+
+
+def stats():
+    """
+    :return: Parse cache statistics
+    :rtype: dict
+    """
+    return {
+        'libyaml': LIBYAML,
+        'parse_cache': parse_cache_counters.to_dict()
+    }
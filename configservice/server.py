@@ -2,7 +2,16 @@ from __future__ import absolute_import
 from flask import Flask
 from flask.ext.cors import CORS
 from conf.appconfig import CORS_SETTINGS
-from configservice.views import root, hypermedia, provider, config, error
+from configservice.services.config import start_metrics_snapshots, \
+    start_warmup, start_watcher
+from configservice.views import root, hypermedia, provider, config, error, \
+    metrics
+
+try:
+    import uwsgidecorators
+except ImportError:
+    # Not running under uwsgi
+    uwsgidecorators = None
 
 app = Flask(__name__)
 
@@ -12,5 +21,22 @@ hypermedia.register_schema_api(app).register_error_handlers(app)
 if CORS_SETTINGS['enabled']:
     CORS(app, resources={'/*': {'origins': CORS_SETTINGS['origins']}})
 
-for module in [root, provider, config, error]:
+for module in [root, provider, config, metrics, error]:
     module.register(app)
+
+
+def init_worker():
+    """
+    Warms up the config cache and starts the background tasks for the
+    worker.
+    """
+    start_metrics_snapshots()
+    start_watcher()
+    start_warmup()
+
+
+if uwsgidecorators:
+    # Threads must be started in workers (and not in master before fork)
+    uwsgidecorators.postfork(init_worker)
+else:
+    init_worker()
@@ -1,4 +1,8 @@
+import hashlib
 import json
+import logging
+import threading
+import time
 from parser import ParserError
 from yaml.error import MarkedYAMLError
 from future.builtins import (  # noqa
@@ -8,18 +12,41 @@ from future.builtins import (  # noqa
 
 from jsonschema.exceptions import SchemaError
 import repoze.lru
-from conf.appconfig import CONFIG_PROVIDERS, CONFIG_PROVIDER_LIST, API_PORT
+from conf.appconfig import CONFIG_PROVIDERS, CONFIG_PROVIDER_LIST, API_PORT, \
+    CONFIG_BATCH, CONFIG_NEGATIVE_CACHE, CONFIG_RESPONSE_CACHE, \
+    CONFIG_WARMUP, METRICS
+from configservice.cache import ImmutableCache, LocalCache, NegativeCache, \
+    get_shared_cache
 from configservice.cluster_config.effective import MergedConfigProvider
-from configservice.cluster_config.etcd import EtcdConfigProvider
+from configservice.cluster_config.etcd import EtcdConfigProvider, \
+    EtcdConfigWatcher
 from configservice.cluster_config.github import GithubConfigProvider
 from configservice.cluster_config.s3 import S3ConfigProvider
+from configservice.cluster_config.snapshot import SnapshotConfigProvider, \
+    build_snapshot
+from configservice.concurrency import get_executor, imap, TaskMemo
+from configservice.exceptions import BusinessRuleViolation
+from configservice.metrics import ProviderMetrics, SnapshotStore, \
+    aggregate, cache_samples, render_prometheus
+from configservice import serialization
 from configservice.services.exceptions import ConfigProviderNotFound, \
     ConfigParseError
-from configservice.util import dict_merge
+from configservice.services.registry import ProviderRegistry
+from configservice.services.warmup import EtcdKeyStore, FileKeyStore, \
+    RecentKeys, merge_keys, warm_up
+from configservice.util import dict_merge, json_compatible
 
 
 __author__ = 'sukrit'
 
+logger = logging.getLogger(__name__)
+
+_registry = ProviderRegistry()
+
+_recent_keys = RecentKeys(max_size=CONFIG_WARMUP['size'])
+
+_provider_metrics = ProviderMetrics()
+
 
 def get_provider_types():
     for provider_type in CONFIG_PROVIDER_LIST:
@@ -41,34 +68,145 @@ def _get_effective_provider():
     :rtype: orchestrator.cluster_config.effective.MergedConfigProvider
     """
     providers = list()
+    timeouts = list()
     for provider_type in get_provider_types():
         if provider_type not in ('effective', 'default'):
             provider = get_provider(provider_type)
             if provider:
                 providers.append(provider)
+                timeouts.append(
+                    CONFIG_PROVIDERS[provider_type].get('timeout', None))
 
-    if CONFIG_PROVIDERS['effective']['cache']['enabled']:
+    cache_settings = CONFIG_PROVIDERS['effective']['cache']
+    if cache_settings['enabled']:
         cache_provider = _get_etcd_provider(
-            ttl=CONFIG_PROVIDERS['effective']['cache']['ttl'])
+            ttl=cache_settings['ttl'], config_base=cache_settings['base'],
+            negative_cache=False)
     else:
         cache_provider = None
-    return MergedConfigProvider(*providers, cache_provider=cache_provider)
+    if cache_settings['local']['enabled']:
+        local_cache = LocalCache(
+            max_size=cache_settings['local']['size'],
+            ttl=cache_settings['local']['ttl'],
+            stale_ttl=cache_settings['local']['stale_ttl'])
+    else:
+        local_cache = None
+    if cache_settings['shared']['enabled']:
+        shared_cache = get_shared_cache(
+            cache_settings['shared']['name'],
+            max_size=cache_settings['shared']['size'],
+            ttl=cache_settings['shared']['ttl'])
+    else:
+        shared_cache = None
+    if cache_settings['prefix']['enabled']:
+        prefix_cache = LocalCache(max_size=cache_settings['prefix']['size'],
+                                  ttl=cache_settings['prefix']['ttl'],
+                                  copy_on_read=False)
+    else:
+        prefix_cache = None
+    return MergedConfigProvider(*providers, cache_provider=cache_provider,
+                                local_cache=local_cache,
+                                shared_cache=shared_cache,
+                                prefix_cache=prefix_cache,
+                                refresh_ahead=cache_settings['refresh_ahead'],
+                                executor=_get_executor(), timeouts=timeouts)
+
+
+@repoze.lru.lru_cache(1)
+def _get_executor():
+    """
+    Gets the executor used for fanning out provider loads. The executor is
+    shared by all requests served by the worker.
+
+    :return: Executor instance
+    """
+    executor_settings = CONFIG_PROVIDERS['effective']['executor']
+    return get_executor(executor_settings['type'],
+                        pool_size=executor_settings['pool_size'])
+
+
+@repoze.lru.lru_cache(1)
+def _get_response_cache():
+    """
+    Gets the cache for serialized effective config responses (shared by all
+    requests served by the worker).
+
+    :return: LocalCache instance or None if disabled
+    """
+    if not CONFIG_RESPONSE_CACHE['enabled']:
+        return None
+    return LocalCache(max_size=CONFIG_RESPONSE_CACHE['size'],
+                      ttl=CONFIG_RESPONSE_CACHE['ttl'], copy_on_read=False)
 
 
-def _get_etcd_provider(ttl=None):
+def _invalidate_responses(*paths):
+    """
+    Evicts cached responses for given path prefix and its descendants.
+    """
+    response_cache = _get_response_cache()
+    if response_cache:
+        response_cache.invalidate_where(
+            lambda key: key[1][:len(paths)] == paths)
+
+
+@repoze.lru.lru_cache(1)
+def _get_batch_executor():
+    """
+    Gets the executor used for resolving the groups of a batch. It is kept
+    separate from the provider executor so that batch items waiting on
+    provider loads can not exhaust the pool used for those loads.
+
+    :return: Executor instance
+    """
+    return get_executor(CONFIG_PROVIDERS['effective']['executor']['type'],
+                        pool_size=CONFIG_BATCH['concurrency'])
+
+
+@repoze.lru.lru_cache(1)
+def _get_warmup_executor():
+    """
+    Gets the executor bounding the number of concurrent loads during warm
+    up.
+
+    :return: Executor instance
+    """
+    return get_executor(CONFIG_PROVIDERS['effective']['executor']['type'],
+                        pool_size=CONFIG_WARMUP['concurrency'])
+
+
+def _get_negative_cache():
+    """
+    Creates the cache of missing configs for a provider.
+
+    :return: NegativeCache instance or None if disabled
+    """
+    if not CONFIG_NEGATIVE_CACHE['enabled']:
+        return None
+    return NegativeCache(max_size=CONFIG_NEGATIVE_CACHE['size'],
+                         ttl=CONFIG_NEGATIVE_CACHE['ttl'])
+
+
+def _get_etcd_provider(ttl=None, config_base=None, negative_cache=True):
     """
     Gets the etcd config provider.
 
     :keyword ttl: time to live in seconds
     :type ttl: number
+    :keyword config_base: Base etcd path for the configs. Defaults to
+        config path under etcd base.
+    :type config_base: str
+    :keyword negative_cache: Whether missing configs are cached (see
+        CONFIG_NEGATIVE_CACHE).
+    :type negative_cache: bool
     :return: Instance of EtcdConfigProvider
     :rtype: EtcdConfigProvider
     """
     return EtcdConfigProvider(
         etcd_host=CONFIG_PROVIDERS['etcd']['host'],
         etcd_port=CONFIG_PROVIDERS['etcd']['port'],
-        config_base=CONFIG_PROVIDERS['etcd']['base']+'/config',
-        ttl=ttl
+        config_base=config_base or CONFIG_PROVIDERS['etcd']['base']+'/config',
+        ttl=ttl,
+        negative_cache=_get_negative_cache() if negative_cache else None
     )
 
 
@@ -79,9 +217,15 @@ def _get_s3_provider():
     :return: Instance of S3ConfigProvider
     :rtype: S3ConfigProvider
     """
+    connection_kwargs = {
+        key: value for key, value in
+        CONFIG_PROVIDERS['s3']['connection'].items() if value is not None
+    }
     return S3ConfigProvider(
         bucket=CONFIG_PROVIDERS['s3']['bucket'],
-        config_base=CONFIG_PROVIDERS['s3']['base']
+        config_base=CONFIG_PROVIDERS['s3']['base'],
+        connection_kwargs=connection_kwargs,
+        negative_cache=_get_negative_cache()
     )
 
 
@@ -92,12 +236,68 @@ def _get_github_provider():
     :return: Instance of GithubConfigProvider
     :rtype: GithubConfigProvider
     """
+    cache_settings = CONFIG_PROVIDERS['github']['cache']
+    immutable_settings = cache_settings['immutable']
+    if immutable_settings['max_bytes']:
+        immutable_cache = ImmutableCache(
+            immutable_settings['max_bytes'],
+            directory=immutable_settings['directory'],
+            max_disk_bytes=immutable_settings['max_disk_bytes'])
+    else:
+        immutable_cache = None
     return GithubConfigProvider(
         token=CONFIG_PROVIDERS['github']['token'],
-        config_base=CONFIG_PROVIDERS['github']['config_base']
+        config_base=CONFIG_PROVIDERS['github']['config_base'],
+        etag_cache_size=cache_settings['etag_size'],
+        immutable_cache=immutable_cache,
+        tag_pattern=immutable_settings['tag_pattern'],
+        tag_grace_period=immutable_settings['tag_grace_period'],
+        api_url=CONFIG_PROVIDERS['github']['api_url'],
+        negative_cache=_get_negative_cache(),
+        **CONFIG_PROVIDERS['github']['http']
     )
 
 
+def _get_snapshot_provider():
+    """
+    Gets Snapshot Config Provider
+
+    :return: Instance of SnapshotConfigProvider
+    :rtype: SnapshotConfigProvider
+    """
+    return SnapshotConfigProvider(
+        CONFIG_PROVIDERS['snapshot']['path'],
+        check_interval=CONFIG_PROVIDERS['snapshot']['check_interval'])
+
+
+def publish_snapshot(path=None, source_types=None):
+    """
+    Builds the config snapshot from the source providers and publishes it
+    (atomically replacing the existing snapshot). Source providers need not
+    be enabled in CONFIG_PROVIDER_LIST.
+
+    :keyword path: Path of the snapshot. Defaults to configured path.
+    :type path: str
+    :keyword source_types: Types of the source providers (earlier ones take
+        precedence). Defaults to configured sources.
+    :type source_types: list
+    :return: Number of configs in the snapshot
+    :rtype: int
+    :raise ConfigProviderNotFound: If source provider type is not supported
+    """
+    providers = []
+    for provider_type in source_types or \
+            CONFIG_PROVIDERS['snapshot']['sources']:
+        provider_type = provider_type.strip()
+        locator = '_get_%s_provider' % provider_type
+        if provider_type in ('effective', 'default', 'snapshot') or \
+                locator not in globals():
+            raise ConfigProviderNotFound(provider_type)
+        providers.append(globals()[locator]())
+    return build_snapshot(path or CONFIG_PROVIDERS['snapshot']['path'],
+                          *providers)
+
+
 @repoze.lru.lru_cache(1)
 def _load_job_schema(schema_name=None):
     """
@@ -116,7 +316,8 @@ def _load_job_schema(schema_name=None):
 
 def get_provider(provider_type):
     """
-    Factory method to create config provider instance.
+    Factory method to get config provider instance. Instances are created
+    once per worker and shared across requests (see reload_providers).
 
     :param provider_type:
     :type provider_type: str
@@ -132,7 +333,249 @@ def get_provider(provider_type):
 
     locator = '_get_%s_provider' % (provider_type)
     if locator in globals():
-        return globals()[locator]()
+        return _registry.get(provider_type, lambda: _instrument(
+            globals()[locator](), provider_type))
+
+
+def _instrument(provider, provider_type):
+    if METRICS['enabled']:
+        return _provider_metrics.instrument(provider, provider_type)
+    return provider
+
+
+def reload_providers():
+    """
+    Discards all the provider instances held by the worker. Needs to be
+    invoked when provider settings change.
+
+    :return: None
+    """
+    _registry.reload()
+    _invalidate_responses()
+
+
+def _on_config_change(name, *paths, **kwargs):
+    """
+    Evicts the effective config (and responses) affected by the change in
+    given config. For a change notified by the watch (with its index), the
+    shared caches are evicted once per node (see
+    MergedConfigProvider.invalidate_event). Otherwise only the caches of this
+    worker are evicted.
+
+    :keyword index: Etcd index of the change.
+    :type index: int
+    """
+    index = kwargs.get('index', None)
+    logger.debug('Config: %s changed for paths: %s', name, paths)
+    if 'etcd' in get_provider_types():
+        negative_cache = get_provider('etcd').negative_cache
+        if negative_cache:
+            negative_cache.invalidate(name, *paths)
+    if 'effective' in get_provider_types():
+        effective = get_provider('effective')
+        if index is None:
+            effective.invalidate_local(name, *paths)
+        else:
+            effective.invalidate_event(index, name, *paths)
+    _invalidate_responses(*paths)
+
+
+def _on_config_reset():
+    """
+    Evicts all effective config (and responses) cached by this worker.
+    Shared caches are left to expire.
+    """
+    _on_config_change(None)
+
+
+def start_watcher():
+    """
+    Starts the background watch on etcd config that evicts cached effective
+    config as it changes. Needs to be invoked once per worker (after fork).
+
+    :return: Watcher instance or None if watch is disabled
+    :rtype: EtcdConfigWatcher
+    """
+    watch_settings = CONFIG_PROVIDERS['etcd']['watch']
+    if not watch_settings['enabled'] or \
+            'etcd' not in get_provider_types():
+        return None
+    watcher = EtcdConfigWatcher(
+        get_provider('etcd'), _on_config_change, _on_config_reset,
+        timeout=watch_settings['timeout'],
+        retry_delay=watch_settings['retry_delay'])
+    watcher.start()
+    return watcher
+
+
+def _get_warmup_store():
+    """
+    Gets the store for recently requested config keys.
+
+    :return: Key store or None if not configured
+    """
+    if CONFIG_WARMUP['store'] == 'etcd':
+        return EtcdKeyStore(_get_etcd_provider(negative_cache=False).etcd_cl,
+                            CONFIG_WARMUP['etcd_key'])
+    elif CONFIG_WARMUP['store'] == 'file':
+        return FileKeyStore(CONFIG_WARMUP['file'])
+    return None
+
+
+def warm_up_configs(groups, **kwargs):
+    """
+    Loads the configs for given group paths so that they get cached (e.g.
+    ahead of a deploy).
+
+    :param groups: List of group paths (each path being a list of groups)
+    :type groups: list
+    :keyword provider_type: Type of provider
+    :type provider_type: str
+    :keyword config_names: List of config names to be loaded.
+    :type config_names: list
+    :return: Dictionary with number of requested, loaded and failed configs.
+    :rtype: dict
+    :raise BusinessRuleViolation: If number of groups exceeds maximum batch
+        size.
+    """
+    _check_batch_size(groups)
+    config_names = kwargs.get('config_names', None) or ['totem']
+    keys = [(name+'.yml', tuple(paths))
+            for paths in groups for name in config_names]
+    return warm_up(get_provider(kwargs.get('provider_type', 'effective')),
+                   keys, _get_warmup_executor())
+
+
+def save_recent_keys(store):
+    """
+    Saves the configs recently requested from this worker (merged with the
+    ones already stored).
+
+    :return: None
+    """
+    recent = _recent_keys.keys()
+    if recent:
+        store.save(merge_keys(recent, store.load(), CONFIG_WARMUP['size']))
+
+
+def _save_recent_keys_periodically(store):
+    while True:
+        time.sleep(CONFIG_WARMUP['save_interval'])
+        try:
+            save_recent_keys(store)
+        except Exception:
+            logger.exception('Failed to save recently requested configs')
+
+
+def start_warmup():
+    """
+    Warms up the effective config cache using stored config keys and starts
+    the background task for saving the recently requested keys. Needs to be
+    invoked once per worker (after fork). It blocks till warm up completes.
+
+    :return: Warm up result or None if warm up is disabled.
+    :rtype: dict
+    """
+    if not CONFIG_WARMUP['enabled'] or \
+            'effective' not in get_provider_types():
+        return None
+    store = _get_warmup_store()
+    if not store:
+        return None
+    try:
+        result = warm_up(get_provider('effective'), store.load(),
+                         _get_warmup_executor())
+        logger.info('Config warm up completed: %s', result)
+    except Exception:
+        logger.exception('Config warm up failed')
+        result = None
+    saver = threading.Thread(target=_save_recent_keys_periodically,
+                             args=(store,))
+    saver.daemon = True
+    saver.start()
+    return result
+
+
+def get_metrics_samples():
+    """
+    Gets the metric samples for the worker. These include provider latency
+    and errors along with the lookups for all the caches.
+
+    :return: Samples dictionary (see configservice.metrics.aggregate)
+    :rtype: dict
+    """
+    samples = _provider_metrics.samples()
+    stats = _registry.to_dict()['stats']
+    stats['yaml'] = serialization.stats()
+    response_cache = _get_response_cache()
+    if response_cache:
+        stats['response'] = response_cache.stats()
+    samples['counters'].extend(cache_samples(stats))
+    for provider_type, provider_stats in stats.items():
+        negative_stats = provider_stats.get('negative_cache') \
+            if isinstance(provider_stats, dict) else None
+        if negative_stats:
+            samples['counters'].append([
+                'configservice_backend_calls_saved_total',
+                {'provider': provider_type, 'cache': 'negative'},
+                negative_stats['saved']])
+    return samples
+
+
+@repoze.lru.lru_cache(1)
+def _get_metrics_store():
+    return SnapshotStore(METRICS['directory']) if METRICS['directory'] \
+        else None
+
+
+def get_metrics_text():
+    """
+    Gets the metrics (aggregated across workers if snapshot directory is
+    configured) in Prometheus text format.
+
+    :return: Metrics text
+    :rtype: str
+    """
+    store = _get_metrics_store()
+    if not store:
+        return render_prometheus(get_metrics_samples())
+    # Current worker's snapshot needs to be up to date.
+    store.save(get_metrics_samples())
+    return render_prometheus(aggregate(store.load_all()))
+
+
+def _save_metrics_periodically(store):
+    while True:
+        time.sleep(METRICS['interval'])
+        try:
+            store.save(get_metrics_samples())
+        except Exception:
+            logger.exception('Failed to save metrics snapshot')
+
+
+def start_metrics_snapshots():
+    """
+    Starts the background task for saving the metrics snapshot of the
+    worker. Needs to be invoked once per worker (after fork).
+
+    :return: None
+    """
+    store = _get_metrics_store()
+    if METRICS['enabled'] and store:
+        saver = threading.Thread(target=_save_metrics_periodically,
+                                 args=(store,))
+        saver.daemon = True
+        saver.start()
+
+
+def get_registry_info():
+    """
+    Gets the diagnostic information for the provider registry.
+
+    :return: Dictionary containing number of instances and their types.
+    :rtype: dict
+    """
+    return _registry.to_dict()
 
 
 def _json_compatible_config(config):
@@ -143,7 +586,7 @@ def _json_compatible_config(config):
 
     :return:
     """
-    return json.loads(json.dumps(config))
+    return json_compatible(config)
 
 
 def load_config(*paths, **kwargs):
@@ -160,20 +603,152 @@ def load_config(*paths, **kwargs):
     :keyword config_names: List of config names to be loaded. Defaults to
         CONFIG_NAMES defined in appconfig
     :type config_names: list
+    :keyword level_memo: Optional TaskMemo used for sharing level loads with
+        other calls (effective provider only).
+    :type level_memo: configservice.concurrency.TaskMemo
     :return: Parsed configuration
     :rtype: dict
     """
     provider_type = kwargs.get('provider_type', 'effective')
     config_names = kwargs.get('config_names', ['totem'])
     provider = get_provider(provider_type)
+    load_kwargs = {}
+    if isinstance(provider, MergedConfigProvider):
+        for name in config_names:
+            _recent_keys.record(name+'.yml', paths)
+        if kwargs.get('level_memo'):
+            load_kwargs['level_memo'] = kwargs['level_memo']
     try:
-        configs = [provider.load(name+'.yml', *paths) for name in config_names]
-        return _json_compatible_config(dict_merge(*configs))
+        names = [name+'.yml' for name in config_names]
+        configs = provider.load_many(names, *paths, **load_kwargs)
+        return _json_compatible_config(
+            dict_merge(*[configs[name] for name in names]))
 
     except (MarkedYAMLError, ParserError, SchemaError) as error:
         raise ConfigParseError(str(error), paths)
 
 
+def load_config_json(*paths, **kwargs):
+    """
+    Loads config for given path and provider type serialized as json. See
+    load_config for the arguments.
+
+    :return: Json serialized configuration
+    :rtype: str
+    """
+    return json.dumps(load_config(*paths, **kwargs), separators=(',', ':'),
+                      sort_keys=True)
+
+
+def load_config_response(*paths, **kwargs):
+    """
+    Loads config serialized as json along with its ETag (content hash). For
+    effective provider, both are cached so that repeated requests (and
+    conditional requests) are served without merging and serializing the
+    config again. See load_config for the arguments.
+
+    :return: Tuple of json serialized configuration and its ETag
+    :rtype: tuple
+    """
+    provider_type = kwargs.get('provider_type', 'effective')
+    response_cache = _get_response_cache() if isinstance(
+        get_provider(provider_type), MergedConfigProvider) else None
+    cache_key = (provider_type, tuple(paths),
+                 tuple(kwargs.get('config_names', ['totem'])))
+    if response_cache:
+        response = response_cache.get(cache_key)
+        if response is not None:
+            return response
+
+    body = load_config_json(*paths, **kwargs)
+    response = (body, hashlib.sha1(body.encode('utf-8')).hexdigest())
+    if response_cache:
+        response_cache.put(cache_key, response)
+    return response
+
+
+def _error_dict(error):
+    try:
+        return error.to_dict()
+    except AttributeError:
+        return {
+            'message': str(error),
+            'code': 'INTERNAL'
+        }
+
+
+def load_config_stream(*paths, **kwargs):
+    """
+    Loads each of the config names for given path concurrently (instead of
+    merging them). See load_config for the arguments.
+
+    :return: Generator yielding result dictionary (with name and config or
+        error) for each config name in the requested order.
+    """
+    config_names = kwargs.pop('config_names', None) or ['totem']
+    # Fail fast if provider is not found
+    get_provider(kwargs.get('provider_type', 'effective'))
+
+    def resolve(name):
+        result = {'name': name}
+        try:
+            result['config'] = load_config(*paths, config_names=[name],
+                                           **kwargs)
+        except Exception as error:
+            logger.exception('Failed to load config: %s for groups: %s',
+                             name, paths)
+            result['error'] = _error_dict(error)
+        return result
+
+    return imap(_get_batch_executor(), resolve, config_names,
+                CONFIG_BATCH['concurrency'])
+
+
+def _check_batch_size(groups):
+    if len(groups) > CONFIG_BATCH['max_size']:
+        raise BusinessRuleViolation(
+            'Batch size: {0} exceeds maximum allowed size: {1}'.format(
+                len(groups), CONFIG_BATCH['max_size']),
+            code='BATCH_SIZE_EXCEEDED')
+
+
+def load_config_batch(groups, **kwargs):
+    """
+    Loads config for multiple group paths concurrently. Loads for the levels
+    common to multiple groups (like cluster and organization defaults) are
+    done only once.
+
+    :param groups: List of group paths (each path being a list of groups)
+    :type groups: list
+    :keyword provider_type: Type of provider
+    :type provider_type: str
+    :keyword config_names: List of config names to be loaded.
+    :type config_names: list
+    :return: Generator yielding result dictionary (with groups and config or
+        error) for each group path in the requested order.
+    :raise BusinessRuleViolation: If batch exceeds maximum size.
+    """
+    _check_batch_size(groups)
+    # Fail fast if provider is not found
+    get_provider(kwargs.get('provider_type', 'effective'))
+
+    level_memo = TaskMemo()
+
+    def resolve(paths):
+        result = {'groups': list(paths)}
+        try:
+            result['config'] = load_config(*paths, level_memo=level_memo,
+                                           **kwargs)
+        except Exception as error:
+            logger.exception('Failed to load config for groups: %s', paths)
+            result['error'] = _error_dict(error)
+        return result
+
+    return imap(_get_batch_executor(), resolve,
+                (tuple(paths) for paths in groups),
+                CONFIG_BATCH['concurrency'])
+
+
 def write_config(name, config, *paths, **kwargs):
     """
     Writes config for given path
@@ -188,3 +763,8 @@ def write_config(name, config, *paths, **kwargs):
     provider = get_provider(provider_type)
     if provider:
         provider.write(name, config, *paths)
+        if not isinstance(provider, MergedConfigProvider) and \
+                'effective' in get_provider_types():
+            # Effective provider evicts its caches on its own writes
+            get_provider('effective').invalidate(name, *paths)
+        _invalidate_responses(*paths)
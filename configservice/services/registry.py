@@ -0,0 +1,65 @@
+"""
+Registry holding long lived provider instances for the worker process.
+"""
+import threading
+
+__author__ = 'sukrit'
+
+
+class ProviderRegistry(object):
+    """
+    Thread (and greenlet) safe registry of provider instances. Each instance
+    is created once using the given factory and is shared by all requests
+    served by the worker until the registry is reloaded.
+    """
+
+    def __init__(self):
+        self._instances = {}
+        # Re-entrant as factories may lookup other providers (e.g. effective)
+        self._lock = threading.RLock()
+
+    def get(self, key, factory):
+        """
+        Gets the instance registered for given key. If not found, a new
+        instance is created using the factory and registered.
+
+        :param key: Registry key (provider type)
+        :type key: str
+        :param factory: Callable with no arguments creating the instance.
+        :return: Registered instance
+        """
+        try:
+            return self._instances[key]
+        except KeyError:
+            with self._lock:
+                if key not in self._instances:
+                    self._instances[key] = factory()
+                return self._instances[key]
+
+    def reload(self):
+        """
+        Discards all registered instances. New instances get created (using
+        current settings) on subsequent lookups.
+
+        :return: None
+        """
+        with self._lock:
+            self._instances = {}
+
+    def size(self):
+        """
+        :return: Number of instances held by the registry
+        :rtype: int
+        """
+        return len(self._instances)
+
+    def to_dict(self):
+        instances = self._instances
+        return {
+            'size': len(instances),
+            'instances': {key: instance.__class__.__name__
+                          for key, instance in instances.items()},
+            'stats': {key: instance.stats()
+                      for key, instance in instances.items()
+                      if hasattr(instance, 'stats')}
+        }
@@ -0,0 +1,152 @@
+"""
+Warm up of the effective config cache using the recently requested configs.
+"""
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+
+from collections import OrderedDict
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from configservice.metrics import Counters
+
+__author__ = 'sukrit'
+
+logger = logging.getLogger(__name__)
+
+
+class RecentKeys(object):
+    """
+    Bounded (least recently used first out) record of requested config keys.
+    """
+
+    def __init__(self, max_size=500):
+        self.max_size = max_size
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, name, paths):
+        """
+        :param name: Name of the config
+        :type name: str
+        :param paths: Path list for the config
+        :return: None
+        """
+        key = (name, tuple(paths))
+        with self._lock:
+            self._keys.pop(key, None)
+            self._keys[key] = True
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+
+    def keys(self):
+        """
+        :return: List of (name, paths) tuples (most recent first)
+        :rtype: list
+        """
+        with self._lock:
+            return list(reversed(self._keys))
+
+
+def _decode_keys(raw):
+    return [(name, tuple(paths)) for name, paths in json.loads(raw)]
+
+
+def _encode_keys(keys):
+    return json.dumps([[name, list(paths)] for name, paths in keys])
+
+
+class FileKeyStore(object):
+    """
+    Stores the config keys as json in a local file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path) as store_file:
+                return _decode_keys(store_file.read())
+        except (IOError, OSError, ValueError):
+            return []
+
+    def save(self, keys):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp')
+        with os.fdopen(fd, 'w') as store_file:
+            store_file.write(_encode_keys(keys))
+        os.rename(tmp_path, self.path)
+
+
+class EtcdKeyStore(object):
+    """
+    Stores the config keys as json in etcd (shared by all the workers and
+    hosts).
+    """
+
+    def __init__(self, etcd_cl, key):
+        self.etcd_cl = etcd_cl
+        self.key = key
+
+    def load(self):
+        try:
+            return _decode_keys(self.etcd_cl.read(self.key).value)
+        except (KeyError, ValueError):
+            return []
+
+    def save(self, keys):
+        self.etcd_cl.set(self.key, _encode_keys(keys))
+
+
+def merge_keys(recent, stored, max_size):
+    """
+    Merges recent keys with the stored keys (recent keys first).
+
+    :return: List of unique keys (upto max_size)
+    :rtype: list
+    """
+    merged = OrderedDict((key, True) for key in recent)
+    for key in stored:
+        merged.setdefault(key, True)
+    return list(merged)[:max_size]
+
+
+def warm_up(provider, keys, executor):
+    """
+    Loads the configs for given keys using the provider (so that they get
+    cached). Loads run concurrently using the executor and failures are only
+    logged.
+
+    :param provider: Config provider (typically MergedConfigProvider)
+    :param keys: List of (name, paths) tuples
+    :param executor: Executor bounding the number of concurrent loads
+    :return: Dictionary with number of requested, loaded and failed configs.
+    :rtype: dict
+    """
+    counters = Counters('requested', 'loaded', 'failed')
+
+    def load(name, paths):
+        try:
+            provider.load(name, *paths)
+            counters.incr('loaded')
+        except Exception:
+            logger.warning('Failed to warm up config: %s for paths: %s',
+                           name, paths, exc_info=True)
+            counters.incr('failed')
+
+    tasks = []
+    for name, paths in keys:
+        counters.incr('requested')
+        tasks.append(executor.submit(load, name, paths))
+    for task in tasks:
+        task.get()
+    return counters.to_dict()
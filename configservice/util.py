@@ -1,32 +1,136 @@
+import base64
 import copy
+import datetime
+import json
+import numbers
+from future.utils import PY3, string_types
 
 
-def dict_merge(*dictionaries):
+class FrozenDict(dict):
+    """
+    Read only dictionary returned by dict_merge when frozen result is
+    requested. Nested dictionaries shared with the inputs are not frozen.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('FrozenDict does not support item assignment')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = \
+        update = _readonly
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+    def __deepcopy__(self, memo):
+        return FrozenDict(copy.deepcopy(dict(self), memo))
+
+
+def _merge(source, defaults, owned):
+    """
+    Merges defaults into source without modifying the inputs. Dictionaries
+    along the changed paths are copied once (their ids are tracked in owned)
+    and the untouched subtrees are shared with the inputs.
+    """
+    # Nested merge requires both source and defaults to be dictionary
+    if not isinstance(source, dict) or not isinstance(defaults, dict):
+        return source
+
+    target = source if id(source) in owned else None
+    for key, value in defaults.items():
+        if key not in source:
+            # Key not found in source : Use the defaults
+            new_value = value
+        else:
+            # Key found in source : Recursive merge
+            new_value = _merge(source[key], value, owned)
+            if new_value is source[key]:
+                continue
+        if target is None:
+            target = dict(source)
+            owned.add(id(target))
+        target[key] = new_value
+    return source if target is None else target
+
+
+def dict_merge(*dictionaries, **kwargs):
     """
     Performs nested merge of multiple dictionaries. The values from
     dictionaries appearing first takes precendence
 
+    The input dictionaries are never modified, but the merged dictionary
+    shares the nested values that did not need merging with the inputs.
+    Callers must copy the result before modifying nested values.
+
     :param dictionaries: List of dictionaries that needs to be merged.
+    :keyword frozen: If True, the merged dictionary is returned as read only
+        FrozenDict. Defaults to False.
+    :type frozen: bool
     :return: merged dictionary
-    :rtype
+    :rtype: dict
     """
 
     merged_dict = {}
-
-    def merge(source, defaults):
-        source = copy.deepcopy(source)
-        # Nested merge requires both source and defaults to be dictionary
-        if isinstance(source, dict) and isinstance(defaults, dict):
-            for key, value in defaults.items():
-                if key not in source:
-                    # Key not found in source : Use the defaults
-                    source[key] = value
-                else:
-                    # Key found in source : Recursive merge
-                    source[key] = merge(source[key], value)
-        return source
-
+    owned = {id(merged_dict)}
     for merge_with in dictionaries:
-        merged_dict = merge(merged_dict, copy.deepcopy(merge_with or {}))
+        merged_dict = _merge(merged_dict, merge_with or {}, owned)
 
+    if kwargs.get('frozen', False):
+        return FrozenDict(merged_dict)
     return merged_dict
+
+
+def _json_key(key):
+    """
+    Coerces dictionary key the same way as json.dumps does (with support for
+    dates).
+    """
+    if isinstance(key, string_types):
+        return key
+    elif isinstance(key, numbers.Real) or key is None:
+        return json.dumps(key)
+    elif isinstance(key, (datetime.date, datetime.time)):
+        return key.isoformat()
+    return str(key)
+
+
+def json_compatible(value):
+    """
+    Converts the value to json compatible value in a single pass. Non string
+    keys are coerced to strings, dates to ISO 8601 strings, sets and tuples to
+    lists and binary values to base64 strings.
+
+    Containers are copied only when they contain a value that needs
+    conversion. Otherwise, they are returned as is (and hence the input is
+    never modified).
+
+    :param value: Value to be converted (typically parsed yaml config)
+    :return: Json compatible value
+    """
+    if isinstance(value, dict):
+        items = list(value.items())
+        converted = None
+        for index, (key, item) in enumerate(items):
+            new_key, new_item = _json_key(key), json_compatible(item)
+            if converted is None and (new_key is not key or
+                                      new_item is not item):
+                converted = dict(items[:index])
+            if converted is not None:
+                converted[new_key] = new_item
+        return value if converted is None else converted
+    elif isinstance(value, list):
+        converted = [json_compatible(item) for item in value]
+        if all(new is old for new, old in zip(converted, value)):
+            return value
+        return converted
+    elif isinstance(value, (tuple, set, frozenset)):
+        if not isinstance(value, tuple):
+            try:
+                value = sorted(value)
+            except TypeError:
+                pass
+        return [json_compatible(item) for item in value]
+    elif isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    elif PY3 and isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    return value
@@ -1,11 +1,30 @@
 import flask
+from flask import request
 from flask.views import MethodView
-from conf.appconfig import SCHEMA_ROOT_V1, MIME_JSON
+from future.utils import string_types
+from conf.appconfig import SCHEMA_ROOT_V1, MIME_JSON, MIME_NDJSON
 
+from configservice.exceptions import BusinessRuleViolation
 from configservice.services import config
 from configservice.services.config import get_provider_types
 from configservice.views import hypermedia
-from configservice.views.util import build_response
+from configservice.views.util import build_conditional_response, \
+    build_response, build_stream_response
+
+
+def _split(value):
+    return [item for item in value.split(',') if item]
+
+
+def _parse_path(groups, configs):
+    """
+    Parses the groups and configs of the config url.
+
+    :return: Tuple of group paths and config names
+    """
+    if groups == '_':
+        groups = ''
+    return _split(groups), _split(configs)
 
 
 class ConfigApi(MethodView):
@@ -18,7 +37,9 @@ class ConfigApi(MethodView):
     }, default=MIME_JSON)
     def get(self, provider, groups, configs, **kwargs):
         """
-        Lists all providers.
+        Loads the merged config for given groups and config names. The
+        response carries an ETag and a conditional request (If-None-Match)
+        gets 304 if config has not changed.
 
         :param kwargs:
         :return:
@@ -27,22 +48,128 @@ class ConfigApi(MethodView):
         if provider not in get_provider_types():
             flask.abort(404)
         else:
-            if groups == '_':
-                groups = ''
+            paths, config_names = _parse_path(groups, configs)
+            body, etag = config.load_config_response(
+                *paths, config_names=config_names, provider_type=provider)
+            return build_conditional_response(body, etag)
+
+
+class ConfigStreamApi(MethodView):
+    """
+    Config Stream API
+    """
+
+    @hypermedia.produces({
+        MIME_NDJSON: SCHEMA_ROOT_V1
+    }, default=MIME_NDJSON)
+    def get(self, provider, groups, configs, **kwargs):
+        """
+        Loads each of the config names for given groups separately (without
+        merging them) and streams each one as a line of newline delimited
+        json as soon as it is loaded.
+
+        :param kwargs:
+        :return: Flask streaming response
+        """
+        if provider not in get_provider_types():
+            flask.abort(404)
+
+        paths, config_names = _parse_path(groups, configs)
+        return build_stream_response(
+            config.load_config_stream(
+                *paths, config_names=config_names, provider_type=provider),
+            mimetype=MIME_NDJSON)
+
+
+class ConfigBatchApi(MethodView):
+    """
+    Config Batch API
+    """
+
+    @staticmethod
+    def _parse_request():
+        """
+        Parses the batch request of the form:
+        {
+            "groups": [["cluster", "org", "repo", "ref"], "cluster,org"],
+            "configs": ["totem"]
+        }
 
-            return build_response(config.load_config(
-                *(group for group in groups.split(',') if group),
-                config_names=[
-                    config_name for config_name in configs.split(',')
-                    if config_name],
-                provider_type=provider
-            ))
+        :return: Tuple of group paths and config names
+        :raise BusinessRuleViolation: If request is not valid
+        """
+        body = request.get_json(force=True, silent=True)
+        if not isinstance(body, dict) or \
+                not isinstance(body.get('groups'), list):
+            raise BusinessRuleViolation(
+                'Batch request must contain list of groups',
+                code='INVALID_BATCH_REQUEST')
+        groups = [_split(group) if isinstance(group, string_types) else
+                  [item for item in group if item]
+                  for group in body['groups']]
+        configs = body.get('configs') or ['totem']
+        if isinstance(configs, string_types):
+            configs = _split(configs)
+        return groups, configs
+
+    @hypermedia.produces({
+        MIME_JSON: SCHEMA_ROOT_V1,
+        MIME_NDJSON: SCHEMA_ROOT_V1
+    }, default=MIME_JSON)
+    def post(self, provider, accept_mimetype=None, **kwargs):
+        """
+        Loads configs for multiple group paths. Results are streamed (in
+        requested order) as they get resolved, either as json array or as
+        newline delimited json.
+
+        :param provider: Provider type
+        :return: Flask streaming response
+        """
+        if provider not in get_provider_types():
+            flask.abort(404)
+
+        groups, configs = self._parse_request()
+        results = config.load_config_batch(groups, config_names=configs,
+                                           provider_type=provider)
+        return build_stream_response(
+            results, mimetype=MIME_NDJSON if accept_mimetype == MIME_NDJSON
+            else MIME_JSON)
+
+
+class ConfigWarmupApi(ConfigBatchApi):
+    """
+    Config Warm up API
+    """
+
+    @hypermedia.produces({
+        MIME_JSON: SCHEMA_ROOT_V1
+    }, default=MIME_JSON)
+    def post(self, provider, **kwargs):
+        """
+        Loads configs for multiple group paths (like repository / ref
+        expected to be deployed) so that they get cached. Request is of the
+        same form as the batch request.
+
+        :param provider: Provider type
+        :return: Flask Json Response containing number of requested, loaded
+            and failed configs.
+        """
+        if provider not in get_provider_types():
+            flask.abort(404)
+
+        groups, configs = self._parse_request()
+        return build_response(config.warm_up_configs(
+            groups, config_names=configs, provider_type=provider))
 
 
 def register(app, **kwargs):
     """
-    Registers Provider ('/providers')
-    Only GET operation is available.
+    Registers Config API
+    ('/providers/<provider>/groups/<groups>/configs/<configs>'), Config
+    Stream API
+    ('/providers/<provider>/groups/<groups>/configs/<configs>/stream'),
+    Config Batch API ('/providers/<provider>/batch') and Config Warm up API
+    ('/providers/<provider>/warmup').
 
     :param app: Flask application
     :return: None
@@ -50,3 +177,16 @@ def register(app, **kwargs):
     config_func = ConfigApi.as_view('configs')
     for uri in ['/providers/<provider>/groups/<groups>/configs/<configs>']:
         app.add_url_rule(uri,  view_func=config_func, methods=['GET'])
+
+    stream_func = ConfigStreamApi.as_view('config-stream')
+    for uri in [
+            '/providers/<provider>/groups/<groups>/configs/<configs>/stream']:
+        app.add_url_rule(uri,  view_func=stream_func, methods=['GET'])
+
+    batch_func = ConfigBatchApi.as_view('config-batch')
+    for uri in ['/providers/<provider>/batch']:
+        app.add_url_rule(uri,  view_func=batch_func, methods=['POST'])
+
+    warmup_func = ConfigWarmupApi.as_view('config-warmup')
+    for uri in ['/providers/<provider>/warmup']:
+        app.add_url_rule(uri,  view_func=warmup_func, methods=['POST'])
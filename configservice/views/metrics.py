@@ -0,0 +1,31 @@
+from flask import Response
+from flask.views import MethodView
+from conf.appconfig import MIME_PROMETHEUS_TEXT
+from configservice.services.config import get_metrics_text
+
+
+class MetricsApi(MethodView):
+    """
+    Metrics API
+    """
+
+    def get(self, **kwargs):
+        """
+        Gets the provider and cache metrics (aggregated across workers) in
+        Prometheus text format.
+
+        :return: Flask Response containing metrics text
+        """
+        return Response(get_metrics_text(), content_type=MIME_PROMETHEUS_TEXT)
+
+
+def register(app, **kwargs):
+    """
+    Registers Metrics API ('/metrics')
+    Only GET operation is available.
+
+    :param app: Flask application
+    :return: None
+    """
+    app.add_url_rule('/metrics', view_func=MetricsApi.as_view('metrics'),
+                     methods=['GET'])
@@ -4,7 +4,7 @@ import json
 
 from flask import jsonify, Response, request
 
-from conf.appconfig import MIME_JSON, API_DEFAULT_PAGE_SIZE
+from conf.appconfig import MIME_JSON, MIME_NDJSON, API_DEFAULT_PAGE_SIZE
 
 
 def build_response(output, status=200, mimetype=MIME_JSON,
@@ -30,6 +30,66 @@ def build_response(output, status=200, mimetype=MIME_JSON,
     return resp, status, headers
 
 
+def build_conditional_response(body, etag, status=200, mimetype=MIME_JSON,
+                               headers=None):
+    """
+    Utility method to build the response for pre-serialized body with given
+    ETag. If the ETag matches the If-None-Match header of the request, 304
+    (Not Modified) response is returned without body.
+
+    :param body: Serialized response body
+    :type body: str or bytes
+    :param etag: ETag (hash) for the body
+    :type etag: str
+    :param status: Http Status code
+    :type status: int
+    :param mimetype: Response mimetype.
+    :type mimetype: str
+    :param headers: Response headers (key, value)
+    :type headers: dict
+    :return: Tuple consisting of Flask Response, Status Code and Http Headers
+    """
+    if request.if_none_match.contains_weak(etag):
+        resp = Response(status=304)
+        status = 304
+    else:
+        resp = Response(body, mimetype=mimetype)
+    resp.set_etag(etag)
+    return resp, status, headers or {}
+
+
+def build_stream_response(items, status=200, mimetype=MIME_JSON,
+                          headers=None):
+    """
+    Utility method to build the streaming response that writes each item as
+    soon as it is produced. Items are written as newline delimited json if
+    mimetype is MIME_NDJSON. Otherwise they are written as chunks of a json
+    array.
+
+    :param items: Iterable of json serializable objects
+    :param status: Http Status code
+    :type status: int
+    :param mimetype: Response mimetype.
+    :type mimetype: str
+    :param headers: Response headers (key, value)
+    :type headers: dict
+    :return: Tuple consisting of Flask Response, Status Code and Http Headers
+    """
+    def generate_ndjson():
+        for item in items:
+            yield json.dumps(item, separators=(',', ':')) + '\n'
+
+    def generate_array():
+        yield '['
+        for index, item in enumerate(items):
+            yield (',' if index else '') + \
+                json.dumps(item, separators=(',', ':'))
+        yield ']'
+
+    body = generate_ndjson() if mimetype == MIME_NDJSON else generate_array()
+    return Response(body, mimetype=mimetype), status, headers or {}
+
+
 def created(output, mimetype=MIME_JSON, location=None, status=201, headers={}):
     headers = copy.deepcopy(headers or {})
     if location:
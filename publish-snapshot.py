@@ -0,0 +1,23 @@
+"""
+Builds the compiled config snapshot from the source providers (etcd, S3) and
+publishes it for the snapshot provider.
+
+Usage: python publish-snapshot.py [--path PATH] [--sources etcd,s3]
+"""
+import argparse
+from configservice.services.config import publish_snapshot
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--path', default=None,
+                        help='Snapshot path (defaults to '
+                             'CONFIG_SNAPSHOT_PATH)')
+    parser.add_argument('--sources', default=None,
+                        help='Comma separated source providers (defaults to '
+                             'CONFIG_SNAPSHOT_SOURCES)')
+    args = parser.parse_args()
+    count = publish_snapshot(
+        path=args.path,
+        source_types=args.sources.split(',') if args.sources else None)
+    print('Published snapshot with {0} configs'.format(count))
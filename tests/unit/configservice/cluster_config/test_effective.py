@@ -0,0 +1,415 @@
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import time
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+from mock import MagicMock
+from nose.tools import eq_, raises
+from configservice.cluster_config.effective import MergedConfigProvider, \
+    ProviderTimeoutError
+from configservice.cache import LocalCache
+from configservice.cluster_config.etcd import EtcdConfigProvider
+from configservice.concurrency import ThreadPoolExecutor
+from tests.helper import dict_compare
+
+__author__ = 'sukrit'
+
+
+def _level_provider(prefix):
+    provider = MagicMock()
+    provider.supports_load_levels = False
+    provider.supports_load_many = False
+    provider.load.side_effect = lambda name, *paths: {
+        'key-%d' % len(paths): '%s-%s' % (prefix, '/'.join(paths)),
+        'common': prefix
+    }
+    return provider
+
+
+class TestMergedConfigProvider:
+    """
+    Unit tests for MergedConfigProvider
+    """
+
+    def test_load_merges_levels_and_providers(self):
+        """
+        should merge deeper levels and earlier providers with precedence
+        """
+
+        # Given: Merged provider with 2 providers
+        provider = MergedConfigProvider(_level_provider('p1'),
+                                        _level_provider('p2'))
+
+        # When: I load the config
+        config = provider.load('totem.yml', 'cluster1', 'org1')
+
+        # Then: Config gets merged in expected order
+        dict_compare(config, {
+            'key-0': 'p1-',
+            'key-1': 'p1-cluster1',
+            'key-2': 'p1-cluster1/org1',
+            'common': 'p1'
+        })
+
+    def test_load_using_thread_pool(self):
+        """
+        should preserve merge order when loads run concurrently
+        """
+
+        # Given: Merged provider with slow first provider
+        slow = _level_provider('p1')
+        load = slow.load.side_effect
+
+        def slow_load(name, *paths):
+            time.sleep(0.01)
+            return load(name, *paths)
+        slow.load.side_effect = slow_load
+        provider = MergedConfigProvider(
+            slow, _level_provider('p2'),
+            executor=ThreadPoolExecutor(pool_size=4))
+
+        # When: I load the config
+        config = provider.load('totem.yml', 'cluster1')
+
+        # Then: Config from first provider takes precedence
+        eq_(config['common'], 'p1')
+        eq_(config['key-1'], 'p1-cluster1')
+
+    def test_load_many(self):
+        """
+        should load multiple configs in a single walk over the levels
+        """
+
+        # Given: Merged provider with bulk loading provider
+        bulk = MagicMock()
+        bulk.supports_load_levels = False
+        bulk.supports_load_many = True
+        bulk.load_many.side_effect = lambda names, *paths: {
+            name: {'level': len(paths), name: True} for name in names
+        }
+        provider = MergedConfigProvider(bulk, local_cache=LocalCache())
+        provider.load('totem.yml', 'cluster1')
+
+        # When: I load multiple configs
+        configs = provider.load_many(['totem.yml', 'deploy.yml'], 'cluster1')
+
+        # Then: Merged configs are returned for all names
+        eq_(configs['totem.yml'], {'level': 1, 'totem.yml': True})
+        eq_(configs['deploy.yml'], {'level': 1, 'deploy.yml': True})
+
+        # And: Only the config missing in local cache is loaded (once per
+        # level)
+        eq_(bulk.load_many.call_count, 4)
+        bulk.load_many.assert_called_with(('deploy.yml',))
+
+    @raises(ProviderTimeoutError)
+    def test_load_with_timeout(self):
+        """
+        should raise ProviderTimeoutError when provider exceeds timeout
+        """
+
+        # Given: Merged provider with slow provider
+        slow = MagicMock()
+        slow.supports_load_levels = False
+        slow.supports_load_many = False
+        slow.load.side_effect = lambda name, *paths: time.sleep(0.5)
+        provider = MergedConfigProvider(
+            slow, executor=ThreadPoolExecutor(pool_size=2),
+            timeouts=[0.01])
+
+        # When: I load the config
+        provider.load('totem.yml', 'cluster1')
+
+        # Then: ProviderTimeoutError is raised
+
+    @raises(ProviderTimeoutError)
+    def test_load_with_timeout_across_levels(self):
+        """
+        should apply the provider timeout to all the levels together
+        """
+
+        # Given: Merged provider with provider whose loads run one at a time
+        slow = MagicMock()
+        slow.supports_load_levels = False
+        slow.supports_load_many = False
+        slow.load.side_effect = lambda name, *paths: time.sleep(0.1)
+        provider = MergedConfigProvider(
+            slow, executor=ThreadPoolExecutor(pool_size=1),
+            timeouts=[0.15])
+
+        # When: I load the config for 3 levels (each within the timeout)
+        provider.load('totem.yml', 'cluster1', 'org1')
+
+        # Then: ProviderTimeoutError is raised
+
+    def test_load_from_local_cache(self):
+        """
+        should serve config from local cache without loading providers
+        """
+
+        # Given: Merged provider with local cache
+        level_provider = _level_provider('p1')
+        provider = MergedConfigProvider(level_provider,
+                                        local_cache=LocalCache())
+        provider.load('totem.yml', 'cluster1')
+        level_provider.load.reset_mock()
+
+        # When: I load the config again
+        config = provider.load('totem.yml', 'cluster1')
+
+        # Then: Config is served from local cache
+        eq_(config['key-1'], 'p1-cluster1')
+        eq_(level_provider.load.call_count, 0)
+
+    def test_load_from_shared_cache(self):
+        """
+        should serve config loaded by another worker from shared cache
+        """
+
+        # Given: Config loaded by another worker sharing the cache
+        shared_cache = LocalCache()
+        MergedConfigProvider(_level_provider('p1'),
+                             shared_cache=shared_cache).load('totem.yml',
+                                                             'cluster1')
+        level_provider = _level_provider('p1')
+        provider = MergedConfigProvider(level_provider,
+                                        local_cache=LocalCache(),
+                                        shared_cache=shared_cache)
+
+        # When: I load the config
+        config = provider.load('totem.yml', 'cluster1')
+
+        # Then: Config is served from shared cache
+        eq_(config['key-1'], 'p1-cluster1')
+        eq_(level_provider.load.call_count, 0)
+        eq_(provider.stats()['shared_cache']['hits'], 1)
+
+    def test_load_with_cache_hit(self):
+        """
+        should not rewrite cached config on a cache hit
+        """
+
+        # Given: Merged provider with existing cached config
+        cache_provider = MagicMock()
+        cache_provider.load_many.return_value = {'totem.yml': {'cached': True}}
+        level_provider = _level_provider('p1')
+        provider = MergedConfigProvider(level_provider,
+                                        cache_provider=cache_provider)
+
+        # When: I load the config
+        config = provider.load('totem.yml', 'cluster1')
+
+        # Then: Cached config is returned without writing to the cache
+        eq_(config, {'cached': True})
+        eq_(cache_provider.write.call_count, 0)
+        eq_(level_provider.load.call_count, 0)
+
+    def test_load_with_cache_miss(self):
+        """
+        should write merged config to cache on a cache miss
+        """
+
+        # Given: Merged provider with empty cache
+        cache_provider = MagicMock()
+        cache_provider.load_many.return_value = {}
+        provider = MergedConfigProvider(_level_provider('p1'),
+                                        cache_provider=cache_provider)
+
+        # When: I load the config
+        config = provider.load('totem.yml', 'cluster1')
+
+        # Then: Merged config is written to the cache
+        cache_provider.write.assert_called_once_with(
+            'totem.yml', config, 'cluster1')
+        eq_(provider.stats()['cache']['writes'], 1)
+
+    def test_load_stale_config(self):
+        """
+        should serve stale config while it is refreshed in background
+        """
+
+        # Given: Merged provider with stale config in local cache
+        level_provider = _level_provider('p1')
+        provider = MergedConfigProvider(
+            level_provider, local_cache=LocalCache(ttl=0.01, stale_ttl=10))
+        provider.local_cache.put(('totem.yml', ('cluster1',)),
+                                 {'stale': True})
+        time.sleep(0.02)
+
+        # When: I load the config
+        config = provider.load('totem.yml', 'cluster1')
+
+        # Then: Stale config is returned and refreshed in background
+        eq_(config, {'stale': True})
+        refreshed = None
+        for _ in range(100):
+            refreshed = provider.local_cache.get(('totem.yml', ('cluster1',)))
+            if refreshed:
+                break
+            time.sleep(0.01)
+        eq_(refreshed['key-1'], 'p1-cluster1')
+
+    def test_load_with_cached_prefix(self):
+        """
+        should load only the levels below the cached prefix
+        """
+
+        # Given: Merged provider with prefix cache
+        level_provider = _level_provider('p1')
+        provider = MergedConfigProvider(
+            level_provider, prefix_cache=LocalCache(copy_on_read=False))
+        provider.load('totem.yml', 'cluster1', 'org1', 'repo1')
+        level_provider.load.reset_mock()
+
+        # When: I load the config for another repo in the same org
+        config = provider.load('totem.yml', 'cluster1', 'org1', 'repo2')
+
+        # Then: Only repo level is loaded
+        level_provider.load.assert_called_once_with(
+            'totem.yml', 'cluster1', 'org1', 'repo2')
+        dict_compare(config, {
+            'key-0': 'p1-',
+            'key-1': 'p1-cluster1',
+            'key-2': 'p1-cluster1/org1',
+            'key-3': 'p1-cluster1/org1/repo2',
+            'common': 'p1'
+        })
+
+    def test_load_with_cached_prefix_from_etcd(self):
+        """
+        should read only the levels below the cached prefix from etcd
+        """
+
+        # Given: Merged etcd provider with prefix cache and config loaded for
+        # a repo
+        etcd_cl = MagicMock()
+        etcd_cl.read.side_effect = KeyError
+        provider = MergedConfigProvider(
+            EtcdConfigProvider(etcd_cl=etcd_cl, config_base='/totem/config'),
+            prefix_cache=LocalCache(copy_on_read=False))
+        provider.load('totem.yml', 'cluster1', 'org1', 'repo1', 'master')
+        etcd_cl.read.reset_mock()
+
+        # When: I load the config for another repo in the same org
+        provider.load('totem.yml', 'cluster1', 'org1', 'repo2', 'master')
+
+        # Then: Only repo and ref levels are read from etcd
+        eq_(sorted(call[0][0] for call in etcd_cl.read.call_args_list), [
+            '/totem/config/cluster1/org1/repo2',
+            '/totem/config/cluster1/org1/repo2/master'
+        ])
+
+    def test_load_with_cached_prefix_and_mismatched_types(self):
+        """
+        should merge levels in a single pass when a middle level has a value
+        of different type
+        """
+
+        # Given: Middle level with scalar value for a nested config
+        level_provider = MagicMock()
+        level_provider.supports_load_levels = False
+        level_provider.supports_load_many = False
+        level_provider.load.side_effect = lambda name, *paths: [
+            {'k': {'b': 2}}, {'k': 'scalar'}, {'k': {'a': 1}}][len(paths)]
+        provider = MergedConfigProvider(
+            level_provider, prefix_cache=LocalCache(copy_on_read=False))
+        provider.load('totem.yml', 'cluster1', 'org1')
+
+        # When: I load the config for another org (using cached prefix)
+        config = provider.load('totem.yml', 'cluster1', 'org2')
+
+        # Then: Nested config is merged across root and deepest level
+        dict_compare(config, {'k': {'a': 1, 'b': 2}})
+
+    def test_invalidate_evicts_descendants(self):
+        """
+        should evict cached configs for the prefix and its descendants
+        """
+
+        # Given: Merged provider with cached configs
+        provider = MergedConfigProvider(
+            _level_provider('p1'), local_cache=LocalCache(),
+            prefix_cache=LocalCache(copy_on_read=False))
+        provider.load('totem.yml', 'cluster1', 'org1', 'repo1')
+        provider.load('totem.yml', 'cluster2', 'org1', 'repo1')
+
+        # When: I invalidate the cluster1 prefix
+        provider.invalidate('totem.yml', 'cluster1')
+
+        # Then: Only configs under cluster1 are evicted
+        eq_(provider.local_cache.get(
+            ('totem.yml', ('cluster1', 'org1', 'repo1'))), None)
+        eq_(provider.prefix_cache.get(('totem.yml', ('cluster1', 'org1'))),
+            None)
+        eq_(provider.prefix_cache.get(('totem.yml', ('cluster1',))), None)
+        eq_(provider.prefix_cache.get(('totem.yml', ()))[0][0]['key-0'],
+            'p1-')
+        eq_(provider.local_cache.get(
+            ('totem.yml', ('cluster2', 'org1', 'repo1')))['key-1'],
+            'p1-cluster2')
+
+    def test_invalidate_with_cache_provider(self):
+        """
+        should evict the config tree from cache provider
+        """
+
+        # Given: Merged provider with cache provider
+        cache_provider = MagicMock()
+        provider = MergedConfigProvider(_level_provider('p1'),
+                                        cache_provider=cache_provider)
+
+        # When: I invalidate the cluster1 prefix
+        provider.invalidate('totem.yml', 'cluster1')
+
+        # Then: Config tree is deleted from cache provider
+        cache_provider.delete_tree.assert_called_once_with('totem.yml',
+                                                           'cluster1')
+
+    def test_invalidate_event(self):
+        """
+        should evict shared caches only for the worker claiming the event
+        """
+
+        # Given: Merged providers (workers) sharing the caches
+        cache_provider = MagicMock()
+        shared_cache = MagicMock()
+        shared_cache.claim.side_effect = [True, False]
+        providers = [MergedConfigProvider(_level_provider('p1'),
+                                          cache_provider=cache_provider,
+                                          shared_cache=shared_cache,
+                                          local_cache=LocalCache())
+                     for _ in range(2)]
+
+        # When: Change event is notified to both workers
+        for provider in providers:
+            provider.invalidate_event(10, 'totem.yml', 'cluster1')
+
+        # Then: Shared caches are evicted once
+        shared_cache.claim.assert_called_with('event:10')
+        cache_provider.delete_tree.assert_called_once_with('totem.yml',
+                                                           'cluster1')
+        shared_cache.invalidate_tree.assert_called_once_with('totem.yml',
+                                                             'cluster1')
+
+    def test_invalidate_local(self):
+        """
+        should evict in-process caches without touching cache provider
+        """
+
+        # Given: Merged provider with cached config and cache provider
+        cache_provider = MagicMock()
+        cache_provider.load_many.return_value = {}
+        provider = MergedConfigProvider(_level_provider('p1'),
+                                        cache_provider=cache_provider,
+                                        local_cache=LocalCache())
+        provider.load('totem.yml', 'cluster1')
+
+        # When: I invalidate the local caches for all configs
+        provider.invalidate_local(None)
+
+        # Then: Local cache is evicted and cache provider is left intact
+        eq_(provider.local_cache.get(('totem.yml', ('cluster1',))), None)
+        eq_(cache_provider.delete_tree.call_count, 0)
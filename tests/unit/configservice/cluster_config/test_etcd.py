@@ -0,0 +1,244 @@
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+from mock import MagicMock
+from nose.tools import eq_
+from configservice.cache import NegativeCache
+from configservice.cluster_config.etcd import EtcdConfigProvider, \
+    EtcdConfigWatcher
+
+__author__ = 'sukrit'
+
+
+def _leaf(key, value, is_dir=False):
+    leaf = MagicMock()
+    leaf.key = key
+    leaf.value = value
+    leaf.dir = is_dir
+    return leaf
+
+
+def _read_dirs(dirs):
+    """
+    Gets the fake etcd read returning the leaves of the given directories.
+    """
+    def read(key, **kwargs):
+        if key not in dirs:
+            raise KeyError(key)
+        result = MagicMock()
+        result.leaves = dirs[key]
+        return result
+    return read
+
+
+class TestEtcdConfigProvider:
+    """
+    Unit tests for EtcdConfigProvider
+    """
+
+    def setup(self):
+        self.etcd_cl = MagicMock()
+        self.provider = EtcdConfigProvider(etcd_cl=self.etcd_cl,
+                                           config_base='/totem/config')
+
+    def test_load_many(self):
+        """
+        should load multiple configs using single read of the directory
+        """
+
+        # Given: Configs for cluster level
+        self.etcd_cl.read.side_effect = _read_dirs({
+            '/totem/config/cluster1': [
+                _leaf('/totem/config/cluster1/totem.yml', 'level: cluster'),
+                _leaf('/totem/config/cluster1/org1', None, is_dir=True),
+            ],
+        })
+
+        # When: I load multiple configs for cluster level
+        configs = self.provider.load_many(['totem.yml', 'deploy.yml'],
+                                          'cluster1')
+
+        # Then: Configs are loaded using single read
+        eq_(configs, {'totem.yml': {'level': 'cluster'}, 'deploy.yml': {}})
+        self.etcd_cl.read.assert_called_once_with('/totem/config/cluster1')
+
+    def test_load_many_levels_for_missing_base(self):
+        """
+        should return empty configs when config base does not exist
+        """
+
+        # Given: Missing config base
+        self.etcd_cl.read.side_effect = KeyError
+
+        # When: I load configs for all levels
+        configs = self.provider.load_many_levels(['totem.yml'], 'cluster1')
+
+        # Then: Empty configs are returned
+        eq_(configs, [{'totem.yml': {}}, {'totem.yml': {}}])
+
+    def test_load_many_levels(self):
+        """
+        should load multiple configs for all levels using single read per
+        level
+        """
+
+        # Given: Configs for root and cluster level
+        self.etcd_cl.read.side_effect = _read_dirs({
+            '/totem/config': [
+                _leaf('/totem/config/totem.yml', 'level: root'),
+            ],
+            '/totem/config/cluster1': [
+                _leaf('/totem/config/cluster1/deploy.yml', 'level: cluster'),
+            ],
+        })
+
+        # When: I load multiple configs for all levels
+        configs = self.provider.load_many_levels(
+            ['totem.yml', 'deploy.yml'], 'cluster1')
+
+        # Then: Configs for each level and name are returned
+        eq_(configs, [
+            {'totem.yml': {'level': 'root'}, 'deploy.yml': {}},
+            {'totem.yml': {}, 'deploy.yml': {'level': 'cluster'}}
+        ])
+        eq_(self.etcd_cl.read.call_count, 2)
+
+    def test_load_with_negative_cache(self):
+        """
+        should not read missing config again until it is written
+        """
+
+        # Given: Provider with negative cache and missing config
+        provider = EtcdConfigProvider(etcd_cl=self.etcd_cl,
+                                      negative_cache=NegativeCache())
+        self.etcd_cl.read.side_effect = KeyError
+        provider.load('totem.yml', 'cluster1')
+
+        # When: I load the missing config again
+        config = provider.load('totem.yml', 'cluster1')
+
+        # Then: Backend call is saved
+        eq_(config, {})
+        eq_(self.etcd_cl.read.call_count, 1)
+        eq_(provider.stats()['negative_cache']['saved'], 1)
+
+        # And: Config is read again once it is written
+        provider.write('totem.yml', {}, 'cluster1')
+        provider.load('totem.yml', 'cluster1')
+        eq_(self.etcd_cl.read.call_count, 2)
+
+    def test_delete_tree(self):
+        """
+        should delete config at given path and nested paths
+        """
+
+        # Given: Configs under cluster level
+        self.etcd_cl.read.return_value.leaves = [
+            _leaf('/totem/config/cluster1/totem.yml', 'level: cluster'),
+            _leaf('/totem/config/cluster1/org1/totem.yml', 'level: org'),
+            _leaf('/totem/config/cluster1/org1/deploy.yml', 'level: org'),
+        ]
+
+        # When: I delete the config tree
+        self.provider.delete_tree('totem.yml', 'cluster1')
+
+        # Then: Matching configs are deleted
+        self.etcd_cl.read.assert_called_once_with('/totem/config/cluster1',
+                                                  recursive=True)
+        eq_([call[0][0] for call in self.etcd_cl.delete.call_args_list], [
+            '/totem/config/cluster1/totem.yml',
+            '/totem/config/cluster1/org1/totem.yml'
+        ])
+
+    def test_parse_key(self):
+        """
+        should parse config name and paths from etcd key
+        """
+
+        eq_(self.provider.parse_key('/totem/config/cluster1/org1/totem.yml'),
+            ('totem.yml', ('cluster1', 'org1')))
+        eq_(self.provider.parse_key('/totem/config/cluster1', is_dir=True),
+            (None, ('cluster1',)))
+        eq_(self.provider.parse_key('/totem/config-cache/totem.yml'), None)
+
+
+class TestEtcdConfigWatcher:
+    """
+    Unit tests for EtcdConfigWatcher
+    """
+
+    def setup(self):
+        self.etcd_cl = MagicMock()
+        self.on_change = MagicMock()
+        self.on_reset = MagicMock()
+        self.watcher = EtcdConfigWatcher(
+            EtcdConfigProvider(etcd_cl=self.etcd_cl,
+                               config_base='/totem/config'),
+            self.on_change, self.on_reset, timeout=10)
+
+    def test_watch_once(self):
+        """
+        should notify the changed config and return next index
+        """
+
+        # Given: Change in org level config
+        self.etcd_cl.read.return_value = _leaf(
+            '/totem/config/cluster1/org1/totem.yml', 'level: org')
+        self.etcd_cl.read.return_value.modifiedIndex = 10
+
+        # When: I watch for the change
+        index = self.watcher.watch_once(5)
+
+        # Then: Change is notified
+        self.on_change.assert_called_once_with('totem.yml', 'cluster1',
+                                               'org1', index=10)
+        eq_(index, 11)
+        self.etcd_cl.read.assert_called_once_with(
+            '/totem/config', recursive=True, wait=True, timeout=10,
+            waitIndex=5)
+
+    def test_resync(self):
+        """
+        should notify reset and resume from current etcd index
+        """
+
+        # Given: Current etcd index
+        self.etcd_cl.read.return_value.etcd_index = 20
+
+        # When: I resync the watcher
+        index = self.watcher.resync()
+
+        # Then: Reset is notified
+        self.on_reset.assert_called_once_with()
+        eq_(index, 21)
+
+    def test_run_resets_only_after_failed_watch(self):
+        """
+        should not notify reset on initial sync but only on resync after
+        failed watch
+        """
+
+        # Given: Watch that fails once and then stops the watcher
+        results = [Exception('Event index cleared'), 22]
+
+        def watch_once(index):
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            self.watcher.stop()
+            return result
+
+        self.watcher.retry_delay = 0
+        self.watcher.resync = MagicMock(return_value=21)
+        self.watcher.watch_once = watch_once
+
+        # When: I run the watcher
+        self.watcher._run()
+
+        # Then: Reset is notified only for the resync after failure
+        eq_([kwargs for _, kwargs in self.watcher.resync.call_args_list],
+            [{'reset': False}, {'reset': True}])
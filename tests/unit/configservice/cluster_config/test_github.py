@@ -0,0 +1,209 @@
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import base64
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+from mock import MagicMock
+from nose.tools import eq_, ok_, assert_raises
+from requests.exceptions import RetryError
+from configservice.cache import ImmutableCache
+from configservice.cluster_config.github import GithubConfigProvider, \
+    GithubFetchException
+from tests.helper import dict_compare
+
+__author__ = 'sukrit'
+
+MOCK_RAW_CONFIG = b'variables: {var1: value1}\n'
+
+
+def _mock_response(status_code, etag=None):
+    resp = MagicMock()
+    resp.status_code = status_code
+    resp.headers = {'ETag': etag} if etag else {}
+    resp.json.return_value = {
+        'content': base64.b64encode(MOCK_RAW_CONFIG).decode('utf-8')
+    }
+    return resp
+
+
+class TestGithubConfigProvider:
+    """
+    Unit tests for GithubConfigProvider
+    """
+
+    def setup(self):
+        self.provider = GithubConfigProvider()
+        self.provider.session = MagicMock()
+
+    def test_load_with_not_modified_response(self):
+        """
+        should serve config from etag cache when github returns 304
+        """
+
+        # Given: Config fetched earlier with ETag
+        self.provider.session.get.side_effect = [
+            _mock_response(200, etag='"etag1"'),
+            _mock_response(304)
+        ]
+        self.provider.load('totem.yml', 'local', 'totem', 'config', 'master')
+
+        # When: I load the config again
+        config = self.provider.load('totem.yml', 'local', 'totem', 'config',
+                                    'master')
+
+        # Then: Conditional request is made and cached config is returned
+        dict_compare(config, {'variables': {'var1': 'value1'}})
+        eq_(self.provider.session.get.call_args[1]['headers'],
+            {'If-None-Match': '"etag1"'})
+        dict_compare(self.provider.stats()['etag_cache'], {
+            'hits': 1,
+            'misses': 1
+        })
+
+    def test_load_non_existing(self):
+        """
+        should return empty config when github returns 404
+        """
+
+        # Given: Non existing config
+        self.provider.session.get.return_value = _mock_response(404)
+
+        # When: I load the config
+        config = self.provider.load('totem.yml', 'local', 'totem', 'config',
+                                    'master')
+
+        # Then: Empty config is returned
+        eq_(config, {})
+
+    def test_load_for_commit_sha(self):
+        """
+        should not refetch config for commit sha from github
+        """
+
+        # Given: Provider with immutable cache
+        self.provider.immutable_cache = ImmutableCache(1024)
+        self.provider.session.get.return_value = _mock_response(200)
+        sha = 'a' * 40
+
+        # When: I load the config for commit sha twice
+        self.provider.load('totem.yml', 'local', 'totem', 'config', sha)
+        config = self.provider.load('totem.yml', 'local', 'totem', 'config',
+                                    sha)
+
+        # Then: Config is fetched from github only once
+        dict_compare(config, {'variables': {'var1': 'value1'}})
+        eq_(self.provider.session.get.call_count, 1)
+
+    def test_load_using_api_url(self):
+        """
+        should fetch config from configured github API url
+        """
+
+        # Given: Provider for github enterprise
+        provider = GithubConfigProvider(api_url='http://github.local/api/v3/')
+        provider.session = MagicMock()
+        provider.session.get.return_value = _mock_response(200)
+
+        # When: I load the config
+        provider.load('totem.yml', 'local', 'totem', 'config', 'master')
+
+        # Then: Config is fetched from configured url
+        eq_(provider.session.get.call_args[0][0],
+            'http://github.local/api/v3/repos/totem/config/contents/'
+            'totem.yml')
+
+    def test_load_many(self):
+        """
+        should fetch only the configs listed in config directory
+        """
+
+        # Given: Config directory with only totem.yml
+        listing = MagicMock()
+        listing.status_code = 200
+        listing.headers = {}
+        listing.json.return_value = [
+            {'name': 'totem.yml', 'type': 'file'},
+            {'name': 'docs', 'type': 'dir'}
+        ]
+        self.provider.session.get.side_effect = [listing,
+                                                 _mock_response(200)]
+
+        # When: I load multiple configs
+        configs = self.provider.load_many(
+            ['totem.yml', 'deploy.yml'], 'local', 'totem', 'config',
+            'master')
+
+        # Then: Only the existing config is fetched
+        dict_compare(configs, {
+            'totem.yml': {'variables': {'var1': 'value1'}},
+            'deploy.yml': {}
+        })
+        eq_(self.provider.session.get.call_count, 2)
+
+    def test_load_non_existing_for_commit_sha(self):
+        """
+        should not cache missing config for commit sha as immutable
+        """
+
+        # Given: Provider with immutable cache and missing config
+        self.provider.immutable_cache = ImmutableCache(1024)
+        self.provider.session.get.return_value = _mock_response(404)
+        sha = 'a' * 40
+        self.provider.load('totem.yml', 'local', 'totem', 'config', sha)
+
+        # When: Commit gets pushed and I load the config again
+        self.provider.session.get.return_value = _mock_response(200)
+        config = self.provider.load('totem.yml', 'local', 'totem', 'config',
+                                    sha)
+
+        # Then: Config is fetched from github
+        dict_compare(config, {'variables': {'var1': 'value1'}})
+        eq_(self.provider.session.get.call_count, 2)
+        eq_(self.provider.immutable_cache.stats()['entries'], 1)
+
+    def test_load_with_retries_exhausted(self):
+        """
+        should retry 5xx responses and raise GithubFetchException once
+        retries are exhausted
+        """
+
+        # Given: Provider retrying 5xx responses and github failing
+        # consistently
+        provider = GithubConfigProvider(max_retries=2)
+        retries = provider.session.get_adapter('https://').max_retries
+        provider.session = MagicMock()
+        provider.session.get.side_effect = RetryError(
+            'Max retries exceeded (too many 503 error responses)')
+
+        # When: I load the config
+        with assert_raises(GithubFetchException) as context:
+            provider.load('totem.yml', 'local', 'totem', 'config', 'master')
+
+        # Then: Error is mapped to GithubFetchException
+        eq_(retries.total, 2)
+        ok_(503 in retries.status_forcelist)
+        eq_(context.exception.to_dict()['code'], 'GITHUB_CONFIG_FETCH_FAILED')
+
+    def test_load_with_modified_response(self):
+        """
+        should count etag cache miss when config got modified
+        """
+
+        # Given: Config fetched earlier with ETag
+        self.provider.session.get.side_effect = [
+            _mock_response(200, etag='"etag1"'),
+            _mock_response(200, etag='"etag2"')
+        ]
+        self.provider.load('totem.yml', 'local', 'totem', 'config', 'master')
+
+        # When: I load the modified config
+        self.provider.load('totem.yml', 'local', 'totem', 'config', 'master')
+
+        # Then: Conditional request is counted as miss
+        dict_compare(self.provider.stats()['etag_cache'], {
+            'hits': 0,
+            'misses': 2
+        })
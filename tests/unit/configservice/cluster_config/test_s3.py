@@ -0,0 +1,104 @@
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import socket
+from boto.exception import S3ResponseError
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+from mock import MagicMock, patch
+from nose.tools import eq_
+from configservice.cluster_config.s3 import S3ConfigProvider
+
+__author__ = 'sukrit'
+
+
+class TestS3ConfigProvider:
+    """
+    Unit tests for S3ConfigProvider
+    """
+
+    def setup(self):
+        self.provider = S3ConfigProvider('mock-bucket')
+        self.connection = MagicMock()
+        self.provider._s3_connection = MagicMock(
+            return_value=self.connection)
+
+    @patch('configservice.cluster_config.s3.Key')
+    def test_load_reuses_connection(self, mock_key):
+        """
+        should reuse connection and bucket handle across loads
+        """
+
+        # Given: Existing config
+        mock_key.return_value.get_contents_as_string.return_value = \
+            b'key: value'
+
+        # When: I load the config twice
+        self.provider.load('totem.yml', 'cluster1')
+        config = self.provider.load('totem.yml', 'cluster1')
+
+        # Then: Config is loaded using single connection without validation
+        eq_(config, {'key': 'value'})
+        eq_(self.provider._s3_connection.call_count, 1)
+        self.connection.get_bucket.assert_called_once_with(
+            'mock-bucket', validate=False)
+        eq_(self.provider.stats()['requests']['get'], 2)
+        eq_(self.provider.stats()['requests']['head'], 0)
+
+    @patch('configservice.cluster_config.s3.Key')
+    def test_load_non_existing(self, mock_key):
+        """
+        should return empty config when key is not found
+        """
+
+        # Given: Non existing config
+        mock_key.return_value.get_contents_as_string.side_effect = \
+            S3ResponseError(404, 'Not Found')
+
+        # When: I load the config
+        config = self.provider.load('totem.yml', 'cluster1')
+
+        # Then: Empty config is returned
+        eq_(config, {})
+
+    @patch('configservice.cluster_config.s3.Key')
+    def test_load_reconnects_on_failure(self, mock_key):
+        """
+        should reconnect and retry when connection fails
+        """
+
+        # Given: Connection that fails once
+        mock_key.return_value.get_contents_as_string.side_effect = [
+            socket.error('Connection reset'), b'key: value']
+
+        # When: I load the config
+        config = self.provider.load('totem.yml', 'cluster1')
+
+        # Then: Config is loaded using new connection
+        eq_(config, {'key': 'value'})
+        eq_(self.provider._s3_connection.call_count, 2)
+
+    @patch('configservice.cluster_config.s3.Key')
+    def test_delete_reconnects_on_failure(self, mock_key):
+        """
+        should delete key using the re-created bucket when connection fails
+        """
+
+        # Given: Existing config and connection that fails once on delete
+        bucket = self.connection.get_bucket.return_value
+        bucket.get_key.return_value.name = 'cluster1/totem.yml'
+        mock_key.return_value.delete.side_effect = [
+            socket.error('Connection reset'), None]
+        new_connection = MagicMock()
+        self.provider._s3_connection.side_effect = [self.connection,
+                                                    new_connection]
+
+        # When: I delete the config
+        deleted = self.provider.delete('totem.yml', 'cluster1')
+
+        # Then: Key is deleted using the new bucket
+        eq_(deleted, True)
+        mock_key.assert_called_with(new_connection.get_bucket.return_value,
+                                    'cluster1/totem.yml')
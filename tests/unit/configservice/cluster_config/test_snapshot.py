@@ -0,0 +1,104 @@
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import os
+import shutil
+import tempfile
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+from mock import MagicMock
+from nose.tools import eq_
+from configservice.cluster_config.snapshot import SnapshotConfigProvider, \
+    build_snapshot
+
+__author__ = 'sukrit'
+
+
+def _source(*configs):
+    provider = MagicMock()
+    provider.export.return_value = iter(configs)
+    return provider
+
+
+class TestSnapshotConfigProvider:
+    """
+    Unit tests for SnapshotConfigProvider
+    """
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'snapshot.bin')
+        self.provider = SnapshotConfigProvider(self.path, check_interval=0)
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load_from_snapshot(self):
+        """
+        should load configs for all levels from the snapshot
+        """
+
+        # Given: Snapshot built from etcd and S3
+        count = build_snapshot(
+            self.path,
+            _source(('totem.yml', (), 'level: root\nkey1: etcd'),
+                    ('totem.yml', ('cluster1',), 'level: cluster')),
+            _source(('totem.yml', (), b'key1: s3\nkey2: s3')))
+
+        # When: I load configs for all levels
+        configs = self.provider.load_levels('totem.yml', 'cluster1', 'org1')
+
+        # Then: Configs for each level are returned
+        eq_(count, 2)
+        eq_(configs, [
+            {'level': 'root', 'key1': 'etcd', 'key2': 's3'},
+            {'level': 'cluster'},
+            {}
+        ])
+
+    def test_load_missing_snapshot(self):
+        """
+        should return empty config if snapshot is not published
+        """
+
+        eq_(self.provider.load('totem.yml', 'cluster1'), {})
+        eq_(self.provider.stats()['misses'], 1)
+
+    def test_load_published_snapshot(self):
+        """
+        should switch to newly published snapshot
+        """
+
+        # Given: Existing snapshot that has been loaded
+        build_snapshot(self.path, _source(('totem.yml', (), 'version: 1')))
+        self.provider.load('totem.yml')
+
+        # When: I publish a new snapshot and load the config
+        build_snapshot(self.path, _source(('totem.yml', (), 'version: 2')))
+        config = self.provider.load('totem.yml')
+
+        # Then: Config from new snapshot is returned
+        eq_(config, {'version': 2})
+        eq_(self.provider.stats()['reloads'], 2)
+
+    def test_load_invalid_snapshot(self):
+        """
+        should keep serving existing snapshot if new one is invalid
+        """
+
+        # Given: Existing snapshot that has been loaded
+        build_snapshot(self.path, _source(('totem.yml', (), 'version: 1')))
+        self.provider.load('totem.yml')
+
+        # When: I replace the snapshot with an invalid file
+        invalid_path = self.path + '.invalid'
+        with open(invalid_path, 'wb') as invalid_file:
+            invalid_file.write(b'not a snapshot file')
+        os.rename(invalid_path, self.path)
+        config = self.provider.load('totem.yml')
+
+        # Then: Config from existing snapshot is returned
+        eq_(config, {'version': 1})
+        eq_(self.provider.stats()['errors'], 1)
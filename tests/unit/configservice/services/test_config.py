@@ -0,0 +1,192 @@
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import json
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+from mock import MagicMock, patch
+from nose.tools import eq_
+from configservice.cache import LocalCache
+from configservice.cluster_config.effective import MergedConfigProvider
+from configservice.cluster_config.etcd import EtcdConfigProvider
+from configservice.concurrency import ThreadPoolExecutor
+from configservice.services import config
+
+__author__ = 'sukrit'
+
+
+def _level_provider():
+    provider = MagicMock()
+    provider.supports_load_levels = False
+    provider.supports_load_many = False
+    provider.load.side_effect = lambda name, *paths: {
+        'level-%d' % len(paths): '/'.join(paths)
+    }
+    return provider
+
+
+@patch('configservice.services.config._get_batch_executor')
+@patch('configservice.services.config.get_provider')
+def test_load_config_batch(mock_get_provider, mock_get_executor):
+    """
+    should load configs for all groups sharing the common levels
+    """
+
+    # Given: Effective provider
+    level_provider = _level_provider()
+    mock_get_provider.return_value = MergedConfigProvider(level_provider)
+    mock_get_executor.return_value = ThreadPoolExecutor(pool_size=2)
+
+    # When: I load configs for multiple groups in batch
+    results = list(config.load_config_batch([
+        ['cluster1', 'org1', 'repo1'],
+        ['cluster1', 'org1', 'repo2']
+    ]))
+
+    # Then: Configs are returned in requested order
+    eq_([result['groups'] for result in results], [
+        ['cluster1', 'org1', 'repo1'],
+        ['cluster1', 'org1', 'repo2']
+    ])
+    eq_(results[1]['config']['level-3'], 'cluster1/org1/repo2')
+    eq_(results[1]['config']['level-2'], 'cluster1/org1')
+
+    # And: Common levels are loaded only once
+    eq_(level_provider.load.call_count, 5)
+
+
+@patch('configservice.services.config._get_batch_executor')
+@patch('configservice.services.config.get_provider')
+def test_load_config_batch_with_bulk_providers(mock_get_provider,
+                                               mock_get_executor):
+    """
+    should load the common levels only once for etcd and providers loading
+    all levels at once
+    """
+
+    # Given: Effective provider using etcd and a bulk level provider
+    etcd_cl = MagicMock()
+    etcd_cl.read.side_effect = KeyError
+    bulk_provider = MagicMock()
+    bulk_provider.supports_load_levels = True
+    bulk_provider.supports_load_many = True
+    bulk_provider.load_many.side_effect = lambda names, *paths: {
+        name: {} for name in names}
+    mock_get_provider.return_value = MergedConfigProvider(
+        EtcdConfigProvider(etcd_cl=etcd_cl, config_base='/totem/config'),
+        bulk_provider)
+    mock_get_executor.return_value = ThreadPoolExecutor(pool_size=2)
+
+    # When: I load configs for multiple groups in batch
+    list(config.load_config_batch([
+        ['cluster1', 'org1', 'repo1'],
+        ['cluster1', 'org1', 'repo2']
+    ]))
+
+    # Then: Each shared prefix is read once
+    eq_(sorted(call[0][0] for call in etcd_cl.read.call_args_list), [
+        '/totem/config',
+        '/totem/config/cluster1',
+        '/totem/config/cluster1/org1',
+        '/totem/config/cluster1/org1/repo1',
+        '/totem/config/cluster1/org1/repo2'
+    ])
+    eq_(bulk_provider.load_many.call_count, 5)
+
+
+@patch('configservice.services.config._get_batch_executor')
+@patch('configservice.services.config.get_provider')
+def test_load_config_batch_with_error(mock_get_provider, mock_get_executor):
+    """
+    should return error for the groups that fail to load
+    """
+
+    # Given: Provider that fails to load
+    mock_get_provider.return_value.load_many.side_effect = ValueError('Mock')
+    mock_get_executor.return_value = ThreadPoolExecutor(pool_size=2)
+
+    # When: I load configs in batch
+    results = list(config.load_config_batch([['cluster1']]))
+
+    # Then: Error is returned for the group
+    eq_(results, [{
+        'groups': ['cluster1'],
+        'error': {'message': 'Mock', 'code': 'INTERNAL'}
+    }])
+
+
+@patch('configservice.services.config._get_batch_executor')
+@patch('configservice.services.config.get_provider')
+def test_load_config_stream(mock_get_provider, mock_get_executor):
+    """
+    should load each config name separately in requested order
+    """
+
+    # Given: Provider that fails to load one of the configs
+    def load_many(names, *paths):
+        if 'broken.yml' in names:
+            raise ValueError('Mock')
+        return {name: {'name': name} for name in names}
+    mock_get_provider.return_value.load_many.side_effect = load_many
+    mock_get_executor.return_value = ThreadPoolExecutor(pool_size=2)
+
+    # When: I load configs as stream
+    results = list(config.load_config_stream(
+        'cluster1', config_names=['totem', 'broken', 'deploy']))
+
+    # Then: Result is returned for each config name
+    eq_(results, [
+        {'name': 'totem', 'config': {'name': 'totem.yml'}},
+        {'name': 'broken', 'error': {'message': 'Mock', 'code': 'INTERNAL'}},
+        {'name': 'deploy', 'config': {'name': 'deploy.yml'}},
+    ])
+
+
+@patch('configservice.services.config._get_response_cache')
+@patch('configservice.services.config.get_provider')
+def test_load_config_response(mock_get_provider, mock_get_response_cache):
+    """
+    should serve cached response until the config is written
+    """
+
+    # Given: Effective provider with response cache
+    level_provider = _level_provider()
+    mock_get_provider.return_value = MergedConfigProvider(
+        level_provider, write_provider=MagicMock())
+    mock_get_response_cache.return_value = LocalCache(copy_on_read=False)
+    body, etag = config.load_config_response('cluster1', 'org1')
+
+    # When: I load the response again
+    cached_body, cached_etag = config.load_config_response('cluster1', 'org1')
+
+    # Then: Cached response is returned without loading config
+    eq_(level_provider.load.call_count, 3)
+    eq_(cached_body, body)
+    eq_(cached_etag, etag)
+    eq_(json.loads(body)['level-2'], 'cluster1/org1')
+
+    # And: Write evicts the cached response
+    config.write_config('totem.yml', {}, 'cluster1')
+    config.load_config_response('cluster1', 'org1')
+    eq_(level_provider.load.call_count, 6)
+
+
+@patch('configservice.services.config.get_provider_types')
+@patch('configservice.services.config.get_provider')
+def test_on_config_reset(mock_get_provider, mock_get_provider_types):
+    """
+    should evict only the caches held by the worker on watch reset
+    """
+
+    # Given: Effective provider with shared etcd cache
+    mock_get_provider_types.return_value = ['etcd', 'effective']
+    effective = mock_get_provider.return_value
+
+    # When: Watch is reset
+    config._on_config_reset()
+
+    # Then: Only in-process caches are evicted
+    effective.invalidate_local.assert_called_once_with(None)
+    eq_(effective.invalidate.call_count, 0)
@@ -0,0 +1,48 @@
+from mock import MagicMock
+from nose.tools import eq_
+from configservice.services.registry import ProviderRegistry
+
+__author__ = 'sukrit'
+
+
+class TestProviderRegistry:
+    """
+    Unit tests for ProviderRegistry
+    """
+
+    def setup(self):
+        self.registry = ProviderRegistry()
+
+    def test_get_creates_instance_once(self):
+        """
+        should create instance only on first lookup
+        """
+
+        # Given: Provider factory
+        factory = MagicMock()
+
+        # When: I lookup the provider twice
+        first = self.registry.get('etcd', factory)
+        second = self.registry.get('etcd', factory)
+
+        # Then: Same instance is returned
+        eq_(first, second)
+        eq_(factory.call_count, 1)
+        eq_(self.registry.size(), 1)
+
+    def test_reload(self):
+        """
+        should discard existing instances on reload
+        """
+
+        # Given: Existing instance in registry
+        factory = MagicMock()
+        self.registry.get('etcd', factory)
+
+        # When: I reload the registry
+        self.registry.reload()
+
+        # Then: New instance gets created on lookup
+        eq_(self.registry.size(), 0)
+        self.registry.get('etcd', factory)
+        eq_(factory.call_count, 2)
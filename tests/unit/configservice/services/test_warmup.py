@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+from mock import MagicMock
+from nose.tools import eq_
+from configservice.concurrency import SerialExecutor
+from configservice.services.warmup import RecentKeys, FileKeyStore, \
+    merge_keys, warm_up
+
+__author__ = 'sukrit'
+
+
+def test_recent_keys():
+    """
+    should retain most recently requested keys
+    """
+
+    # Given: Recent keys with max size of 2
+    recent_keys = RecentKeys(max_size=2)
+
+    # When: I record 3 keys (one of them twice)
+    recent_keys.record('totem.yml', ['cluster1'])
+    recent_keys.record('totem.yml', ['cluster2'])
+    recent_keys.record('totem.yml', ['cluster1'])
+    recent_keys.record('totem.yml', ['cluster3'])
+
+    # Then: Most recent keys are returned first
+    eq_(recent_keys.keys(), [('totem.yml', ('cluster3',)),
+                             ('totem.yml', ('cluster1',))])
+
+
+def test_merge_keys():
+    """
+    should merge recent keys before the stored keys
+    """
+
+    merged = merge_keys([('totem.yml', ('c1',)), ('totem.yml', ('c2',))],
+                        [('totem.yml', ('c2',)), ('totem.yml', ('c3',)),
+                         ('totem.yml', ('c4',))], 3)
+    eq_(merged, [('totem.yml', ('c1',)), ('totem.yml', ('c2',)),
+                 ('totem.yml', ('c3',))])
+
+
+def test_warm_up():
+    """
+    should load configs for all keys and count the failures
+    """
+
+    # Given: Provider failing to load config for cluster2
+    provider = MagicMock()
+
+    def load(name, *paths):
+        if paths == ('cluster2',):
+            raise ValueError('Mock')
+        return {}
+    provider.load.side_effect = load
+
+    # When: I warm up the configs
+    result = warm_up(provider, [('totem.yml', ('cluster1', 'org1')),
+                                ('totem.yml', ('cluster2',))],
+                     SerialExecutor())
+
+    # Then: Configs are loaded
+    eq_(result, {'requested': 2, 'loaded': 1, 'failed': 1})
+    provider.load.assert_any_call('totem.yml', 'cluster1', 'org1')
+
+
+class TestFileKeyStore:
+    """
+    Unit tests for FileKeyStore
+    """
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = FileKeyStore(os.path.join(self.directory, 'keys.json'))
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load_missing_file(self):
+        """
+        should return empty keys if store was never saved
+        """
+
+        eq_(self.store.load(), [])
+
+    def test_save_and_load(self):
+        """
+        should load the saved keys
+        """
+
+        # Given: Saved keys
+        self.store.save([('totem.yml', ('cluster1', 'org1'))])
+
+        # When: I load the keys
+        keys = self.store.load()
+
+        # Then: Saved keys are returned
+        eq_(keys, [('totem.yml', ('cluster1', 'org1'))])
@@ -0,0 +1,309 @@
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import os
+import shutil
+import tempfile
+import time
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+from mock import MagicMock, patch
+from nose.tools import eq_, ok_
+from configservice.cache import ImmutableCache, LocalCache, NegativeCache, \
+    UwsgiCache, get_shared_cache
+
+__author__ = 'sukrit'
+
+
+class TestLocalCache:
+    """
+    Unit tests for LocalCache
+    """
+
+    def test_get_returns_copy(self):
+        """
+        should not allow callers to modify the cached value
+        """
+
+        # Given: Cached value
+        cache = LocalCache()
+        cache.put('key1', {'key': 'value'})
+
+        # When: I modify the value read from cache
+        cache.get('key1')['key'] = 'changed'
+
+        # Then: Cached value remains unchanged
+        eq_(cache.get('key1'), {'key': 'value'})
+
+    def test_get_expired(self):
+        """
+        should not return expired entries
+        """
+
+        # Given: Cached value that is expired
+        cache = LocalCache(ttl=0.01)
+        cache.put('key1', 'value1')
+        time.sleep(0.02)
+
+        # When: I get the entry
+        value = cache.get('key1')
+
+        # Then: Entry is not returned
+        eq_(value, None)
+        eq_(cache.stats()['expired'], 1)
+
+    def test_put_evicts_least_recently_used(self):
+        """
+        should evict least recently used entries when cache is full
+        """
+
+        # Given: Full cache
+        cache = LocalCache(max_size=2)
+        cache.put('key1', 'value1')
+        cache.put('key2', 'value2')
+        cache.get('key1')
+
+        # When: I add another entry
+        cache.put('key3', 'value3')
+
+        # Then: Least recently used entry gets evicted
+        eq_(cache.get('key2'), None)
+        eq_(cache.get('key1'), 'value1')
+
+    def test_put_loaded_before_invalidation(self):
+        """
+        should not cache value loaded before the cache got invalidated
+        """
+
+        # Given: Value that started loading before invalidation
+        cache = LocalCache()
+        version = cache.version('key1')
+        cache.invalidate('key1')
+
+        # When: I cache the loaded value
+        cache.put('key1', {'key': 'stale'}, version=version)
+
+        # Then: Value is not cached
+        eq_(cache.get('key1'), None)
+
+
+class TestImmutableCache:
+    """
+    Unit tests for ImmutableCache
+    """
+
+    def test_put_evicts_least_recently_used(self):
+        """
+        should evict least recently used entries when budget is exceeded
+        """
+
+        # Given: Cache with budget of 10 bytes
+        cache = ImmutableCache(10)
+        cache.put('key1', b'12345')
+        cache.put('key2', b'12345')
+        cache.get('key1')
+
+        # When: I add entry exceeding the budget
+        cache.put('key3', b'12345')
+
+        # Then: Least recently used entry gets evicted
+        eq_(cache.get('key2'), None)
+        eq_(cache.get('key1'), b'12345')
+        eq_(cache.get('key3'), b'12345')
+        eq_(cache.stats()['size_bytes'], 10)
+
+    def test_get_from_disk(self):
+        """
+        should serve entries evicted from memory using disk tier
+        """
+
+        # Given: Cache with disk tier and small memory budget
+        directory = tempfile.mkdtemp()
+        try:
+            cache = ImmutableCache(5, directory=directory)
+            cache.put('key1', b'12345')
+            cache.put('key2', b'12345')
+
+            # When: I get the entry evicted from memory
+            value = cache.get('key1')
+
+            # Then: Entry is served from disk
+            eq_(value, b'12345')
+            eq_(cache.stats()['disk_hits'], 1)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_put_trims_disk_only_when_over_budget(self):
+        """
+        should scan the disk tier only when the tracked size exceeds budget
+        """
+
+        # Given: Cache with disk budget of 10 bytes and a seeded disk size
+        directory = tempfile.mkdtemp()
+        try:
+            cache = ImmutableCache(5, directory=directory, max_disk_bytes=10)
+            cache.put('key1', b'12345')
+
+            # When: I write entries within and then over the disk budget
+            with patch('configservice.cache.os.listdir',
+                       wraps=os.listdir) as mock_listdir:
+                cache.put('key2', b'12345')
+                scans_within_budget = mock_listdir.call_count
+                cache.put('key3', b'12345')
+
+            # Then: Directory is scanned only once the budget is exceeded
+            eq_(scans_within_budget, 0)
+            eq_(mock_listdir.call_count, 1)
+            eq_(cache.stats()['disk_trims'], 1)
+            eq_(cache.stats()['disk_size_bytes'], 5)
+            eq_(len(os.listdir(directory)), 1)
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestNegativeCache:
+    """
+    Unit tests for NegativeCache
+    """
+
+    def test_invalidate_descendants(self):
+        """
+        should evict missing entries for given path prefix
+        """
+
+        # Given: Missing configs for multiple paths
+        cache = NegativeCache()
+        cache.add('totem.yml', 'cluster1', 'org1')
+        cache.add('totem.yml', 'cluster2', 'org1')
+
+        # When: I invalidate the cluster1 prefix
+        cache.invalidate('totem.yml', 'cluster1')
+
+        # Then: Only entries under cluster1 are evicted
+        eq_(cache.is_missing('totem.yml', 'cluster1', 'org1'), False)
+        eq_(cache.is_missing('totem.yml', 'cluster2', 'org1'), True)
+        eq_(cache.all_missing(['totem.yml', 'deploy.yml'], 'cluster2',
+                              'org1'), False)
+        eq_(cache.stats()['saved'], 1)
+
+
+def _mock_uwsgi(options=None):
+    entries = {}
+    mock_uwsgi = MagicMock()
+    mock_uwsgi.opt = options or {}
+    mock_uwsgi.cache_get.side_effect = \
+        lambda key, name: entries.get((name, key))
+    mock_uwsgi.cache_update.side_effect = \
+        lambda key, value, expires, name: entries.update(
+            {(name, key): value}) or True
+    mock_uwsgi.cache_set.side_effect = \
+        lambda key, value, expires, name: None if (name, key) in entries \
+        else entries.update({(name, key): value}) or True
+    mock_uwsgi.cache_del.side_effect = \
+        lambda key, name: entries.pop((name, key), None)
+    return mock_uwsgi
+
+
+class TestUwsgiCache:
+    """
+    Unit tests for UwsgiCache
+    """
+
+    def setup(self):
+        self.uwsgi_patcher = patch('configservice.cache.uwsgi', _mock_uwsgi())
+        self.uwsgi_patcher.start()
+        self.cache = UwsgiCache('configs', ttl=60)
+
+    def teardown(self):
+        self.uwsgi_patcher.stop()
+
+    def test_get_shared_value(self):
+        """
+        should serve value cached using another instance (worker)
+        """
+
+        # Given: Value cached by another worker
+        UwsgiCache('configs').put(('totem.yml', ('cluster1',)),
+                                  {'key': 'value'})
+
+        # When: I get the value
+        value = self.cache.get(('totem.yml', ('cluster1',)))
+
+        # Then: Cached value is returned
+        eq_(value, {'key': 'value'})
+        eq_(self.cache.stats()['hit_ratio'], 1.0)
+
+    def test_invalidate_tree(self):
+        """
+        should evict entries for the path prefix and its descendants
+        """
+
+        # Given: Values cached for multiple clusters
+        for key in [('totem.yml', ('cluster1',)),
+                    ('totem.yml', ('cluster1', 'org1')),
+                    ('totem.yml', ('cluster2',))]:
+            self.cache.put(key, {'key': 'value'})
+
+        # When: I invalidate the entries under cluster1 (using another
+        # worker)
+        UwsgiCache('configs').invalidate_tree('totem.yml', 'cluster1')
+
+        # Then: Only values under cluster1 are evicted
+        eq_(self.cache.get(('totem.yml', ('cluster1',))), None)
+        eq_(self.cache.get(('totem.yml', ('cluster1', 'org1'))), None)
+        eq_(self.cache.get(('totem.yml', ('cluster2',))), {'key': 'value'})
+
+    def test_put_loaded_before_invalidation(self):
+        """
+        should not serve value loaded before the key got invalidated
+        """
+
+        # Given: Value that started loading before invalidation
+        key = ('totem.yml', ('cluster1', 'org1'))
+        version = self.cache.version(key)
+        UwsgiCache('configs').invalidate_tree('totem.yml', 'cluster1')
+
+        # When: I cache the loaded value
+        self.cache.put(key, {'key': 'stale'}, version=version)
+
+        # Then: Value is not served
+        eq_(self.cache.get(key), None)
+
+    def test_claim(self):
+        """
+        should claim the key only for the first worker
+        """
+
+        # When: Two workers claim the same event
+        claimed = [self.cache.claim('event:10'),
+                   UwsgiCache('configs').claim('event:10')]
+
+        # Then: Only the first worker claims the event
+        eq_(claimed, [True, False])
+
+
+def test_get_shared_cache_with_uwsgi_cache():
+    """
+    should use uwsgi cache when it is configured
+    """
+
+    with patch('configservice.cache.uwsgi', _mock_uwsgi({
+            'cache2': b'name=configs,items=500,blocksize=4096'})):
+        cache = get_shared_cache('configs')
+
+    ok_(isinstance(cache, UwsgiCache))
+    eq_(cache.max_size, 500)
+
+
+def test_get_shared_cache_without_uwsgi():
+    """
+    should fall back to in-process cache when not running under uwsgi
+    """
+
+    with patch('configservice.cache.uwsgi', None):
+        cache = get_shared_cache('configs', max_size=10, ttl=5)
+
+    ok_(isinstance(cache, LocalCache))
+    eq_(cache.max_size, 10)
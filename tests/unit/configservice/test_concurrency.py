@@ -0,0 +1,68 @@
+from __future__ import (absolute_import, division,
+                        print_function, unicode_literals)
+import threading
+import time
+from future.builtins import (  # noqa
+    bytes, dict, int, list, object, range, str,
+    ascii, chr, hex, input, next, oct, open,
+    pow, round, super,
+    filter, map, zip)
+from mock import MagicMock
+from nose.tools import eq_
+from configservice.concurrency import SingleFlight, SerialExecutor, imap
+
+__author__ = 'sukrit'
+
+
+class TestSingleFlight:
+    """
+    Unit tests for SingleFlight
+    """
+
+    def test_do_coalesces_concurrent_calls(self):
+        """
+        should invoke function once for concurrent calls with same key
+        """
+
+        # Given: Slow function
+        func = MagicMock()
+
+        def slow_func():
+            time.sleep(0.05)
+            func()
+            return 'result'
+        single_flight = SingleFlight()
+        results = []
+
+        # When: I invoke the function concurrently
+        threads = [threading.Thread(
+            target=lambda: results.append(
+                single_flight.do('key1', slow_func)))
+            for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Then: Function is invoked once and result is shared
+        eq_(func.call_count, 1)
+        eq_(results, ['result'] * 5)
+        eq_(single_flight.counters.get('coalesced'), 4)
+
+
+def test_imap_submits_lazily():
+    """
+    should keep at most window tasks in flight and yield results in order
+    """
+
+    # Given: Executor tracking the submitted tasks
+    executor = MagicMock(wraps=SerialExecutor())
+
+    # When: I consume the first result
+    results = imap(executor, lambda item: item * 2, range(10), 3)
+    first = next(results)
+
+    # Then: Only tasks for the window are submitted
+    eq_(first, 0)
+    eq_(executor.submit.call_count, 3)
+    eq_(list(results), [2, 4, 6, 8, 10, 12, 14, 16, 18])
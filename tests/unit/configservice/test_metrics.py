@@ -0,0 +1,163 @@
+import os
+import shutil
+import tempfile
+from mock import MagicMock
+from nose.tools import eq_, raises, ok_
+from configservice.cluster_config.base import AbstractConfigProvider
+from configservice.metrics import Histogram, ProviderMetrics, SnapshotStore, \
+    aggregate, cache_samples, render_prometheus
+
+__author__ = 'sukrit'
+
+
+def test_histogram():
+    """
+    should count observations in cumulative buckets
+    """
+
+    # Given: Histogram with 2 buckets
+    histogram = Histogram(buckets=(0.1, 1.0))
+
+    # When: I observe the latencies
+    for seconds in (0.05, 0.1, 0.5, 2):
+        histogram.observe(seconds)
+
+    # Then: Cumulative bucket counts are returned
+    eq_(histogram.to_dict(), {
+        'buckets': [[0.1, 2], [1.0, 3], ['+Inf', 4]],
+        'sum': 2.65,
+        'count': 4
+    })
+
+
+@raises(KeyError)
+def test_instrument_records_errors():
+    """
+    should record latency and errors for provider operations
+    """
+
+    # Given: Instrumented provider failing to load config
+    metrics = ProviderMetrics()
+    provider = MagicMock()
+    provider.supports_load_levels = False
+    provider.supports_load_many = False
+    provider.load.side_effect = KeyError('Mock')
+    metrics.instrument(provider, 'etcd')
+
+    try:
+        # When: I load the config
+        provider.load('totem.yml', 'cluster1')
+    finally:
+        # Then: Error and latency are recorded
+        eq_(metrics.errors.to_dict(), {('etcd', 'load', 'KeyError'): 1})
+        eq_(metrics.histogram('etcd', 'load').to_dict()['count'], 1)
+
+
+class _BulkProvider(AbstractConfigProvider):
+    supports_load_many = True
+
+    def load(self, name, *paths):
+        return {'name': name}
+
+    def load_many(self, names, *paths):
+        return {name: self.load(name, *paths) for name in names}
+
+
+def test_instrument_records_outermost_operation():
+    """
+    should record nested provider operations only once
+    """
+
+    # Given: Instrumented provider whose load_many calls load
+    metrics = ProviderMetrics()
+    provider = metrics.instrument(_BulkProvider(), 's3')
+
+    # When: I load multiple configs
+    provider.load_many(['totem.yml', 'deploy.yml'], 'cluster1')
+
+    # Then: Only the load_many operation is recorded
+    eq_(metrics.histogram('s3', 'load_many').to_dict()['count'], 1)
+    eq_(metrics.histogram('s3', 'load').to_dict()['count'], 0)
+
+    # And: Operations called later are recorded
+    provider.load('totem.yml')
+    eq_(metrics.histogram('s3', 'load').to_dict()['count'], 1)
+
+
+def test_cache_samples():
+    """
+    should find cache statistics in nested statistics
+    """
+
+    samples = cache_samples({
+        'effective': {
+            'local_cache': {'hits': 3, 'misses': 1, 'entries': 10},
+            'single_flight': {'calls': 1}
+        }
+    })
+    eq_(sorted(sample[2] for sample in samples), [1, 3])
+    eq_(samples[0][1]['cache'], 'effective.local_cache')
+
+
+def test_aggregate_and_render():
+    """
+    should sum samples across snapshots and render them as prometheus text
+    """
+
+    # Given: Snapshots from 2 workers
+    def snapshot(hits):
+        histogram = Histogram(buckets=(1.0,))
+        histogram.observe(0.5)
+        return {
+            'counters': [['configservice_cache_requests_total',
+                          {'cache': 'effective.cache', 'result': 'hit'},
+                          hits],
+                         ['configservice_cache_requests_total',
+                          {'cache': 'effective.cache', 'result': 'miss'},
+                          1]],
+            'histograms': [['configservice_provider_duration_seconds',
+                            {'provider': 'etcd', 'operation': 'load'},
+                            histogram.to_dict()]]
+        }
+
+    # When: I aggregate and render the snapshots
+    text = render_prometheus(aggregate([snapshot(1), snapshot(5)]))
+
+    # Then: Aggregated metrics are rendered
+    lines = text.splitlines()
+    ok_('# TYPE configservice_provider_duration_seconds histogram' in lines)
+    ok_('configservice_cache_requests_total{cache="effective.cache",'
+        'result="hit"} 6' in lines)
+    ok_('configservice_provider_duration_seconds_bucket{le="+Inf",'
+        'operation="load",provider="etcd"} 2' in lines)
+    ok_('configservice_cache_hit_ratio{cache="effective.cache"} 0.75'
+        in lines)
+
+
+class TestSnapshotStore:
+    """
+    Unit tests for SnapshotStore
+    """
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = SnapshotStore(self.directory)
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_load_all(self):
+        """
+        should load snapshots of live processes only
+        """
+
+        # Given: Snapshots for current and non existing process
+        self.store.save({'counters': []})
+        self.store.save({'counters': [['dead', {}, 1]]}, pid=2 ** 22 + 1)
+
+        # When: I load all snapshots
+        snapshots = self.store.load_all()
+
+        # Then: Only snapshot for live process is returned
+        eq_(snapshots, [{'counters': []}])
+        eq_(os.listdir(self.directory), ['%d.json' % os.getpid()])
@@ -0,0 +1,46 @@
+from nose.tools import eq_
+from configservice import serialization
+from configservice.serialization import dump_yaml, load_yaml
+from configservice.util import dict_merge
+
+__author__ = 'sukrit'
+
+
+def test_load_yaml_uses_parse_cache():
+    """
+    should parse identical content only once
+    """
+
+    # Given: Raw yaml content
+    raw = 'test_load_yaml_uses_parse_cache: {key: value}\n'
+    hits = serialization.parse_cache_counters.get('hits')
+
+    # When: I load same content twice
+    first = load_yaml(raw)
+    second = load_yaml(raw.encode('utf-8'))
+
+    # Then: Parsed document is served from cache
+    eq_(first, {'test_load_yaml_uses_parse_cache': {'key': 'value'}})
+    eq_(first is second, True)
+    eq_(serialization.parse_cache_counters.get('hits'), hits + 1)
+
+
+def test_load_yaml_for_empty_content():
+    """
+    should return None for empty content
+    """
+
+    eq_(load_yaml(''), None)
+    eq_(load_yaml(None), None)
+
+
+def test_dump_yaml_frozen_dict():
+    """
+    should serialize dictionary subclasses as plain mapping
+    """
+
+    # When: I dump frozen dictionary
+    raw = dump_yaml(dict_merge({'key': 'value'}, frozen=True))
+
+    # Then: It is serialized as plain mapping
+    eq_(load_yaml(raw), {'key': 'value'})
@@ -0,0 +1,94 @@
+import copy
+import datetime
+from nose.tools import eq_, raises
+from configservice.util import dict_merge, json_compatible
+from tests.helper import dict_compare
+
+__author__ = 'sukrit'
+
+
+def test_dict_merge():
+    """
+    should merge nested dictionaries with first dictionary taking precedence
+    """
+
+    # When: I merge dictionaries
+    merged = dict_merge(
+        {'key1': 'value1', 'nested': {'key2': 'value2'}},
+        None,
+        {'key1': 'default1', 'nested': {'key2': 'default2', 'key3': [1]},
+         'key4': 'value4'},
+        {'nested': 'not-a-dict'})
+
+    # Then: Dictionaries are merged
+    dict_compare(merged, {
+        'key1': 'value1',
+        'nested': {'key2': 'value2', 'key3': [1]},
+        'key4': 'value4'
+    })
+
+
+def test_dict_merge_does_not_modify_inputs():
+    """
+    should not modify input dictionaries
+    """
+
+    # Given: Nested dictionaries
+    source = {'nested': {'key1': 'value1'}}
+    defaults = {'nested': {'key2': 'value2'}, 'shared': {'key3': 'value3'}}
+    expected_source, expected_defaults = copy.deepcopy((source, defaults))
+
+    # When: I merge dictionaries
+    merged = dict_merge(source, defaults)
+
+    # Then: Inputs remain unchanged and untouched subtrees are shared
+    eq_(source, expected_source)
+    eq_(defaults, expected_defaults)
+    eq_(merged['shared'] is defaults['shared'], True)
+
+
+@raises(TypeError)
+def test_dict_merge_frozen():
+    """
+    should return read only dictionary when frozen is requested
+    """
+
+    # When: I modify frozen merged dictionary
+    dict_merge({'key1': 'value1'}, frozen=True)['key1'] = 'value2'
+
+    # Then: TypeError is raised
+
+
+def test_json_compatible():
+    """
+    should convert yaml native types to json compatible types
+    """
+
+    # When: I convert config with non string keys, dates and sets
+    converted = json_compatible({
+        1: {True: None, 'date': datetime.date(2015, 1, 2)},
+        'set': {2, 1},
+        'tuple': (1, 2)
+    })
+
+    # Then: Config gets converted
+    dict_compare(converted, {
+        '1': {'true': None, 'date': '2015-01-02'},
+        'set': [1, 2],
+        'tuple': [1, 2]
+    })
+
+
+def test_json_compatible_without_conversion():
+    """
+    should return the same config when no conversion is needed
+    """
+
+    # Given: Json compatible config
+    config = {'key': {'nested': ['value', 1]}}
+
+    # When: I convert the config
+    converted = json_compatible(config)
+
+    # Then: Same config is returned
+    eq_(converted is config, True)